@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Compare rendering with and without specialization to constant names.
+
+Renders a config-file-like template with many placeholders, of which only
+a few vary between argument groups, the way a typical --vary run does.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import argparse
+import os.path
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from eztemplate import engines  # noqa: E402
+
+
+TEMPLATES = {
+        'string.Template': (
+            lambda index: '%(name)s_%(index)d = ${value_%(index)d}\n',
+            lambda index: '# ${host} in ${env}\n'),
+        'string.Formatter': (
+            lambda index: '%(name)s_%(index)d = {value_%(index)d:>8}\n',
+            lambda index: '# {host} in {env}\n'),
+    }
+
+
+def make_template(handle, constant, varying):
+    """Build template text with constant and varying placeholders."""
+    line, header = TEMPLATES[handle]
+    lines = [header(0) * varying]
+    lines.extend(line(index) % {'name': 'option', 'index': index}
+                 for index in range(constant))
+    return ''.join(lines)
+
+
+def render(template, arggroups):
+    """Render all groups with just the referenced names, like eztemplate."""
+    names = template.referenced_names()
+    return [template.apply({name: arggroup[name] for name in names})
+            for arggroup in arggroups]
+
+
+def main():
+    """Run benchmark and print results."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--constant', type=int, default=200,
+                        help="number of constant placeholders")
+    parser.add_argument('--varying', type=int, default=2,
+                        help="number of lines with varying placeholders")
+    parser.add_argument('--groups', type=int, default=1000,
+                        help="number of argument groups to render")
+    args = parser.parse_args()
+
+    constants = {'value_%d' % (index,): 'v%d' % (index,)
+                 for index in range(args.constant)}
+    arggroups = [dict(constants, host='host%d' % (index,), env='prod')
+                 for index in range(args.groups)]
+
+    for handle in sorted(TEMPLATES):
+        engine = engines.engines[handle]
+        template = engine(make_template(handle, args.constant, args.varying))
+        residual = template.specialize(constants)
+
+        assert all(residual.apply(arggroup) == template.apply(arggroup)
+                   for arggroup in arggroups[:10])
+
+        plain = min(timeit.repeat(
+                lambda: render(template, arggroups), number=1, repeat=3))
+        specialized = min(timeit.repeat(
+                lambda: render(residual, arggroups), number=1, repeat=3))
+
+        print("%-18s plain %8.1f ms   specialized %8.1f ms   %5.1fx" % (
+                handle, plain * 1e3, specialized * 1e3, plain / specialized))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,14 +5,33 @@ from __future__ import absolute_import
 from __future__ import print_function
 
 import argparse
-import errno
+import collections
+import functools
+import hashlib
+import io
+import json
 import os
 import os.path
+import posixpath
 import re
 import sys
+import threading
 
+from . import bundles
+from . import compression
+from . import data
 from . import engines
+from . import governor
+from . import matrix
+from . import pyargs
+from . import store
+from . import trace
+from . import workers
 from . import __version__
+from .cache import RenderCache, canonical_digest
+from .fingerprints import FingerprintSet, fingerprint
+from .journal import Journal, combination_key
+from .sinks import DirectorySink, is_archive_path, open_sink
 
 
 def is_filelike(ob):
@@ -40,6 +59,30 @@ class _PyArg(str):
     pass
 
 
+class _MatrixFile(str):
+
+    """Wrap a command line matrix axis read from a file.
+
+    Makes it distinguishable from an axis with inline values.
+    """
+
+    pass
+
+
+def parse_shard(text):
+    """Parse INDEX/COUNT into a tuple of integers."""
+    index, sep, count = text.partition('/')
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        index = count = 0
+
+    if not sep or count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError("invalid shard '%s'" % (text,))
+
+    return index, count
+
+
 def parse_args(args=None):
     """Parse command line arguments."""
     # The argparse module provides a nice abstraction for argument parsing.
@@ -65,6 +108,70 @@ def parse_args(args=None):
                        dest='tolerant',
                        help="don't fail on missing names",
                        )
+    group.add_argument('--render-cache',
+                       type=int,
+                       default=0,
+                       dest='render_cache',
+                       help="remember up to SIZE results of rendering "
+                            "identical contexts",
+                       metavar="SIZE",
+                       )
+    group.add_argument('--no-specialize',
+                       action='store_false',
+                       dest='specialize',
+                       help="don't apply constant names to templates up "
+                            "front",
+                       )
+    group.add_argument('--explain-vars',
+                       action='store_true',
+                       dest='explain_vars',
+                       help="report the names the templates reference "
+                            "and exit",
+                       )
+
+    group = parser.add_argument_group("Execution")
+    group.add_argument('-j', '--jobs',
+                       type=int,
+                       default=1,
+                       dest='jobs',
+                       help="render in N worker processes",
+                       metavar="N",
+                       )
+    group.add_argument('-k', '--keep-going',
+                       action='store_true',
+                       dest='keep_going',
+                       help="carry on with other files after errors",
+                       )
+    group.add_argument('--failure-report',
+                       dest='failure_report',
+                       help="write failed files and errors to FILE as JSON",
+                       metavar="FILE",
+                       )
+    group.add_argument('--resume',
+                       dest='resume',
+                       help="record completed files in JOURNAL and skip "
+                            "the ones recorded by an earlier run",
+                       metavar="JOURNAL",
+                       )
+    group.add_argument('--shard',
+                       type=parse_shard,
+                       dest='shard',
+                       help="only render the INDEXth of COUNT disjoint "
+                            "parts of the output files (counting from 1)",
+                       metavar="INDEX/COUNT",
+                       )
+    group.add_argument('--shard-by',
+                       choices=('hash', 'round-robin'),
+                       default='hash',
+                       dest='shard_by',
+                       help="assign output files to parts by a hash of "
+                            "their path (default) or in turn",
+                       )
+    group.add_argument('--trace',
+                       dest='trace',
+                       help="write a timeline in Trace Event Format to FILE",
+                       metavar="FILE",
+                       )
 
     group = parser.add_argument_group("Output")
     group.add_argument('-s', '--stdout',
@@ -95,6 +202,99 @@ def parse_args(args=None):
                        dest='delete_empty',
                        help="delete file if output is empty",
                        )
+    group.add_argument('--only-if-changed',
+                       action='store_true',
+                       dest='only_if_changed',
+                       help="don't rewrite files whose content stays the same",
+                       )
+    group.add_argument('--dedupe',
+                       choices=('hardlink', 'reflink', 'copy'),
+                       dest='dedupe',
+                       help="link or copy output files identical to an "
+                            "earlier one instead of writing them",
+                       metavar="METHOD",
+                       )
+    group.add_argument('--split-marker',
+                       dest='split_marker',
+                       help="split output into several files at lines "
+                            "starting with MARKER followed by a file name "
+                            "(relative to the output file's directory; "
+                            "values may produce such lines, too)",
+                       metavar="MARKER",
+                       )
+    group.add_argument('--compress-level',
+                       type=int,
+                       choices=range(1, 10),
+                       dest='compress_level',
+                       help="compression level for .gz, .bz2 and .xz files",
+                       metavar="LEVEL",
+                       )
+    group.add_argument('--lock',
+                       action='store_true',
+                       dest='lock',
+                       help="lock output files while writing them, using "
+                            ".lock files next to them, which are left in "
+                            "place",
+                       )
+    group.add_argument('--sync',
+                       action='store_true',
+                       dest='sync',
+                       help="flush output files to disk before exiting",
+                       )
+    group.add_argument('--archive',
+                       dest='archive',
+                       help="write output files into a tar or zip archive",
+                       metavar="FILE",
+                       )
+
+    group = parser.add_argument_group("Shared cache")
+    group.add_argument('--cache-dir',
+                       dest='cache_dir',
+                       help="reuse results of renderings stored in DIR",
+                       metavar="DIR",
+                       )
+    group.add_argument('--cache-max-size',
+                       type=governor.parse_size,
+                       dest='cache_max_size',
+                       help="evict least recently used results beyond SIZE",
+                       metavar="SIZE",
+                       )
+    group.add_argument('--cache-link',
+                       action='store_true',
+                       dest='cache_link',
+                       help="hard link output files to cached results",
+                       )
+    group.add_argument('--cache-stats',
+                       action='store_true',
+                       dest='cache_stats',
+                       help="report cache statistics at the end",
+                       )
+
+    group = parser.add_argument_group("Limits")
+    group.add_argument('--time-limit',
+                       type=float,
+                       dest='time_limit',
+                       help="abort rendering a file after SECONDS",
+                       metavar="SECONDS",
+                       )
+    group.add_argument('--cpu-limit',
+                       type=float,
+                       dest='cpu_limit',
+                       help="abort rendering a file after SECONDS of CPU time",
+                       metavar="SECONDS",
+                       )
+    group.add_argument('--memory-limit',
+                       type=governor.parse_size,
+                       dest='memory_limit',
+                       help="limit memory available for rendering a file",
+                       metavar="SIZE",
+                       )
+    group.add_argument('--output-limit',
+                       type=governor.parse_size,
+                       dest='output_limit',
+                       help="fail rendering a file producing more than SIZE",
+                       metavar="SIZE",
+                       )
 
     group = parser.add_argument_group("Input")
     group.add_argument('--stdin',
@@ -109,6 +309,11 @@ def parse_args(args=None):
                        help="any number of input files",
                        metavar="FILE",
                        )
+    group.add_argument('--bundle',
+                       dest='bundle',
+                       help="read input files from a tar or zip archive",
+                       metavar="ARCHIVE",
+                       )
     group.add_argument('-c', '--concatenate',
                        action='store_true',
                        dest='concatenate',
@@ -126,15 +331,43 @@ def parse_args(args=None):
                        action='append',
                        dest='args',
                        type=_PyArg,
-                       help="evaluate a python expression",
+                       help="evaluate a python expression once a template "
+                            "uses it",
                        metavar="NAME=EXPRESSION",
                        )
+    group.add_argument('--data',
+                       action='append',
+                       dest='data',
+                       help="provide the content of a JSON, YAML, TOML or "
+                            "INI file",
+                       metavar="NAME=FILE",
+                       )
+    group.add_argument('--table',
+                       dest='table',
+                       help="apply the template to every row of a CSV file "
+                            "with a header row naming the columns, joining "
+                            "the results",
+                       metavar="FILE",
+                       )
     group.add_argument('-n', '--next',
                        action='append_const',
                        dest='args',
                        const='--',
                        help="begin next argument group",
                        )
+    group.add_argument('--matrix',
+                       action='append',
+                       dest='matrix',
+                       help="combine every argument group with each value",
+                       metavar="NAME=VALUE,...",
+                       )
+    group.add_argument('--matrix-file',
+                       action='append',
+                       dest='matrix',
+                       type=_MatrixFile,
+                       help="like --matrix, reading one value per line",
+                       metavar="NAME=FILE",
+                       )
 
     parser.add_argument(
                         dest='remainder',
@@ -152,6 +385,16 @@ def parse_args(args=None):
     if args.engine not in engines.engines:
         parser.error("Engine '%s' is not available." % (args.engine,))
 
+    if ((args.time_limit is not None or
+            args.cpu_limit is not None or
+            args.memory_limit is not None or
+            args.output_limit is not None) and
+            not governor.is_supported()):
+        parser.error("resource limits are not supported on this platform")
+
+    if args.archive and not is_archive_path(args.archive):
+        parser.error("unknown archive type '%s'" % (args.archive,))
+
     if args.vary:
         if len(args.outfiles) != 1:
             parser.error("need exactly one output file template")
@@ -193,15 +436,34 @@ def parse_args(args=None):
         if flat_args and flat_args[0] == '--':
             flat_args = flat_args[1:]
 
+    # data files are shared by all groups and only parsed when used
+    datafiles = {}
+    for text in args.data or []:
+        name, sep, path = text.partition('=')
+        if not sep or not name:
+            parser.error("invalid data file argument '%s'" % (text,))
+        try:
+            datafiles[name] = data.DataFile(path)
+        except ValueError as e:
+            parser.error(str(e))
+
+    # python expressions are only evaluated once a template uses them
+    expressions = pyargs.ExpressionCompiler()
+
     args.args = []
-    mapping = {}
+    mapping = dict(datafiles)
     for arg in flat_args:
         if isinstance(arg, _PyArg):
             name_value = arg.split('=', 1)
-            mapping[name_value[0]] = eval(name_value[1], {}, mapping)
+            try:
+                mapping[name_value[0]] = expressions.expression(
+                        name_value[1], mapping)
+            except SyntaxError as e:
+                parser.error("invalid python expression '%s': %s" % (
+                        name_value[1], e.msg))
         elif arg == '--':
             args.args.append(mapping)
-            mapping = {}
+            mapping = dict(datafiles)
         else:
             name_value = arg.split('=', 1)
             mapping[name_value[0]] = (name_value[1]
@@ -209,6 +471,22 @@ def parse_args(args=None):
                                       else None)
     args.args.append(mapping)
 
+    if args.matrix:
+        axes = []
+        for text in args.matrix:
+            try:
+                if isinstance(text, _MatrixFile):
+                    axes.append(matrix.read_axis(text))
+                else:
+                    axes.append(matrix.parse_axis(text))
+            except (IOError, ValueError) as e:
+                parser.error(str(e))
+
+        args.matrix = axes
+        args.args = matrix.Matrix(args.args, axes)
+        if not args.vary and len(args.args) != 1:
+            parser.error("matrix requires an output file template to vary")
+
     if args.remainder:
         parser.error("extraneous arguments left over")
     else:
@@ -252,6 +530,17 @@ def make_mapping(args):
     return mapping
 
 
+def describe_file(file_or_path):
+    """Return a file path or a placeholder suitable for messages."""
+    if file_or_path in (sys.stdin, sys.stdout, sys.stderr):
+        return '-'
+
+    if is_filelike(file_or_path):
+        return str(getattr(file_or_path, 'name', '<stream>'))
+
+    return str(file_or_path)
+
+
 def make_path_properties(file_or_path, prefix=''):
     """Build useful properties from a file path."""
     is_std = file_or_path in (sys.stdin, sys.stdout, sys.stderr)
@@ -305,6 +594,98 @@ def make_path_properties(file_or_path, prefix=''):
         }
 
 
+def restrict_mapping(mapping, names):
+    """Drop the names a template doesn't reference from a mapping.
+
+    Leaves the mapping alone if the referenced names are unknown (None).
+    Python argument expressions among the values left are evaluated.
+    """
+    if names is not None:
+        mapping = {name: mapping[name] for name in names if name in mapping}
+
+    return pyargs.resolve_mapping(mapping)
+
+
+def split_outputs(text, marker):
+    """Split rendered text at lines starting with a marker.
+
+    Returns the text before the first marker line, followed by pairs of
+    the file name after each marker and the text up to the next one.
+    Marker lines may come from substituted values, too, but file names
+    must be relative and stay inside the directory of the output file.
+    """
+    pattern = re.compile(r'^%s(.*)$\n?' % (re.escape(marker),), re.M)
+
+    outputs = []
+    name = None
+    pos = 0
+    for match in pattern.finditer(text):
+        outputs.append((name, text[pos:match.start()]))
+        name = match.group(1).strip()
+        if not name:
+            raise ValueError("file name missing after split marker")
+        normalized = os.path.normpath(name)
+        if (os.path.isabs(name) or os.path.splitdrive(name)[0] or
+                normalized in (os.curdir, os.pardir) or
+                normalized.startswith(os.pardir + os.sep)):
+            raise ValueError("split marker file name '%s' is outside the "
+                             "output directory" % (name,))
+        pos = match.end()
+    outputs.append((name, text[pos:]))
+
+    return outputs[0][1], outputs[1:]
+
+
+def shard_iterator(combinations, index, count, method='hash'):
+    """Pass on the combinations belonging to the INDEXth of COUNT shards.
+
+    By hash, combinations are assigned according to a stable hash of the
+    output file path, so combinations for the same path stay together.
+    By round-robin, they are assigned in turn.  Either way, the shards
+    are disjoint and cover all combinations.
+    """
+    for position, combination in enumerate(combinations):
+        if method == 'round-robin':
+            number = position
+        else:
+            number = fingerprint(describe_file(combination[0]))
+
+        if number % count == index - 1:
+            yield combination
+
+
+def constant_arguments(arggroups):
+    """Find the name-value pairs shared by all argument groups.
+
+    Leaves out names that may be overridden by file properties.
+    """
+    if isinstance(arggroups, matrix.Matrix):
+        constants = constant_arguments(arggroups.arggroups)
+        for name, values in arggroups.axes:
+            if len(values) == 1 and not name.startswith('ez_'):
+                constants[name] = values[0]
+            else:
+                constants.pop(name, None)
+
+        return constants
+
+    constants = None
+    for arggroup in arggroups:
+        if constants is None:
+            constants = {name: value for name, value in arggroup.items()
+                         if not name.startswith('ez_')}
+        else:
+            for name, value in list(constants.items()):
+                if name not in arggroup or not (arggroup[name] is value or
+                                                arggroup[name] == value):
+                    del constants[name]
+
+        if not constants:
+            break
+
+    return constants or {}
+
+
 def constant_outfile_iterator(outfiles, infiles, arggroups):
     """Iterate over all output files."""
     assert len(infiles) == 1
@@ -313,8 +694,28 @@ def constant_outfile_iterator(outfiles, infiles, arggroups):
     return ((outfile, infiles[0], arggroups[0]) for outfile in outfiles)
 
 
+class OutfileError(object):
+
+    """Stand in for an output file whose name couldn't be determined.
+
+    Lets process_combinations() report the error like other failures.
+    """
+
+    def __init__(self, name_template, error):
+        """Initialize with output file name template and exception."""
+        self.name_template = name_template
+        self.error = error
+
+    def __str__(self):
+        """Return the output file name template."""
+        return self.name_template
+
+
 def variable_outfile_iterator(outfiles, infiles, arggroups, engine):
-    """Iterate over variable output file name template."""
+    """Iterate over variable output file name template.
+
+    Errors applying the template are passed on as OutfileError objects.
+    """
     assert len(outfiles) == 1
 
     template = engine(outfiles[0], tolerant=False)
@@ -323,108 +724,817 @@ def variable_outfile_iterator(outfiles, infiles, arggroups, engine):
         properties = make_path_properties(infile, prefix='')
 
         for arggroup in arggroups:
-            outfile = template.apply(dict(arggroup, **properties))
+            try:
+                outfile = template.apply(restrict_mapping(
+                        dict(arggroup, **properties),
+                        template.referenced_names()))
+            except Exception as e:
+                outfile = OutfileError(outfiles[0], e)
             yield (outfile, infile, arggroup)
 
 
+def text_digest(text):
+    """Return length and SHA-256 hex digest of text."""
+    return len(text), hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class TableTemplate(object):
+
+    """Apply a template to every row of a table and join the results.
+
+    The table is a mapping of names to columns of equal length.  Names
+    it lacks are looked up in the mapping the table template is applied
+    to instead.
+    """
+
+    streaming = False
+
+    def __init__(self, template, columns, digest=None):
+        """Initialize with template, table and a digest of the latter."""
+        self.template = template
+        self.columns = columns
+        self.handle = template.handle
+        self.version = template.version
+        self.source_digest = (
+                hashlib.sha256((template.source_digest + digest)
+                               .encode('ascii')).hexdigest()
+                if template.source_digest is not None and digest is not None
+                else None)
+
+    def referenced_names(self):
+        """Return the names the template reads from outside the table."""
+        names = self.template.referenced_names()
+        if names is None:
+            return None
+
+        return names.difference(self.columns)
+
+    def apply(self, mapping):
+        """Apply the template to the rows, supplemented by the mapping."""
+        length = engines.table_length(self.columns)
+        columns = {name: [value] * length
+                   for name, value in mapping.items()
+                   if name not in self.columns}
+        columns.update(self.columns)
+
+        return ''.join(self.template.apply_many(columns))
+
+
 class CachedTemplateReader(object):
 
-    """Read templates and cache them."""
+    """Read templates and cache them.
 
-    def __init__(self, engine, tolerant=False):
+    Paths refer to members of the bundle instead of files if one is given.
+    Streaming engines get a way to open template files instead of their
+    content.
+    The reader may be shared between threads.
+    Templates are specialized to the constant name-value pairs if given.
+    Beyond maxsize templates, the least recently used ones are discarded.
+    """
+
+    def __init__(self, engine, tolerant=False, bundle=None, tracer=None,
+                 maxsize=256, constants=None):
         """Initialize reader."""
         self._engine = engine
         self._tolerant = tolerant
-        self._cached_templates = {}
+        self._bundle = bundle
+        self._constants = constants
+        self._tracer = tracer if tracer is not None else trace.NullTracer()
+        self._maxsize = maxsize
+        self._cached_templates = collections.OrderedDict()
+        self._lock = threading.Lock()
 
     def read(self, file_or_path):
         """Read template from cache or file."""
-        if file_or_path in self._cached_templates:
-            return self._cached_templates[file_or_path]
+        with self._lock:
+            return self._read(file_or_path)
 
-        if is_filelike(file_or_path):
-            template = file_or_path.read()
-            dirname = None
-        else:
-            with open(file_or_path, 'r') as f:
-                template = f.read()
-            dirname = os.path.dirname(file_or_path)
+    def _read(self, file_or_path):
+        """Read template from cache or file, holding the lock."""
+        if self._bundle is not None and not is_filelike(file_or_path):
+            file_or_path = bundles.normalize(file_or_path)
 
-        template = self._engine(template,
-                                dirname=dirname,
-                                tolerant=self._tolerant)
+        try:
+            template = self._cached_templates.pop(file_or_path)
+        except KeyError:
+            pass
+        else:
+            self._cached_templates[file_or_path] = template
+            return template
+
+        path = describe_file(file_or_path)
+
+        with self._tracer.span('read', path=path) as span:
+            if is_filelike(file_or_path):
+                template = file_or_path.read()
+                dirname = None
+            elif self._bundle is not None:
+                template = self._bundle.read(file_or_path)
+                dirname = posixpath.dirname(file_or_path)
+            elif getattr(self._engine, 'streaming', False):
+                template = functools.partial(compression.open_text,
+                                             file_or_path, 'r')
+                dirname = os.path.dirname(file_or_path)
+            else:
+                with compression.open_text(file_or_path, 'r') as f:
+                    template = f.read()
+                dirname = os.path.dirname(file_or_path)
+
+            # streamed templates digest themselves when scanning for names
+            digest = None
+            if not callable(template):
+                span['size'], digest = text_digest(template)
+
+        handle = getattr(self._engine, 'handle', None)
+        with self._tracer.span('compile', path=path, engine=handle):
+            template = self._engine(template,
+                                    dirname=dirname,
+                                    tolerant=self._tolerant,
+                                    bundle=self._bundle)
+        if digest is not None:
+            template.source_digest = digest
+
+        if self._constants:
+            template = self.specialize(template, path)
+
+        if len(self._cached_templates) >= self._maxsize:
+            self._cached_templates.popitem(last=False)
 
         self._cached_templates[file_or_path] = template
         return template
 
+    def specialize(self, template, path):
+        """Apply the constant name-value pairs to a template in advance.
+
+        Templates that can't tell which names they reference are left
+        alone, as are those referencing expressions that fail.
+        """
+        names = template.referenced_names()
+        if names is None:
+            return template
+
+        try:
+            constants = restrict_mapping(self._constants, names)
+        except Exception:
+            return template
+
+        with self._tracer.span('specialize', path=path):
+            residual = template.specialize(constants)
+
+        if residual is not template:
+            try:
+                context = canonical_digest(constants)
+            except TypeError:
+                pass
+            else:
+                residual.source_digest = hashlib.sha256(
+                        template.source_digest.encode('ascii') +
+                        context).hexdigest()
+
+        return residual
+
+
+def describe_error(error):
+    """Return the type name and a description of an exception."""
+    error_type = type(error).__name__
+    if isinstance(error, governor.LimitExceeded):
+        return error_type, str(error)
+
+    return error_type, "%s: %s" % (error_type, error)
+
 
 def process_combinations(combinations, engine,
                          tolerant=False,
                          read_old=False,
                          delete_empty=False,
+                         only_if_changed=False,
+                         render_cache=0,
+                         sink=None,
+                         bundle=None,
+                         jobs=1,
+                         limits=None,
+                         tracer=None,
+                         renderstore=None,
+                         constants=None,
+                         dedupe=None,
+                         keep_going=False,
+                         failed=None,
+                         journal=None,
+                         templatereader=None,
+                         split_marker=None,
+                         table=None,
                          ):
-    """Process outfile-infile-arggroup combinations."""
-    outfiles = set()
+    """Process outfile-infile-arggroup combinations.
+
+    Output files are handed to the sink, which defaults to the file system.
+    With more than one job, all templates are compiled up front and
+    rendering happens in worker processes forked afterwards.
+    With only_if_changed, output files whose (uncompressed) content
+    equals the result are left alone.
+    Results are shared with other runs through renderstore if given.
+    Templates are specialized to constants, name-value pairs which must
+    be the same in all argument groups.
+    With dedupe, output files identical to an earlier one are linked to
+    it with that method ('hardlink', 'reflink' or 'copy') if possible.
+    If limits are given, each rendering happens in a child process subject
+    to them.  Renderings exceeding them are reported and left out.
+    With keep_going, the same goes for any other error.  Failures are
+    appended to the list failed as dictionaries, if given.
+    Combinations recorded in journal are skipped, and completed ones
+    are recorded there.
+    Templates of streaming engines are written to the output file as
+    they are rendered, unless rendering happens in worker processes or
+    other options need the whole result.
+    Templates are read through templatereader if given, which makes
+    tolerant, bundle and constants irrelevant.
+    With split_marker, each line starting with it begins another output
+    file named after the rest of the line, relative to the directory of
+    the output file, which gets the text before the first such line.
+    If table is given as a pair of a mapping of equal-length columns and
+    a digest of its content, templates are applied to each of its rows,
+    and the results are joined.
+    Returns the number of failures.
+    """
+    failures = 0
+    outfiles = FingerprintSet()
+    rendered = FingerprintSet()
+    originals = {}
+
+    if sink is None:
+        sink = DirectorySink()
+
+    if tracer is None:
+        tracer = trace.NullTracer()
+
+    if table is not None and constants:
+        # table columns take precedence over name-value pairs
+        constants = {name: value for name, value in constants.items()
+                     if name not in table[0]}
+
+    if templatereader is None:
+        templatereader = CachedTemplateReader(engine, tolerant=tolerant,
+                                              bundle=bundle, tracer=tracer,
+                                              constants=constants)
+    cache = RenderCache(maxsize=render_cache) if render_cache > 0 else None
+    tables = {}
+
+    def prepare(outfile, infile, arggroup):
+        """Build template and mapping plus a digest of the latter.
+
+        Also returns the preexisting content of the output file if it
+        was looked up for the template, which may be a LazyString.
+        """
+        template = templatereader.read(infile)
+        if table is not None:
+            try:
+                template = tables[template]
+            except KeyError:
+                template = tables[template] = TableTemplate(template, *table)
+        names = template.referenced_names()
 
-    templatereader = CachedTemplateReader(engine, tolerant=tolerant)
+        if names is None or any(name.startswith('ez_') for name in names):
+            properties = make_path_properties(outfile, prefix='ez_')
+        else:
+            properties = {}
 
-    for outfile, infile, arggroup in combinations:
-        template = templatereader.read(infile)
-        properties = make_path_properties(outfile, prefix='ez_')
+        if read_old and is_filelike(outfile):
+            raise Exception("cannot read already open output streams")
 
-        if read_old:
-            if is_filelike(outfile):
-                raise Exception("cannot read already open output streams")
+        old = None
+        if read_old and (names is None or 'ez_content' in names):
+            with tracer.span('read old', path=outfile):
+                old = properties['ez_content'] = sink.read_lazily(outfile)
+
+        mapping = restrict_mapping(dict(arggroup, **properties), names)
+
+        digest = None
+        if names is not None and not is_filelike(outfile):
             try:
-                with open(outfile, 'r') as f:
-                    properties['ez_content'] = f.read()
-            except IOError:
-                properties['ez_content'] = None
+                digest = canonical_digest(mapping)
+            except TypeError:
+                pass
+
+        return template, mapping, digest, old
+
+    def apply(template, mapping):
+        """Apply mapping to template, possibly subject to limits."""
+        if limits:
+            return governor.apply(template, mapping, limits)
+
+        return template.apply(mapping)
+
+    def render(outfile, template, mapping):
+        """Apply mapping to template, possibly reusing an earlier result.
+
+        Returns the result, its key in the render store (or None)
+        and whether it was found there.
+        """
+        key = (renderstore.key(template, mapping, tolerant=tolerant)
+               if renderstore is not None
+               else None)
+
+        with tracer.span('apply', path=describe_file(outfile)) as span:
+            result = renderstore.get(key) if key is not None else None
+            hit = result is not None
+
+            if not hit:
+                if cache is not None:
+                    result = cache.render(template, mapping, apply=apply)
+                else:
+                    result = apply(template, mapping)
+
+                if key is not None:
+                    renderstore.put(key, result)
+
+            span['size'] = len(result)
+            span['cached'] = hit
+
+        return result, key, hit
+
+    # features needing the whole result keep streaming engines from
+    # writing output files as they go
+    can_stream = not (limits or renderstore is not None or cache is not None
+                      or only_if_changed or delete_empty or dedupe
+                      or split_marker is not None)
+
+    def stream(outfile, template, mapping):
+        """Apply mapping to template, writing the result as it goes."""
+        with tracer.span('apply', path=describe_file(outfile), streamed=True):
+            if is_filelike(outfile):
+                template.apply_to(mapping, outfile)
+                return
+
+            if not outfiles.add((outfile,)):
+                raise IOError("trying to write twice to the same file")
+            with sink.open(outfile) as f:
+                template.apply_to(mapping, f)
 
-        result = template.apply(dict(arggroup, **properties))
+    def count(key, hit):
+        """Keep render store statistics."""
+        if key is None:
+            return
 
+        if hit:
+            renderstore.hits += 1
+        else:
+            renderstore.misses += 1
+
+    def fail(outfile, infile, stage, error_type, message):
+        """Report a failed combination."""
+        print("%s: %s -> %s: %s" % (
+                __package__,
+                describe_file(infile),
+                describe_file(outfile),
+                message,
+            ), file=sys.stderr)
+
+        if failed is not None:
+            failed.append({
+                    'infile':  describe_file(infile),
+                    'outfile': describe_file(outfile),
+                    'stage':   stage,
+                    'type':    error_type,
+                    'error':   message,
+                })
+
+    def journal_key(outfile, infile, template, digest):
+        """Return the journal key of a combination or None.
+
+        Combinations whose template or values can't be digested aren't
+        journaled, as there would be no telling whether they changed.
+        """
+        if (journal is None or is_filelike(outfile) or digest is None or
+                template.source_digest is None):
+            return None
+
+        return combination_key(outfile, describe_file(infile),
+                               template.source_digest, digest)
+
+    def is_redundant(outfile, infile, digest):
+        """Check whether an identical render went to the same file before.
+
+        Combinations agreeing in every referenced name render the same,
+        so writing them to the same file again is redundant.
+        """
+        if digest is None:
+            return False
+
+        if is_filelike(infile):
+            infile = id(infile)
+
+        return not rendered.add((outfile, infile, digest))
+
+    def find_original(result):
+        """Return a content digest and an earlier output with that content.
+
+        Both are None if not deduplicating, the latter also if there is
+        no such output file yet.
+        """
+        if dedupe is None or not result:
+            return None, None
+
+        digest = hashlib.sha256(result.encode('utf-8')).digest()
+        return digest, originals.get(digest)
+
+    def remember(outfile, digest):
+        """Remember a successfully stored output file for its content."""
+        if digest is not None:
+            originals.setdefault(digest, outfile)
+
+    def store(outfile, result, key=None, old=None):
+        """Write result to output stream or sink.
+
+        Links to the render store entry instead, if requested.
+        The preexisting content is looked up unless old is given.
+        """
         if is_filelike(outfile):
             if result:
-                outfile.write(result)
+                with tracer.span('write', path=describe_file(outfile),
+                                 size=len(result)):
+                    outfile.write(result)
         elif result or not delete_empty:
-            if outfile in outfiles:
+            if not outfiles.add((outfile,)):
                 raise IOError("trying to write twice to the same file")
-            outfiles.add(outfile)
-            with open(outfile, 'w') as f:
-                f.write(result)
+            digest, original = find_original(result)
+            if only_if_changed:
+                with tracer.span('compare', path=outfile):
+                    if old is None:
+                        old = sink.read_lazily(outfile)
+                    if old is not None and old == result:
+                        remember(outfile, digest)
+                        return
+            if isinstance(old, engines.LazyString):
+                # don't let the file change under a memory map
+                old.close()
+            if original is not None:
+                with tracer.span('link', path=outfile, original=original):
+                    if sink.link(outfile, original, method=dedupe):
+                        return
+            with tracer.span('write', path=outfile, size=len(result)):
+                if (key is None or not renderstore.link or
+                        not sink.link(outfile, renderstore.path(key))):
+                    sink.write(outfile, result)
+            remember(outfile, digest)
         else:
+            with tracer.span('remove', path=outfile):
+                sink.remove(outfile)
+
+    def emit(outfile, result, key=None, old=None):
+        """Store result, possibly split into several output files."""
+        if split_marker is None:
+            store(outfile, result, key, old)
+            return
+
+        result, outputs = split_outputs(result, split_marker)
+        store(outfile, result, old=old)
+
+        dirname = '' if is_filelike(outfile) else os.path.dirname(outfile)
+        for name, content in outputs:
+            store(os.path.join(dirname, name), content)
+
+    if jobs > 1 and workers.can_fork():
+        combinations = list(combinations)
+        for __, infile, __ in combinations:
+            templatereader.read(infile)
+
+        def work(index):
+            """Render a combination inside a worker process.
+
+            Returns the trace events recorded meanwhile, too.
+            """
+            mark = tracer.mark()
+            outfile, infile, arggroup = combinations[index]
+            digest = done = result = key = failure = None
+            skipped = hit = False
+            stage = 'outfile'
+            try:
+                if isinstance(outfile, OutfileError):
+                    raise outfile.error
+
+                stage = 'prepare'
+                template, mapping, digest, __ = prepare(outfile, infile,
+                                                        arggroup)
+                done = journal_key(outfile, infile, template, digest)
+                if done is not None and done in journal:
+                    skipped = True
+                else:
+                    stage = 'render'
+                    result, key, hit = render(outfile, template, mapping)
+            except governor.LimitExceeded as e:
+                failure = (stage,) + describe_error(e)
+            except Exception as e:
+                if not keep_going:
+                    raise
+                failure = (stage,) + describe_error(e)
+
+            return (digest, done, skipped, result, key, hit, failure,
+                    tracer.since(mark))
+
+        results = workers.map_forked(work, len(combinations), jobs)
+        for index, (digest, done, skipped, result, key, hit, failure,
+                    events) in enumerate(results):
+            tracer.extend(events)
+            outfile, infile, __ = combinations[index]
+            if skipped:
+                journal.skipped += 1
+                continue
+
+            count(key, hit)
+            if failure is not None:
+                fail(outfile, infile, *failure)
+                failures += 1
+                continue
+
+            if is_redundant(outfile, infile, digest):
+                continue
+
             try:
-                os.remove(outfile)
-            except OSError as e:
-                if e.errno != errno.ENOENT:
+                emit(outfile, result, key)
+            except Exception as e:
+                if not keep_going:
                     raise
+                fail(outfile, infile, 'write', *describe_error(e))
+                failures += 1
+            else:
+                if done is not None:
+                    sink.after_commit(functools.partial(journal.add, done))
 
+        return failures
 
-def perform_templating(args):
+    for outfile, infile, arggroup in combinations:
+        stage = 'outfile'
+        try:
+            if isinstance(outfile, OutfileError):
+                raise outfile.error
+
+            stage = 'prepare'
+            template, mapping, digest, old = prepare(outfile, infile,
+                                                     arggroup)
+            if is_redundant(outfile, infile, digest):
+                continue
+
+            done = journal_key(outfile, infile, template, digest)
+            if done is not None and done in journal:
+                journal.skipped += 1
+                continue
+
+            stage = 'render'
+            if can_stream and template.streaming and old is None:
+                stream(outfile, template, mapping)
+            else:
+                result, key, hit = render(outfile, template, mapping)
+                count(key, hit)
+
+                stage = 'write'
+                emit(outfile, result, key, old)
+        except governor.LimitExceeded as e:
+            fail(outfile, infile, stage, *describe_error(e))
+            failures += 1
+        except Exception as e:
+            if not keep_going:
+                raise
+            fail(outfile, infile, stage, *describe_error(e))
+            failures += 1
+        else:
+            if done is not None:
+                sink.after_commit(functools.partial(journal.add, done))
+
+    return failures
+
+
+def explain_vars(infiles, arggroups, engine, tolerant=False, bundle=None,
+                 target=sys.stdout):
+    """Report the names templates reference and how arguments match up."""
+    templatereader = CachedTemplateReader(engine, tolerant=tolerant,
+                                          bundle=bundle)
+    properties = set(make_path_properties('', prefix='ez_'))
+    properties.add('ez_content')
+
+    for infile in infiles:
+        template = templatereader.read(infile)
+        names = template.referenced_names()
+
+        print("%s:" % (make_path_properties(infile)['path'],), file=target)
+        if names is None:
+            print("  referenced names cannot be determined", file=target)
+            continue
+
+        print("  referenced: %s" % (", ".join(sorted(names)) or "-",),
+              file=target)
+        for number, arggroup in enumerate(arggroups, 1):
+            unused = sorted(set(arggroup) - names)
+            missing = sorted(names - set(arggroup) - properties)
+            print("  group %d: unused: %s; missing: %s" % (
+                    number,
+                    ", ".join(unused) or "-",
+                    ", ".join(missing) or "-",
+                ), file=target)
+
+
+def perform_templating(args, tracer=None):
     """Perform templating according to the given arguments."""
     engine = engines.engines[args.engine]
+    bundle = bundles.open_bundle(args.bundle) if args.bundle else None
+    journal = None
+    failed = []
 
-    if args.vary:
-        it = variable_outfile_iterator(args.outfiles,
-                                       args.infiles,
-                                       args.args,
-                                       engine)
-    else:
-        it = constant_outfile_iterator(args.outfiles,
-                                       args.infiles,
-                                       args.args)
-
-    process_combinations(it, engine,
+    try:
+        if args.explain_vars:
+            explain_vars(args.infiles, args.args, engine,
                          tolerant=args.tolerant,
-                         read_old=args.read_old,
-                         delete_empty=args.delete_empty,
+                         bundle=bundle,
                          )
+            return 0
+
+        if args.vary:
+            it = variable_outfile_iterator(args.outfiles,
+                                           args.infiles,
+                                           args.args,
+                                           engine)
+        else:
+            it = constant_outfile_iterator(args.outfiles,
+                                           args.infiles,
+                                           args.args)
+
+        if args.shard:
+            it = shard_iterator(it, *args.shard, method=args.shard_by)
+
+        sink = (open_sink(args.archive)
+                if args.archive
+                else DirectorySink(level=args.compress_level,
+                                   lock=args.lock,
+                                   sync=args.sync))
+
+        limits = governor.Limits(time=args.time_limit,
+                                 cpu=args.cpu_limit,
+                                 memory=args.memory_limit,
+                                 output=args.output_limit,
+                                 )
+
+        renderstore = (store.RenderStore(args.cache_dir,
+                                         max_size=args.cache_max_size,
+                                         link=args.cache_link)
+                       if args.cache_dir
+                       else None)
+
+        if args.resume:
+            journal = Journal(args.resume)
+
+        table = data.read_table(args.table) if args.table else None
+
+        with sink:
+            failures = process_combinations(
+                    it, engine,
+                    tolerant=args.tolerant,
+                    read_old=args.read_old,
+                    delete_empty=args.delete_empty,
+                    only_if_changed=args.only_if_changed,
+                    render_cache=args.render_cache,
+                    sink=sink,
+                    bundle=bundle,
+                    jobs=args.jobs,
+                    limits=limits,
+                    tracer=tracer,
+                    renderstore=renderstore,
+                    constants=(constant_arguments(args.args)
+                               if args.specialize
+                               else None),
+                    dedupe=args.dedupe,
+                    keep_going=args.keep_going,
+                    failed=failed,
+                    journal=journal,
+                    split_marker=args.split_marker,
+                    table=table,
+                )
+
+        if journal is not None and journal.skipped:
+            print("%s: skipped %d file(s) completed before" % (
+                    __package__, journal.skipped), file=sys.stderr)
+
+        if renderstore is not None:
+            renderstore.evict()
+            if args.cache_stats:
+                print("%s: %s" % (__package__, renderstore.report()),
+                      file=sys.stderr)
+    finally:
+        if journal is not None:
+            journal.close()
+        if bundle is not None:
+            bundle.close()
+
+    if args.failure_report:
+        with open(args.failure_report, 'w') as f:
+            json.dump({'failures': failed}, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    if failures:
+        print("%s: %d file(s) failed to render" % (__package__, failures),
+              file=sys.stderr)
+        return 1
+
+    return 0
+
+
+def parse_compile_args(args=None):
+    """Parse command line arguments of the compile subcommand."""
+    parser = argparse.ArgumentParser(
+            prog=__package__ + ' compile',
+            description='Compile a template into a Python module providing '
+                        'render(mapping) and render_to(mapping, stream).',
+        )
+    parser.add_argument('-e', '--engine',
+                        dest='engine',
+                        default='string.Template',
+                        help="templating engine",
+                        metavar="ENGINE",
+                        )
+    parser.add_argument('-t', '--tolerant',
+                        action='store_true',
+                        dest='tolerant',
+                        help="don't fail on missing names",
+                        )
+    parser.add_argument('-o', '--outfile',
+                        dest='outfile',
+                        help="module file to write (default: stdout)",
+                        metavar="FILE",
+                        )
+    parser.add_argument(dest='infile',
+                        help="template file",
+                        metavar="TEMPLATE",
+                        )
+
+    args = parser.parse_args(args)
+
+    if args.engine == 'help':
+        dump_engines()
+        parser.exit(0)
+
+    if args.engine not in engines.engines:
+        parser.error("Engine '%s' is not available." % (args.engine,))
+
+    return args
+
+
+def compile_template(args):
+    """Write a module rendering a template according to the arguments."""
+    engine = engines.engines[args.engine]
+
+    if args.infile == '-':
+        text = sys.stdin.read()
+        dirname = None
+    else:
+        with compression.open_text(args.infile, 'r') as f:
+            text = f.read()
+        dirname = os.path.dirname(args.infile)
+
+    try:
+        source = engine(text, dirname=dirname,
+                        tolerant=args.tolerant).python_source()
+    except (NotImplementedError, ValueError) as e:
+        print("%s: %s" % (__package__, e), file=sys.stderr)
+        return 1
+
+    source = (
+            '# -*- coding: utf-8 -*-\n'
+            '"""Render %s.\n'
+            '\n'
+            'Generated by %s %s using the %s engine.\n'
+            '"""\n'
+            '\n' % (describe_file(args.infile), __package__, __version__,
+                     args.engine)
+        ) + source
+
+    if not args.outfile or args.outfile == '-':
+        sys.stdout.write(source)
+    else:
+        with io.open(args.outfile, 'w', encoding='utf-8') as f:
+            f.write(source)
+
+    return 0
 
 
 def main_command():
     """Parse command line arguments and perform main action."""
+    if sys.argv[1:2] == ['compile']:
+        return compile_template(parse_compile_args(sys.argv[2:]))
+
+    start = trace.now()
     args = parse_args()
-    perform_templating(args)
+
+    if not args.trace:
+        return perform_templating(args)
+
+    tracer = trace.Tracer()
+    tracer.add('parse arguments', start, trace.now() - start)
+    for module_name, import_start, import_end in engines.import_times:
+        tracer.add('import engine', import_start * 1e6,
+                   (import_end - import_start) * 1e6,
+                   {'module': module_name})
+
+    try:
+        return perform_templating(args, tracer=tracer)
+    finally:
+        tracer.write(args.trace)
 
 
 if __name__ == '__main__':
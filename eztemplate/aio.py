@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""Provide rendering for asyncio applications without blocking the loop.
+
+Requires Python 3.6 or later.
+"""
+
+import asyncio
+import collections
+import functools
+import weakref
+
+from . import engines
+from .__main__ import (CachedTemplateReader, make_path_properties,
+                       restrict_mapping)
+from .sinks import DirectorySink
+
+
+class AsyncRenderer(object):
+
+    """Render templates on behalf of coroutines.
+
+    Templates are read and output files written in threads, and templates
+    are applied in the given executor, or else the event loop's default
+    one.  At most concurrency renderings per event loop are in progress
+    at a time.
+    Compiled templates are cached in templatereader, which may be shared
+    with process_combinations().
+    """
+
+    def __init__(self, engine='string.Template', tolerant=False, bundle=None,
+                 sink=None, executor=None, concurrency=8,
+                 templatereader=None):
+        """Initialize renderer."""
+        if not isinstance(engine, type):
+            engine = engines.engines[engine]
+
+        if templatereader is None:
+            templatereader = CachedTemplateReader(engine, tolerant=tolerant,
+                                                  bundle=bundle)
+
+        self.templatereader = templatereader
+        self.sink = sink if sink is not None else DirectorySink()
+        self.executor = executor
+        self.concurrency = concurrency
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    async def _in_thread(self, function, *args):
+        """Call a function in a thread of the default executor."""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, function, *args)
+
+    async def read(self, infile):
+        """Return the (possibly cached) compiled template."""
+        return await self._in_thread(self.templatereader.read, infile)
+
+    async def render(self, infile, mapping, outfile=None):
+        """Return the template applied to a mapping.
+
+        The properties of outfile are available as ez_ names if given.
+        """
+        loop = asyncio.get_event_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(
+                    self.concurrency)
+
+        async with semaphore:
+            template = await self.read(infile)
+            names = template.referenced_names()
+
+            if outfile is not None and (
+                    names is None or
+                    any(name.startswith('ez_') for name in names)):
+                mapping = dict(mapping,
+                               **make_path_properties(outfile, prefix='ez_'))
+
+            return await loop.run_in_executor(
+                    self.executor,
+                    functools.partial(template.apply,
+                                      restrict_mapping(mapping, names)))
+
+    async def write(self, outfile, result):
+        """Hand the result to the sink."""
+        await self._in_thread(self.sink.write, outfile, result)
+
+    async def process(self, outfile, infile, arggroup):
+        """Render a combination and write the output file.
+
+        Cancelling interrupts waiting for the result, but a write already
+        in progress is completed.
+        """
+        result = await self.render(infile, arggroup, outfile=outfile)
+        await self.write(outfile, result)
+        return result
+
+    async def process_combinations(self, combinations):
+        """Process outfile-infile-arggroup combinations.
+
+        Yields pairs of output file and result in order, working on up to
+        concurrency combinations ahead.  Those are cancelled when the
+        generator is closed early.
+        """
+        iterator = iter(combinations)
+        pending = collections.deque()
+
+        try:
+            while True:
+                for outfile, infile, arggroup in iterator:
+                    pending.append((outfile, asyncio.ensure_future(
+                            self.process(outfile, infile, arggroup))))
+                    if len(pending) >= self.concurrency:
+                        break
+
+                if not pending:
+                    return
+
+                outfile, task = pending.popleft()
+                yield outfile, await task
+        finally:
+            for __, task in pending:
+                task.cancel()
+
+
+# renderers used by render_async() by engine and tolerant mode
+_renderers = {}
+
+
+async def render_async(infile, mapping, engine='string.Template',
+                       tolerant=False, outfile=None):
+    """Return a template file applied to a mapping.
+
+    The result is written to outfile, too, if given.  Compiled templates
+    are cached between calls.
+    """
+    try:
+        renderer = _renderers[engine, tolerant]
+    except KeyError:
+        renderer = _renderers[engine, tolerant] = AsyncRenderer(
+                engine=engine, tolerant=tolerant)
+
+    if outfile is None:
+        return await renderer.render(infile, mapping)
+
+    return await renderer.process(outfile, infile, mapping)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""Provide access to template files bundled in an archive."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import posixpath
+import tarfile
+import zipfile
+
+
+def normalize(name):
+    """Normalize a member name to a relative path without dot components."""
+    name = posixpath.normpath(name.replace('\\', '/')).lstrip('/')
+    return '' if name == '.' else name
+
+
+class Bundle(object):
+
+    """Abstract class representing an archive of template files.
+
+    The members are indexed once on opening, but only decompressed
+    when they are actually read.
+    """
+
+    def __init__(self, encoding='utf-8'):
+        """Initialize empty index."""
+        self.encoding = encoding
+        self._index = {}
+
+    def __contains__(self, name):
+        """Check whether a member exists."""
+        return normalize(name) in self._index
+
+    def names(self):
+        """Return the names of all members."""
+        return sorted(self._index)
+
+    def read(self, name):
+        """Read and decode a member."""
+        try:
+            member = self._index[normalize(name)]
+        except KeyError:
+            raise IOError("no such file in bundle: %s" % (name,))
+
+        return self._read_member(member).decode(self.encoding)
+
+    def _read_member(self, member):
+        """Read the raw content of an indexed member."""
+        raise NotImplementedError
+
+    def close(self):
+        """Close the underlying archive."""
+        self.archive.close()
+
+    def __enter__(self):
+        """Provide context manager interface."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close bundle on leaving context."""
+        self.close()
+
+
+class TarBundle(Bundle):
+
+    """Provide template files from a (possibly compressed) tar archive."""
+
+    def __init__(self, path, **kwargs):
+        """Open archive and index regular files."""
+        super(TarBundle, self).__init__(**kwargs)
+
+        self.archive = tarfile.open(path, 'r:*')
+        for member in self.archive.getmembers():
+            if member.isfile():
+                self._index[normalize(member.name)] = member
+
+    def _read_member(self, member):
+        """Extract member."""
+        f = self.archive.extractfile(member)
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+
+class ZipBundle(Bundle):
+
+    """Provide template files from a zip archive."""
+
+    def __init__(self, path, **kwargs):
+        """Open archive and index files."""
+        super(ZipBundle, self).__init__(**kwargs)
+
+        self.archive = zipfile.ZipFile(path, 'r')
+        for member in self.archive.infolist():
+            if not member.filename.endswith('/'):
+                self._index[normalize(member.filename)] = member
+
+    def _read_member(self, member):
+        """Decompress member."""
+        return self.archive.read(member)
+
+
+def open_bundle(path):
+    """Open a tar or zip archive as template bundle."""
+    if zipfile.is_zipfile(path):
+        return ZipBundle(path)
+
+    if tarfile.is_tarfile(path):
+        return TarBundle(path)
+
+    raise ValueError("not a tar or zip archive: %s" % (path,))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""Provide memoization of rendering results."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import collections
+import hashlib
+import numbers
+
+try:
+    basestring
+except NameError:
+    basestring = str
+
+try:
+    from collections.abc import Mapping, Set
+except ImportError:
+    from collections import Mapping, Set
+
+from .engines import LazyString
+
+
+def canonicalize(value):
+    """Transform value into an equivalent nested tuple of plain values.
+
+    Equal values yield equal results regardless of e. g. mapping order.
+    Raises TypeError for values that cannot be represented faithfully.
+    """
+    if isinstance(value, LazyString):
+        value = value.value()
+
+    if value is None or isinstance(value, (bool, numbers.Number, basestring)):
+        return (type(value).__name__, value)
+
+    if isinstance(value, Mapping):
+        if hasattr(type(value), 'canonical'):
+            # e. g. data files, which are cheaper to identify by content
+            return value.canonical()
+        return ('mapping', tuple(sorted((canonicalize(n), canonicalize(v))
+                                        for n, v in value.items())))
+
+    if isinstance(value, Set):
+        return ('set', tuple(sorted(canonicalize(item) for item in value)))
+
+    if isinstance(value, (list, tuple)):
+        return ('sequence', tuple(canonicalize(item) for item in value))
+
+    raise TypeError("cannot canonicalize %s" % (type(value).__name__,))
+
+
+def canonical_digest(mapping, names=None):
+    """Compute a digest of a mapping, possibly restricted to some names.
+
+    Raises TypeError if the mapping contains uncanonicalizable values.
+    """
+    if names is not None:
+        mapping = {name: value for name, value in mapping.items()
+                   if name in names}
+
+    return hashlib.sha1(repr(canonicalize(mapping)).encode('utf-8')).digest()
+
+
+class RenderCache(object):
+
+    """Remember rendering results for identical template contexts.
+
+    Results are keyed on the template object and a digest of the values
+    the template references (or all values, if the template can't tell).
+    The least recently used results are discarded beyond maxsize entries.
+    """
+
+    def __init__(self, maxsize=1024):
+        """Initialize empty cache."""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = collections.OrderedDict()
+
+    def render(self, template, mapping, apply=None):
+        """Apply mapping to template, reusing an identical earlier result.
+
+        Rendering is delegated to apply(template, mapping) if given.
+        """
+        if apply is None:
+            apply = type(template).apply
+
+        try:
+            key = (template,
+                   canonical_digest(mapping, template.referenced_names()))
+        except TypeError:
+            self.misses += 1
+            return apply(template, mapping)
+
+        try:
+            result = self._results.pop(key)
+        except KeyError:
+            self.misses += 1
+            result = apply(template, mapping)
+            if len(self._results) >= self.maxsize:
+                self._results.popitem(last=False)
+        else:
+            self.hits += 1
+
+        self._results[key] = result
+        return result
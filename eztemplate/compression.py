@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""Provide transparent compression according to file name suffixes."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import bz2
+import gzip
+import io
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+
+def _open_gzip(path, mode, level):
+    """Open a gzip file in binary mode."""
+    return gzip.open(path, mode, compresslevel=9 if level is None else level)
+
+
+def _open_bz2(path, mode, level):
+    """Open a bzip2 file in binary mode."""
+    return bz2.BZ2File(path, mode,
+                       compresslevel=9 if level is None else level)
+
+
+def _open_xz(path, mode, level):
+    """Open an xz file in binary mode."""
+    if 'w' in mode:
+        return lzma.open(path, mode, preset=level)
+    return lzma.open(path, mode)
+
+
+CODECS = {
+        '.gz':  _open_gzip,
+        '.bz2': _open_bz2,
+    }
+
+# errors signalling corrupt compressed data
+ERRORS = (IOError, EOFError)
+
+if lzma is not None:
+    CODECS['.xz'] = _open_xz
+    ERRORS += (lzma.LZMAError,)
+
+
+def compression_suffix(path):
+    """Return the compression suffix of a path or None."""
+    for suffix in CODECS:
+        if path.lower().endswith(suffix):
+            return suffix
+
+    return None
+
+
+def open_text(path, mode='r', level=None, encoding='utf-8'):
+    """Open a text file, (de)compressing it if the suffix calls for it.
+
+    The level ranges from 1 (fastest) to 9 (smallest), with the
+    codec's default if None.  Uncompressed files are opened as usual.
+    """
+    suffix = compression_suffix(path)
+    if suffix is None:
+        return open(path, mode)
+
+    binary = CODECS[suffix](path, mode.replace('t', '') + 'b', level)
+    return io.TextIOWrapper(binary, encoding=encoding)
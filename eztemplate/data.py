@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+"""Provide structured data files as lazily loaded mappings."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import csv
+import hashlib
+import io
+import json
+import re
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+try:
+    import configparser
+except ImportError:
+    import ConfigParser as configparser
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+try:
+    import tomllib as toml
+except ImportError:
+    try:
+        import toml
+    except ImportError:
+        toml = None
+
+from . import compression
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.S)
+_SCALAR = re.compile(r'[^ \t\n\r,\]}]+')
+_STRUCTURE = re.compile(r'["\[\]{}]')
+
+_decoder = json.JSONDecoder()
+
+
+def _skip_whitespace(text, pos):
+    """Return the position of the next non-whitespace character."""
+    return _WHITESPACE.match(text, pos).end()
+
+
+def _skip_value(text, pos):
+    """Return the position after the JSON value at pos, without decoding."""
+    c = text[pos:pos + 1]
+
+    if c == '"':
+        match = _STRING.match(text, pos)
+        if not match:
+            raise ValueError("unterminated string at %d" % (pos,))
+        return match.end()
+
+    if c not in ('{', '['):
+        match = _SCALAR.match(text, pos)
+        if not match:
+            raise ValueError("expecting value at %d" % (pos,))
+        return match.end()
+
+    depth = 0
+    while True:
+        match = _STRUCTURE.search(text, pos)
+        if not match:
+            raise ValueError("unterminated structure")
+
+        c = match.group()
+        if c == '"':
+            pos = _skip_value(text, match.start())
+            continue
+
+        pos = match.end()
+        depth += 1 if c in ('{', '[') else -1
+        if not depth:
+            return pos
+
+
+class LazyJSONObject(Mapping):
+
+    """Represent a JSON object whose members are decoded on first access.
+
+    Only the keys are decoded up front.  Nested objects are lazy again,
+    other values are decoded completely when they are first looked up.
+    """
+
+    def __init__(self, text, pos=0):
+        """Index the members of the object starting at pos in text."""
+        self._text = text
+        self._positions = {}
+        self._values = {}
+
+        pos = _skip_whitespace(text, pos)
+        if text[pos:pos + 1] != '{':
+            raise ValueError("expecting object at %d" % (pos,))
+
+        pos = _skip_whitespace(text, pos + 1)
+        if text[pos:pos + 1] == '}':
+            self.end = pos + 1
+            return
+
+        while True:
+            if text[pos:pos + 1] != '"':
+                raise ValueError("expecting property name at %d" % (pos,))
+            key, pos = json.decoder.scanstring(text, pos + 1)
+
+            pos = _skip_whitespace(text, pos)
+            if text[pos:pos + 1] != ':':
+                raise ValueError("expecting ':' at %d" % (pos,))
+
+            pos = _skip_whitespace(text, pos + 1)
+            self._positions[key] = pos
+
+            pos = _skip_whitespace(text, _skip_value(text, pos))
+            c = text[pos:pos + 1]
+            if c == '}':
+                self.end = pos + 1
+                return
+            if c != ',':
+                raise ValueError("expecting ',' or '}' at %d" % (pos,))
+
+            pos = _skip_whitespace(text, pos + 1)
+
+    def __getitem__(self, key):
+        """Decode the member if necessary and return it."""
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+
+        pos = self._positions[key]
+        if self._text[pos] == '{':
+            value = LazyJSONObject(self._text, pos)
+        else:
+            value, __ = _decoder.raw_decode(self._text, pos)
+
+        self._values[key] = value
+        return value
+
+    def __iter__(self):
+        """Iterate over the keys."""
+        return iter(self._positions)
+
+    def __len__(self):
+        """Return the number of members."""
+        return len(self._positions)
+
+
+def _read_text(path):
+    """Read a text file, decompressing it if the suffix calls for it."""
+    if compression.compression_suffix(path) is not None:
+        f = compression.open_text(path, 'r')
+    else:
+        f = io.open(path, 'r', encoding='utf-8')
+
+    with f:
+        return f.read()
+
+
+def _load_json(path):
+    """Load a JSON file, deferring decoding of objects."""
+    text = _read_text(path)
+    value = LazyJSONObject(text)
+    if _skip_whitespace(text, value.end) != len(text):
+        raise ValueError("extra data after object")
+
+    return value
+
+
+def _load_yaml(path):
+    """Load a YAML file."""
+    return yaml.safe_load(_read_text(path))
+
+
+def _load_toml(path):
+    """Load a TOML file."""
+    return toml.loads(_read_text(path))
+
+
+def _load_ini(path):
+    """Load an INI file as a mapping of sections to mappings."""
+    parser = configparser.RawConfigParser()
+    read = getattr(parser, 'read_file', None) or parser.readfp
+    read(io.StringIO(_read_text(path)))
+
+    return {section: dict(parser.items(section))
+            for section in parser.sections()}
+
+
+# suffix: (format name, loader, available)
+FORMATS = {
+        '.json': ('JSON', _load_json, True),
+        '.yaml': ('YAML', _load_yaml, yaml is not None),
+        '.yml':  ('YAML', _load_yaml, yaml is not None),
+        '.toml': ('TOML', _load_toml, toml is not None),
+        '.ini':  ('INI', _load_ini, True),
+        '.cfg':  ('INI', _load_ini, True),
+    }
+
+
+def data_format(path):
+    """Return format name and loader of a data file according to its suffix.
+
+    Raises ValueError if the format is unknown or unavailable.
+    """
+    suffix = compression.compression_suffix(path)
+    base = (path[:-len(suffix)] if suffix else path).lower()
+
+    for suffix, (name, loader, available) in FORMATS.items():
+        if base.endswith(suffix):
+            if not available:
+                raise ValueError("support for %s files is not available"
+                                 % (name,))
+            return name, loader
+
+    raise ValueError("unknown data file type '%s'" % (path,))
+
+
+class DataFile(Mapping):
+
+    """Provide the top level mapping of a data file.
+
+    The file isn't read before the first access and is parsed only once,
+    so the same instance can be shared by any number of contexts.
+    """
+
+    def __init__(self, path):
+        """Initialize with path, checking that its format is supported."""
+        self.path = path
+        self.format, self._loader = data_format(path)
+        self._root = None
+        self._canonical = None
+
+    def _load(self):
+        """Return the parsed content, parsing the file if necessary."""
+        if self._root is None:
+            root = self._loader(self.path)
+            if not isinstance(root, Mapping):
+                raise ValueError("top level of '%s' is not a mapping"
+                                 % (self.path,))
+
+            self._root = root
+
+        return self._root
+
+    def __getitem__(self, key):
+        """Look up a top level name."""
+        return self._load()[key]
+
+    def __iter__(self):
+        """Iterate over the top level names."""
+        return iter(self._load())
+
+    def __len__(self):
+        """Return the number of top level names."""
+        return len(self._load())
+
+    def __repr__(self):
+        """Describe the data file without loading it."""
+        return '<%s %s file %r>' % (self.__class__.__name__,
+                                    self.format, self.path)
+
+    def canonical(self):
+        """Return an equivalent plain value based on the file content.
+
+        Avoids decoding the whole file just to identify it.
+        """
+        if self._canonical is None:
+            h = hashlib.sha256()
+            with io.open(self.path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 16), b''):
+                    h.update(chunk)
+
+            self._canonical = ('data', self.format, h.hexdigest())
+
+        return self._canonical
+
+
+def read_table(path):
+    """Read a CSV file with a header row as a mapping of columns.
+
+    Returns the columns and a digest of the file content.
+    """
+    text = _read_text(path)
+    rows = [row for row in csv.reader(io.StringIO(text)) if row]
+    if not rows:
+        raise ValueError("'%s' lacks a header row" % (path,))
+
+    header = rows.pop(0)
+    if len(set(header)) != len(header):
+        raise ValueError("'%s' has duplicate column names" % (path,))
+    for number, row in enumerate(rows, 2):
+        if len(row) != len(header):
+            raise ValueError("row %d of '%s' has %d fields instead of %d"
+                             % (number, path, len(row), len(header)))
+
+    columns = {name: list(column)
+               for name, column in zip(header, zip(*rows))}
+    for name in header:
+        columns.setdefault(name, [])
+
+    return columns, hashlib.sha256(text.encode('utf-8')).hexdigest()
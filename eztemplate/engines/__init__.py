@@ -4,16 +4,113 @@
 from __future__ import absolute_import
 from __future__ import print_function
 
-import collections
 import itertools
 import numbers
 import sys
+import time
 
 try:
     basestring
 except NameError:
     basestring = str
 
+try:
+    from collections.abc import Iterable, Mapping, Sized
+except ImportError:
+    from collections import Iterable, Mapping, Sized
+
+
+_UNLOADED = object()
+
+
+class LazyString(object):
+
+    """Represent a string that is only produced when it is needed.
+
+    Behaves like the string in most respects.  Subclasses implement load(),
+    which may also return None.
+    """
+
+    _value = _UNLOADED
+
+    def load(self):
+        """Produce the value."""
+        raise NotImplementedError
+
+    def is_loaded(self):
+        """Check whether the value has been produced already."""
+        return self._value is not _UNLOADED
+
+    def value(self):
+        """Return the value, producing it on first use."""
+        if self._value is _UNLOADED:
+            self._value = self.load()
+
+        return self._value
+
+    def equals(self, text):
+        """Compare the value to a string."""
+        return self.value() == text
+
+    def close(self):
+        """Release resources held for producing the value."""
+        pass
+
+    def __eq__(self, other):
+        """Compare to another (possibly lazy) string."""
+        if isinstance(other, LazyString):
+            other = other.value()
+
+        return self.equals(other)
+
+    def __ne__(self, other):
+        """Compare to another (possibly lazy) string."""
+        return not self == other
+
+    def __hash__(self):
+        """Hash like the value."""
+        return hash(self.value())
+
+    def __str__(self):
+        """Return the value."""
+        value = self.value()
+        return value if isinstance(value, basestring) else str(value)
+
+    def __format__(self, format_spec):
+        """Format the value."""
+        return format(self.value(), format_spec)
+
+    def __len__(self):
+        """Return length of the value."""
+        return len(self.value())
+
+    def __iter__(self):
+        """Iterate over the value."""
+        return iter(self.value())
+
+    def __contains__(self, item):
+        """Check for a substring."""
+        return item in self.value()
+
+    def __getitem__(self, index):
+        """Index or slice the value."""
+        return self.value()[index]
+
+    def __add__(self, other):
+        """Concatenate to the value."""
+        return self.value() + other
+
+    def __radd__(self, other):
+        """Concatenate the value to something."""
+        return other + self.value()
+
+    def __getattr__(self, name):
+        """Provide the methods of the value."""
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        return getattr(self.value(), name)
+
 
 class Engine(object):
 
@@ -21,8 +118,22 @@ class Engine(object):
 
     handle = None
 
-    def __init__(self, dirname=None, tolerant=False, **kwargs):
-        """Initialize template, potentially "compiling" it."""
+    # version of the third party package doing the actual work, if any
+    version = None
+
+    # digest of the template source, set by whoever read the template
+    source_digest = None
+
+    # whether the template may be passed as a callable opening a text
+    # stream, so huge templates don't have to be read into memory
+    streaming = False
+
+    def __init__(self, dirname=None, tolerant=False, bundle=None, **kwargs):
+        """Initialize template, potentially "compiling" it.
+
+        Includes are resolved relative to dirname, which refers to a
+        directory inside the bundle instead of the file system if given.
+        """
         assert self.__class__ is not Engine, (
                 "must only instantiate subclasses of Engine")
 
@@ -34,6 +145,9 @@ class Engine(object):
 
     def str(self, value, tolerant=False, limit=1000, seen=frozenset()):
         """Transform value into a representation suitable for substitution."""
+        if isinstance(value, LazyString):
+            value = value.value()
+
         if value is None:
             if tolerant:
                 return ""
@@ -43,7 +157,7 @@ class Engine(object):
         if isinstance(value, (bool, numbers.Number, basestring)):
             return str(value)
 
-        if not isinstance(value, collections.Iterable):
+        if not isinstance(value, Iterable):
             if not tolerant:
                 raise ValueError("unknown value type")
 
@@ -60,7 +174,7 @@ class Engine(object):
 
             return "<%s>" % (name,)
 
-        is_mapping = isinstance(value, collections.Mapping)
+        is_mapping = isinstance(value, Mapping)
 
         if not seen:
             wrap = "%s"
@@ -81,14 +195,14 @@ class Engine(object):
                       self.str(v, tolerant=tolerant, limit=limit, seen=seen))
                      for n, v in value.items()]
             items.sort()
-            items = ("%s=%s" for n, v in items)
+            items = ("%s=%s" % (n, v) for n, v in items)
         else:
             it = iter(value)
             items = [self.str(item, tolerant=tolerant, limit=limit, seen=seen)
                      for item in itertools.islice(
                          it,
                          len(value)
-                         if isinstance(value, collections.Sized)
+                         if isinstance(value, Sized)
                          else limit)]
             items.sort()
             try:
@@ -102,13 +216,115 @@ class Engine(object):
 
         return wrap % (", ".join(items),)
 
+    def referenced_names(self):
+        """Return the set of names the template reads, or None if unknown."""
+        return None
+
+    def specialize(self, mapping):
+        """Return a template with the given name-value-pairs applied.
+
+        The residual template renders the same as the original one for
+        any mapping agreeing with the given one.  Engines that can't do
+        that return the template itself.
+        """
+        return self
+
     def apply(self, mapping):
         """Apply a mapping of name-value-pairs to a template."""
         raise NotImplementedError
 
+    def apply_many(self, columns):
+        """Apply the template to each row of a table.
+
+        The table is a mapping of names to sequences of equal length.
+        Returns the list of results.
+        """
+        names = list(columns)
+        return [self.apply(dict(zip(names, row)))
+                for row in zip(*(columns[name] for name in names))]
+
+    def apply_to(self, mapping, stream):
+        """Write the template with a mapping applied to a text stream."""
+        stream.write(self.apply(mapping))
+
+    def python_source(self):
+        """Return the source of a module rendering the template.
+
+        The module provides render(mapping) and render_to(mapping, stream)
+        and only needs the standard library and the engine's runtime.
+        """
+        raise NotImplementedError(
+                "engine %s can't compile templates" % (self.handle,))
+
+
+# imports and helpers available to the modules generated by python_source()
+RUNTIME_SOURCE = '''
+import itertools
+import numbers
+import string
+
+try:
+    basestring
+except NameError:
+    basestring = str
+
+try:
+    from collections.abc import Iterable, Mapping, Sized
+except ImportError:
+    from collections import Iterable, Mapping, Sized
+
+# there are no lazily produced strings outside of eztemplate
+LazyString = ()
+
+
+class _Chunks(list):
+
+    """Collect written text."""
+
+    write = list.append
+
+
+def render(mapping):
+    """Return the template rendered with mapping."""
+    chunks = _Chunks()
+    render_to(mapping, chunks)
+    return ''.join(chunks)
+
+
+class _Converter(object):
+
+    """Convert values like the engine does."""
+
+%s
+
+_str = _Converter().str
+'''
+
+
+def table_length(columns):
+    """Return the number of rows of a mapping of equal-length columns."""
+    for column in columns.values():
+        return len(column)
+
+    return 0
+
+
+def runtime_source(*objects):
+    """Return RUNTIME_SOURCE followed by the source of some objects."""
+    import inspect
+    import textwrap
+
+    sources = [RUNTIME_SOURCE % (inspect.getsource(Engine.str).rstrip(),)]
+    sources.extend(textwrap.dedent(inspect.getsource(ob)) for ob in objects)
+
+    return '\n\n'.join(source.strip('\n') + '\n' for source in sources)
+
 
 engines = {}
 
+# (module name, start, end) in seconds since the epoch for each import attempt
+import_times = []
+
 
 def _init():
     """Dynamically import engines that initialize successfully."""
@@ -125,10 +341,13 @@ def _init():
             module_names.add(match.group('name'))
 
     for module_name in module_names:
+        start = time.time()
         try:
             module = importlib.import_module('.' + module_name, __name__)
         except ImportError:
             continue
+        finally:
+            import_times.append((module_name, start, time.time()))
 
         for name, member in module.__dict__.items():
             if not isinstance(member, type):
@@ -5,6 +5,7 @@ from __future__ import absolute_import
 from __future__ import print_function
 
 import os.path
+import posixpath
 
 import em
 
@@ -23,14 +24,20 @@ class SubsystemWrapper(em.Subsystem):
     Allows to open files relative to a base directory.
     """
 
-    def __init__(self, basedir=None, **kwargs):
-        """Initialize Subsystem plus a possible base directory."""
+    def __init__(self, basedir=None, bundle=None, **kwargs):
+        """Initialize Subsystem plus a possible base directory and bundle."""
         em.Subsystem.__init__(self, **kwargs)
 
         self.basedir = basedir
+        self.bundle = bundle
 
     def open(self, name, *args, **kwargs):
-        """Open file, possibly relative to a base directory."""
+        """Open file, possibly relative to a base directory or in a bundle."""
+        if self.bundle is not None:
+            if self.basedir is not None:
+                name = posixpath.join(self.basedir, name)
+            return StringIO(self.bundle.read(name))
+
         if self.basedir is not None:
             name = os.path.join(self.basedir, name)
 
@@ -42,15 +49,16 @@ class EmpyEngine(Engine):
     """Empy templating engine."""
 
     handle = 'empy'
+    version = getattr(em, '__version__', None)
 
-    def __init__(self, template, dirname=None, **kwargs):
+    def __init__(self, template, dirname=None, bundle=None, **kwargs):
         """Initialize empy template."""
         super(EmpyEngine, self).__init__(**kwargs)
 
-        if dirname is not None:
+        if dirname is not None or bundle is not None:
             # FIXME: This is a really bad idea, as it works like a global.
             # Blame EmPy.
-            em.theSubsystem = SubsystemWrapper(basedir=dirname)
+            em.theSubsystem = SubsystemWrapper(basedir=dirname, bundle=bundle)
 
         self.output = StringIO()
         self.interpreter = em.Interpreter(output=self.output)
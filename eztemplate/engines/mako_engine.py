@@ -4,40 +4,179 @@
 from __future__ import absolute_import
 from __future__ import print_function
 
+import posixpath
 
+import mako
+from mako import exceptions
+from mako import parsetree
+from mako.codegen import RESERVED_NAMES
+from mako.lexer import Lexer
 from mako.template import Template
-from mako.lookup import TemplateLookup
+from mako.lookup import TemplateCollection, TemplateLookup
 
 from . import Engine
 
 
+_RENDERER_SOURCE = '''
+
+_template = None
+
+
+def _get_template():
+    """Wrap this module in a mako template object."""
+    global _template
+    if _template is None:
+        import sys
+        from mako.template import ModuleTemplate
+        _template = ModuleTemplate(sys.modules[__name__],
+                                   encoding_errors=%(encoding_errors)r)
+
+    return _template
+
+
+def render(mapping):
+    """Return the template rendered with mapping."""
+    return _get_template().render_unicode(**mapping)
+
+
+def render_to(mapping, stream):
+    """Write the template rendered with mapping to stream."""
+    from mako.runtime import Context
+    _get_template().render_context(Context(stream, **mapping))
+'''
+
+
+class BundleLookup(TemplateCollection):
+
+    """Look up templates inside a bundle instead of the file system.
+
+    URIs are relative to a base directory inside the bundle,
+    like with TemplateLookup.
+    """
+
+    def __init__(self, bundle, directory='', **template_args):
+        """Initialize lookup with bundle and template arguments."""
+        self.bundle = bundle
+        self.directory = directory
+        self.template_args = template_args
+        self._templates = {}
+
+    def adjust_uri(self, uri, relativeto):
+        """Make uri absolute, possibly relative to another template."""
+        if uri.startswith('/'):
+            return uri
+
+        if relativeto is not None and relativeto.startswith('/'):
+            return posixpath.normpath(
+                    posixpath.join(posixpath.dirname(relativeto), uri))
+
+        return '/' + uri
+
+    def get_template(self, uri, relativeto=None):
+        """Compile template from bundle or return already compiled one."""
+        uri = self.adjust_uri(uri, relativeto)
+        try:
+            return self._templates[uri]
+        except KeyError:
+            pass
+
+        name = posixpath.join(self.directory, uri.lstrip('/'))
+        if name not in self.bundle:
+            raise exceptions.TopLevelLookupException(
+                    "Can't locate template for uri %r" % (uri,))
+
+        template = Template(self.bundle.read(name),
+                            uri=uri,
+                            lookup=self,
+                            **self.template_args)
+        self._templates[uri] = template
+        return template
+
+
 class MakoEngine(Engine):
 
     """Mako templating engine."""
 
     handle = 'mako'
+    version = mako.__version__
 
-    def __init__(self, template, dirname=None, tolerant=False, **kwargs):
+    def __init__(self, template, dirname=None, tolerant=False, bundle=None,
+                 **kwargs):
         """Initialize mako template."""
         super(MakoEngine, self).__init__(**kwargs)
 
-        directories = [dirname] if dirname is not None else ['.']
-        lookup = TemplateLookup(directories=directories)
-
         default_filters = ['filter_undefined'] if tolerant else None
         encoding_errors = 'replace' if tolerant else 'strict'
         imports = ['def filter_undefined(value):\n'
                    '    if value is UNDEFINED:\n'
                    '        return \'<UNDEFINED>\'\n'
                    '    return value\n']
-        self.template = Template(template,
-                                 default_filters=default_filters,
-                                 encoding_errors=encoding_errors,
-                                 imports=imports,
-                                 lookup=lookup,
-                                 strict_undefined=not tolerant,
-                                 )
+        template_args = {
+                'default_filters':  default_filters,
+                'encoding_errors':  encoding_errors,
+                'imports':          imports,
+                'strict_undefined': not tolerant,
+            }
+
+        if bundle is not None:
+            lookup = BundleLookup(bundle, directory=dirname or '',
+                                  **template_args)
+        else:
+            directories = [dirname] if dirname is not None else ['.']
+            lookup = TemplateLookup(directories=directories)
+
+        self.template = Template(template, lookup=lookup, **template_args)
+        self._names = None
+
+    def referenced_names(self):
+        """Guess the names the template reads from its parse tree.
+
+        The result is a superset of the names taken from the context.
+        Returns None when the template accesses the context dynamically
+        or pulls in other templates.
+        """
+        if self._names is not None:
+            return self._names
+
+        names = set()
+        nodes = [Lexer(self.template.source).parse()]
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, (parsetree.IncludeTag,
+                                 parsetree.InheritTag,
+                                 parsetree.NamespaceTag,
+                                 parsetree.CallNamespaceTag)):
+                return None
+
+            if isinstance(node, parsetree.PageTag):
+                # page arguments are taken from the context, too
+                names.update(node.declared_identifiers())
+
+            try:
+                names.update(node.undeclared_identifiers())
+            except AttributeError:
+                pass
+
+            try:
+                nodes.extend(node.get_children())
+            except AttributeError:
+                nodes.extend(node.nodes)
+
+        if 'context' in names or 'pageargs' in names:
+            return None
+
+        self._names = frozenset(names - RESERVED_NAMES)
+        return self._names
 
     def apply(self, mapping):
         """Apply a mapping of name-value-pairs to a template."""
         return self.template.render(**mapping)
+
+    def python_source(self):
+        """Return the module source generated by mako.
+
+        Other templates can't be looked up from the module.
+        """
+        return self.template.code + _RENDERER_SOURCE % {
+                'encoding_errors': self.template.encoding_errors,
+            }
@@ -4,6 +4,8 @@
 from __future__ import absolute_import
 from __future__ import print_function
 
+import itertools
+import re
 import string
 
 try:
@@ -11,7 +13,38 @@ try:
 except NameError:
     basestring = str
 
-from . import Engine
+from . import Engine, runtime_source, table_length
+
+
+_RENDERER_SOURCE = '''
+TOLERANT = %(tolerant)r
+
+# literal text and (field name, conversion, format spec, nested) tuples
+PIECES = %(pieces)s
+
+_formatter = FormatterWrapper(tolerant=TOLERANT)
+
+
+def render_to(mapping, stream):
+    """Write the template rendered with mapping to stream."""
+    write = stream.write
+    for piece in PIECES:
+        if not isinstance(piece, tuple):
+            write(piece)
+            continue
+
+        field_name, conversion, format_spec, nested = piece
+        obj, __ = _formatter.get_field(field_name, None, mapping)
+        obj = _formatter.convert_field(obj, conversion)
+        if nested:
+            format_spec = _formatter.vformat(format_spec, None, mapping)
+        write(_formatter.format_field(obj, format_spec))
+'''
+
+
+def _escape(text):
+    """Escape braces in literal text."""
+    return text.replace('{', '{{').replace('}', '}}')
 
 
 class MissingField(object):
@@ -100,7 +133,165 @@ class StringFormatter(Engine):
 
         self.template = template
         self.formatter = FormatterWrapper(tolerant=tolerant)
+        self._names = None
+        self._layout = None
+
+    def referenced_names(self):
+        """Return the set of field names occurring in the template.
+
+        Only the first component of a field name counts, and nested
+        replacement fields in format specs are taken into account.
+        Returns None if the template cannot be parsed.
+        """
+        if self._names is not None:
+            return self._names
+
+        names = set()
+        auto_number = 0
+        templates = [self.template]
+        try:
+            while templates:
+                for __, field_name, format_spec, __ in self.formatter.parse(
+                        templates.pop()):
+                    if field_name is None:
+                        continue
+
+                    name = re.match(r'[^.[]*', field_name).group()
+                    if not name:
+                        name = str(auto_number)
+                        auto_number += 1
+                    names.add(name)
+
+                    if format_spec:
+                        templates.append(format_spec)
+        except ValueError:
+            return None
+
+        self._names = frozenset(names)
+        return self._names
+
+    def specialize(self, mapping):
+        """Format the fields that only refer to the given names.
+
+        Other fields are left intact.  Templates using automatic field
+        numbering are not specialized.
+        """
+        pieces = []
+        specialized = False
+        try:
+            for literal, field_name, format_spec, conversion in (
+                    self.formatter.parse(self.template)):
+                pieces.append(_escape(literal))
+                if field_name is None:
+                    continue
+
+                if not re.match(r'[^.[]', field_name):
+                    return self
+
+                field = '{%s%s%s}' % (
+                        field_name,
+                        '!' + conversion if conversion else '',
+                        ':' + format_spec if format_spec else '',
+                    )
+                names = StringFormatter(field).referenced_names()
+                if names is None or not names or not names <= set(mapping):
+                    pieces.append(field)
+                    continue
+
+                try:
+                    text = self.formatter.vformat(field, None, mapping)
+                except (KeyError, IndexError, AttributeError, TypeError,
+                        ValueError):
+                    pieces.append(field)
+                    continue
+
+                pieces.append(_escape(text))
+                specialized = True
+        except ValueError:
+            return self
+
+        if not specialized:
+            return self
+
+        return self.__class__(''.join(pieces),
+                              tolerant=self.formatter.tolerant)
 
     def apply(self, mapping):
         """Apply a mapping of name-value-pairs to a template."""
         return self.formatter.vformat(self.template, None, mapping)
+
+    def _parse(self):
+        """Return the parsed template, parsing it on first use."""
+        if self._layout is None:
+            self._layout = list(self.formatter.parse(self.template))
+
+        return self._layout
+
+    def apply_many(self, columns):
+        """Apply the template to each row of a table.
+
+        Fields plainly naming a column are formatted a column at a time.
+        Templates with other fields are applied row by row.
+        """
+        formatter = self.formatter
+        length = table_length(columns)
+        sequences = []
+
+        for literal, field_name, format_spec, conversion in self._parse():
+            if literal:
+                sequences.append(itertools.repeat(literal, length))
+            if field_name is None:
+                continue
+
+            format_spec = format_spec or ''
+            if (not re.match(r'[^.[\d][^.[]*$', field_name) or
+                    '{' in format_spec):
+                return super(StringFormatter, self).apply_many(columns)
+
+            if field_name not in columns:
+                if not formatter.tolerant:
+                    raise KeyError(field_name)
+                missing = formatter.convert_field(MissingField(field_name),
+                                                  conversion)
+                sequences.append(itertools.repeat(
+                        formatter.format_field(missing, format_spec),
+                        length))
+                continue
+
+            column = columns[field_name]
+            if conversion:
+                column = map(formatter.convert_field, column,
+                             itertools.repeat(conversion))
+            sequences.append(list(map(format, column,
+                                      itertools.repeat(format_spec))))
+
+        if not sequences:
+            return [''] * length
+
+        return list(map(''.join, zip(*sequences)))
+
+    def python_source(self):
+        """Return the source of a module formatting precomputed pieces."""
+        pieces = []
+        auto_number = 0
+        for literal, field_name, format_spec, conversion in (
+                self.formatter.parse(self.template)):
+            if literal:
+                pieces.append(literal)
+            if field_name is None:
+                continue
+
+            if field_name == '':
+                field_name = str(auto_number)
+                auto_number += 1
+
+            format_spec = format_spec or ''
+            pieces.append((field_name, conversion, format_spec,
+                           '{' in format_spec or '}' in format_spec))
+
+        return runtime_source(MissingField, FormatterWrapper) + (
+                _RENDERER_SOURCE % {
+                    'tolerant': self.formatter.tolerant,
+                    'pieces':   '[\n%s]' % (''.join('    %r,\n' % (piece,)
+                                                     for piece in pieces),),
+                })
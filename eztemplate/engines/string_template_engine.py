@@ -4,9 +4,39 @@
 from __future__ import absolute_import
 from __future__ import print_function
 
+import itertools
+
 from string import Template
 
-from . import Engine
+from . import Engine, runtime_source, table_length
+
+
+_RENDERER_SOURCE = '''
+TOLERANT = %(tolerant)r
+
+# literal text and (name, placeholder) pairs
+PIECES = %(pieces)s
+
+
+def render_to(mapping, stream):
+    """Write the template rendered with mapping to stream."""
+    write = stream.write
+    for piece in PIECES:
+        if not isinstance(piece, tuple):
+            write(piece)
+            continue
+
+        name, placeholder = piece
+        value = mapping.get(name)
+        if value is None:
+            if not TOLERANT:
+                raise KeyError(name)
+            if name not in mapping:
+                write(placeholder)
+                continue
+
+        write(_str(value, tolerant=TOLERANT))
+'''
 
 
 class StringTemplate(Engine):
@@ -21,14 +51,172 @@ class StringTemplate(Engine):
 
         self.template = Template(template)
         self.tolerant = tolerant
+        self._names = None
+        self._parsed = None
+
+    def referenced_names(self):
+        """Return the set of identifiers occurring in the template."""
+        if self._names is None:
+            self._names = frozenset(
+                    match.group('named') or match.group('braced')
+                    for match in self.template.pattern.finditer(
+                        self.template.template)
+                    if match.group('named') or match.group('braced'))
+
+        return self._names
+
+    def _prepare(self, mapping):
+        """Convert values to strings, dropping None unless tolerant."""
+        return {name: self.str(value, tolerant=self.tolerant)
+                for name, value in mapping.items()
+                if value is not None or self.tolerant}
+
+    def specialize(self, mapping):
+        """Substitute the given names, leaving other placeholders intact."""
+        names = self.referenced_names()
+        try:
+            mapping = self._prepare({name: value
+                                     for name, value in mapping.items()
+                                     if name in names})
+        except ValueError:
+            return self
+
+        if not mapping:
+            return self
+
+        delimiter = self.template.delimiter
+        pattern = self.template.pattern
+        text = self.template.template
+        parts = []
+        pos = 0
+        # unbraced placeholder left at the end of the text so far
+        unbraced = None
+
+        for match in pattern.finditer(text):
+            if match.start() > pos:
+                parts.append(text[pos:match.start()])
+                unbraced = None
+            pos = match.end()
+
+            part = match.group()
+            kept = True
+            name = match.group('named') or match.group('braced')
+            if name in mapping:
+                value = mapping[name].replace(delimiter, delimiter * 2)
+                # substituted text must not run into an unbraced name, so
+                # the constant is left to be applied along with that name
+                if not (unbraced and value and
+                        pattern.match(unbraced.group() + value[:1])
+                        .group('named') != unbraced.group('named')):
+                    part = value
+                    kept = False
+
+            if part:
+                parts.append(part)
+                unbraced = match if kept and match.group('named') else None
+
+        parts.append(text[pos:])
+
+        return self.__class__(''.join(parts), tolerant=self.tolerant)
 
     def apply(self, mapping):
         """Apply a mapping of name-value-pairs to a template."""
-        mapping = {name: self.str(value, tolerant=self.tolerant)
-                   for name, value in mapping.items()
-                   if value is not None or self.tolerant}
+        mapping = self._prepare(mapping)
 
         if self.tolerant:
             return self.template.safe_substitute(mapping)
 
         return self.template.substitute(mapping)
+
+    def _convert_column(self, name, column):
+        """Convert a column of values to strings like _prepare()."""
+        types = set(map(type, column))
+        if types <= set([str]):
+            return column
+        if types <= set([int, float]):
+            return list(map(str, column))
+
+        if not self.tolerant and any(value is None for value in column):
+            raise KeyError(name)
+
+        return [self.str(value, tolerant=self.tolerant) for value in column]
+
+    def apply_many(self, columns):
+        """Apply the template to each row of a table.
+
+        The template is parsed once and whole columns are converted at a
+        time, so no mapping is built per row.
+        """
+        length = table_length(columns)
+        converted = {}
+        sequences = []
+
+        for piece in self._pieces():
+            if not isinstance(piece, tuple):
+                sequences.append(itertools.repeat(piece, length))
+                continue
+
+            name, placeholder = piece
+            if name not in columns:
+                if not self.tolerant:
+                    raise KeyError(name)
+                # each occurrence keeps its own form, like $b or ${b}
+                sequences.append(itertools.repeat(placeholder, length))
+                continue
+
+            if name not in converted:
+                converted[name] = self._convert_column(name, columns[name])
+            sequences.append(converted[name])
+
+        if not sequences:
+            return [''] * length
+
+        return list(map(''.join, zip(*sequences)))
+
+    def _pieces(self):
+        """Split the template into literal text and placeholders.
+
+        Returns a list of strings and (name, placeholder) pairs.
+        """
+        if self._parsed is not None:
+            return self._parsed
+
+        text = self.template.template
+        pieces = []
+        literal = []
+        pos = 0
+
+        for match in self.template.pattern.finditer(text):
+            literal.append(text[pos:match.start()])
+            pos = match.end()
+
+            name = match.group('named') or match.group('braced')
+            if name:
+                if literal:
+                    pieces.append(''.join(literal))
+                    literal = []
+                pieces.append((name, match.group()))
+            elif match.group('escaped') is not None:
+                literal.append(self.template.delimiter)
+            elif self.tolerant:
+                literal.append(match.group())
+            else:
+                raise ValueError("invalid placeholder at position %d"
+                                 % (match.start(),))
+
+        literal.append(text[pos:])
+        if ''.join(literal):
+            pieces.append(''.join(literal))
+
+        self._parsed = pieces
+        return pieces
+
+    def python_source(self):
+        """Return the source of a module substituting precomputed pieces."""
+        pieces = self._pieces()
+
+        return runtime_source() + _RENDERER_SOURCE % {
+                'tolerant': self.tolerant,
+                'pieces':   '[\n%s]' % (''.join('    %r,\n' % (piece,)
+                                                 for piece in pieces),),
+            }
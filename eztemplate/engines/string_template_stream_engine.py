@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""Provide a streaming engine with the syntax of string.Template."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import hashlib
+import io
+import re
+
+from string import Template
+
+from . import Engine
+
+
+# number of characters read from the template at a time
+CHUNK_SIZE = 1 << 16
+
+
+class _DigestingReader(object):
+
+    """Pass on reads from a text stream, digesting the text read."""
+
+    def __init__(self, stream):
+        """Initialize with the stream to read from."""
+        self.stream = stream
+        self.hash = hashlib.sha256()
+
+    def read(self, size):
+        """Read and digest up to size characters."""
+        chunk = self.stream.read(size)
+        self.hash.update(chunk.encode('utf-8'))
+        return chunk
+
+
+class StringTemplateStream(Engine):
+
+    """Streaming string.Template engine for huge templates."""
+
+    handle = 'string.Template.stream'
+
+    # the template may be given as a callable opening it as a text stream
+    streaming = True
+
+    def __init__(self, template, tolerant=False, **kwargs):
+        """Initialize with template text or a callable opening it."""
+        super(StringTemplateStream, self).__init__(**kwargs)
+
+        if callable(template):
+            self._open = template
+        else:
+            self._open = lambda: io.StringIO(template)
+
+        self.tolerant = tolerant
+        self.pattern = Template.pattern
+        self.delimiter = Template.delimiter
+        # start of a braced placeholder which might go on in the next chunk
+        self._partial = re.compile(r'%s\{\w*\Z' % (re.escape(self.delimiter),))
+        self._names = None
+        self._digest = None
+
+    @property
+    def source_digest(self):
+        """Return the digest of the template source.
+
+        Unless set by whoever read the template, it is computed while
+        scanning for names, so the template isn't read just for that.
+        """
+        if self._digest is None:
+            self._scan()
+
+        return self._digest
+
+    @source_digest.setter
+    def source_digest(self, digest):
+        """Set the digest of the template source."""
+        self._digest = digest
+
+    def _is_settled(self, match, text):
+        """Check whether more text can't change how a match ends."""
+        if match.end() >= len(text):
+            return False
+
+        return (match.group('invalid') is None or
+                self._partial.match(text, match.start()) is None)
+
+    def pieces(self, stream, tolerant=None):
+        """Iterate over literal text and (name, placeholder) pairs.
+
+        Only keeps as much of the template in memory as it takes to tell
+        where placeholders end, so they may be split across chunks.
+        """
+        if tolerant is None:
+            tolerant = self.tolerant
+
+        text = ''
+        line = 1
+        column = 1
+
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            text += chunk
+            pos = 0
+            cut = len(text)
+
+            for match in self.pattern.finditer(text):
+                if chunk and not self._is_settled(match, text):
+                    cut = match.start()
+                    break
+
+                if match.start() > pos:
+                    yield text[pos:match.start()]
+                pos = match.end()
+
+                name = match.group('named') or match.group('braced')
+                if name:
+                    yield (name, match.group())
+                elif match.group('escaped') is not None:
+                    yield self.delimiter
+                elif tolerant:
+                    yield match.group()
+                else:
+                    before = text[:match.start()]
+                    newline = before.rfind('\n')
+                    raise ValueError(
+                            "Invalid placeholder in template: "
+                            "line %d, col %d" % (
+                                line + before.count('\n'),
+                                match.start() - newline
+                                if newline >= 0
+                                else column + match.start()))
+
+            if cut > pos:
+                yield text[pos:cut]
+
+            if not chunk:
+                return
+
+            done = text[:cut]
+            newline = done.rfind('\n')
+            if newline >= 0:
+                line += done.count('\n')
+                column = cut - newline
+            else:
+                column += cut
+            text = text[cut:]
+
+    def _scan(self):
+        """Read the template once, collecting names and a digest."""
+        with self._open() as stream:
+            reader = _DigestingReader(stream)
+            self._names = frozenset(
+                    piece[0]
+                    for piece in self.pieces(reader, tolerant=True)
+                    if isinstance(piece, tuple))
+
+        if self._digest is None:
+            self._digest = reader.hash.hexdigest()
+
+    def referenced_names(self):
+        """Return the set of identifiers occurring in the template."""
+        if self._names is None:
+            self._scan()
+
+        return self._names
+
+    def _prepare(self, mapping):
+        """Convert values to strings, dropping None unless tolerant."""
+        return {name: self.str(value, tolerant=self.tolerant)
+                for name, value in mapping.items()
+                if value is not None or self.tolerant}
+
+    def apply_to(self, mapping, stream):
+        """Write the template with a mapping applied to a text stream."""
+        mapping = self._prepare(mapping)
+        write = stream.write
+
+        with self._open() as source:
+            for piece in self.pieces(source):
+                if isinstance(piece, tuple):
+                    name, placeholder = piece
+                    try:
+                        piece = mapping[name]
+                    except KeyError:
+                        if not self.tolerant:
+                            raise
+                        piece = placeholder
+
+                write(piece)
+
+    def apply(self, mapping):
+        """Apply a mapping of name-value-pairs to a template."""
+        stream = io.StringIO()
+        self.apply_to(mapping, stream)
+        return stream.getvalue()
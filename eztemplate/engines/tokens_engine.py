@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""Provide an engine replacing literal tokens in a single pass."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import collections
+import re
+
+from . import Engine
+
+
+class Automaton(object):
+
+    """Aho-Corasick automaton finding a set of literal tokens.
+
+    Where tokens overlap, the one starting first wins, and of those
+    the longest one.
+    """
+
+    def __init__(self, tokens):
+        """Build the automaton from non-empty strings."""
+        goto = [{}]
+        depth = [0]
+        found = [None]
+
+        for token in tokens:
+            state = 0
+            for char in token:
+                following = goto[state].get(char)
+                if following is None:
+                    following = goto[state][char] = len(goto)
+                    goto.append({})
+                    depth.append(depth[state] + 1)
+                    found.append(None)
+                state = following
+            found[state] = token
+
+        fail = [0] * len(goto)
+        queue = collections.deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in goto[state].items():
+                queue.append(following)
+
+                suffix = fail[state]
+                while suffix and char not in goto[suffix]:
+                    suffix = fail[suffix]
+                fail[following] = goto[suffix].get(char, 0)
+
+                # the longest token ending here, if not the state itself
+                if found[following] is None:
+                    found[following] = found[fail[following]]
+
+        self._goto = goto
+        self._fail = fail
+        self._depth = depth
+        self._found = found
+        # skip quickly to where the next token might start
+        self._start = re.compile('|'.join(re.escape(char)
+                                          for char in sorted(goto[0])))
+
+    def replace(self, text, replacement):
+        """Return text with each token replaced by replacement(token)."""
+        if not self._goto[0]:
+            return text
+
+        goto = self._goto
+        fail = self._fail
+        depth = self._depth
+        found = self._found
+
+        chunks = []
+        length = len(text)
+        done = 0
+        pos = 0
+        state = 0
+        pending = None
+
+        while True:
+            if not state:
+                match = self._start.search(text, pos)
+                if match is None:
+                    break
+                pos = match.start()
+
+            if pos < length:
+                char = text[pos]
+                pos += 1
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+
+                token = found[state]
+                if token is not None:
+                    start = pos - len(token)
+                    if pending is None or start <= pending[0]:
+                        pending = (start, pos, token)
+
+                # commit only once no partial match could start earlier
+                if pending is None or pending[0] >= pos - depth[state]:
+                    continue
+            elif pending is None:
+                break
+
+            start, end, token = pending
+            chunks.append(text[done:start])
+            chunks.append(replacement(token))
+            done = pos = end
+            state = 0
+            pending = None
+
+        chunks.append(text[done:])
+        return ''.join(chunks)
+
+
+# automatons for the most recently used sets of tokens
+_automata = collections.OrderedDict()
+_AUTOMATA_MAXSIZE = 16
+
+
+def automaton(tokens):
+    """Return a (possibly cached) automaton for a set of tokens."""
+    tokens = frozenset(token for token in tokens if token)
+
+    try:
+        result = _automata.pop(tokens)
+    except KeyError:
+        result = Automaton(tokens)
+        if len(_automata) >= _AUTOMATA_MAXSIZE:
+            _automata.popitem(last=False)
+
+    _automata[tokens] = result
+    return result
+
+
+class TokensEngine(Engine):
+
+    """Literal token replacement engine."""
+
+    # every name in the mapping, like @@HOST@@, is a token replaced
+    # wherever it occurs; ez_ names are reserved for output file properties
+    handle = 'tokens'
+
+    def __init__(self, template, tolerant=False, **kwargs):
+        """Initialize template."""
+        super(TokensEngine, self).__init__(**kwargs)
+
+        self.template = template
+        self.tolerant = tolerant
+
+    def apply(self, mapping):
+        """Apply a mapping of token-value-pairs to a template.
+
+        Only the values of tokens occurring in the template are used.
+        """
+        converted = {}
+
+        def replacement(token):
+            """Return the value of a token as a string."""
+            try:
+                return converted[token]
+            except KeyError:
+                value = converted[token] = self.str(mapping[token],
+                                                    tolerant=self.tolerant)
+                return value
+
+        tokens = (token for token in mapping if not token.startswith('ez_'))
+        return automaton(tokens).replace(self.template, replacement)
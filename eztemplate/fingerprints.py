@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""Provide a compact set for detecting repeated keys."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import array
+import hashlib
+
+try:
+    array.array('Q')
+except ValueError:
+    # Python 2 lacks 'Q', but 'L' has 64 bits on LP64 platforms
+    _TYPECODE = 'L'
+else:
+    _TYPECODE = 'Q'
+
+_BITS = min(64, 8 * array.array(_TYPECODE).itemsize)
+
+
+def fingerprint(*parts):
+    """Compute a nonzero fingerprint (usually 64 bits) of some strings."""
+    data = u'\0'.join(u'%s' % (part,) for part in parts).encode('utf-8')
+    value = int(hashlib.md5(data).hexdigest()[:_BITS // 4], 16)
+    return value or 1
+
+
+class FingerprintSet(object):
+
+    """Remember keys by their 64 bit fingerprints only.
+
+    Takes 8 to 16 bytes per key in an open addressing table, instead of
+    keeping the keys themselves.  In exchange, a new key is mistaken for
+    a known one with a probability of about n / 2**64 for n known keys.
+    """
+
+    def __init__(self, capacity=1024):
+        """Initialize empty table."""
+        size = 16
+        while size < 2 * capacity:
+            size *= 2
+
+        self._table = self._new_table(size)
+        self._mask = size - 1
+        self._len = 0
+
+    @staticmethod
+    def _new_table(size):
+        """Allocate a table of empty (zero) slots."""
+        return array.array(_TYPECODE, [0]) * size
+
+    def __len__(self):
+        """Return number of remembered keys."""
+        return self._len
+
+    def _slot(self, value):
+        """Return index of the slot holding value or the empty one for it."""
+        table = self._table
+        mask = self._mask
+        index = value & mask
+        while True:
+            slot = table[index]
+            if not slot or slot == value:
+                return index
+            index = (index + 1) & mask
+
+    def __contains__(self, parts):
+        """Check whether a key (given as a tuple of strings) is known."""
+        value = fingerprint(*parts)
+        return self._table[self._slot(value)] == value
+
+    def add(self, parts):
+        """Remember a key (given as a tuple of strings).
+
+        Returns False if it was already known.
+        """
+        value = fingerprint(*parts)
+        index = self._slot(value)
+        if self._table[index] == value:
+            return False
+
+        self._table[index] = value
+        self._len += 1
+
+        if 2 * self._len > len(self._table):
+            self._grow()
+
+        return True
+
+    def _grow(self):
+        """Double the table size and reinsert all fingerprints."""
+        old_table = self._table
+        self._table = self._new_table(2 * len(old_table))
+        self._mask = len(self._table) - 1
+
+        for value in old_table:
+            if value:
+                self._table[self._slot(value)] = value
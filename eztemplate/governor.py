@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""Provide resource limits for rendering templates."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import errno
+import os
+import pickle
+import select
+import signal
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class LimitExceeded(Exception):
+
+    """Signal that rendering a template exceeded a resource limit."""
+
+    def __init__(self, limit, detail):
+        """Initialize with name of the limit and a description."""
+        super(LimitExceeded, self).__init__(limit, detail)
+
+        self.limit = limit
+        self.detail = detail
+
+    def __str__(self):
+        """Describe which limit was exceeded."""
+        return "exceeded %s limit (%s)" % (self.limit, self.detail)
+
+
+class Limits(object):
+
+    """Represent per render resource limits.
+
+    time is wall clock seconds, cpu is processor seconds,
+    memory is the address space in bytes and output is the
+    size of the encoded result in bytes.  None means unlimited.
+    """
+
+    def __init__(self, time=None, cpu=None, memory=None, output=None,
+                 encoding='utf-8'):
+        """Initialize limits."""
+        self.time = time
+        self.cpu = cpu
+        self.memory = memory
+        self.output = output
+        self.encoding = encoding
+
+    def __bool__(self):
+        """Check whether any limit is set."""
+        return any(limit is not None
+                   for limit in (self.time, self.cpu,
+                                 self.memory, self.output))
+
+    __nonzero__ = __bool__
+
+
+def is_supported():
+    """Check whether limits can be enforced on this platform."""
+    return hasattr(os, 'fork') and resource is not None
+
+
+def parse_size(text):
+    """Parse a size in bytes with an optional K, M or G suffix."""
+    factors = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    text = text.strip().upper().rstrip('B')
+
+    factor = factors.get(text[-1:], 1)
+    if factor != 1:
+        text = text[:-1]
+
+    return int(float(text) * factor)
+
+
+def _set_rlimit(which, value):
+    """Lower a resource limit of the current process."""
+    __, hard = resource.getrlimit(which)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    resource.setrlimit(which, (value, hard))
+
+
+def _render_child(template, mapping, limits, fd):
+    """Render inside the child process and report back through fd."""
+    try:
+        if limits.cpu is not None:
+            _set_rlimit(resource.RLIMIT_CPU, max(1, int(limits.cpu + 0.999)))
+        if limits.memory is not None:
+            _set_rlimit(resource.RLIMIT_AS, limits.memory)
+
+        try:
+            result = template.apply(mapping)
+        except MemoryError:
+            report = ('limit', 'memory', "%d bytes" % (limits.memory,))
+        except Exception as e:
+            report = ('error', e)
+        else:
+            size = len(result.encode(limits.encoding))
+            if limits.output is not None and size > limits.output:
+                report = ('limit', 'output', "%d of %d bytes" % (
+                        size, limits.output))
+            else:
+                report = ('ok', result)
+
+        try:
+            data = pickle.dumps(report, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            data = pickle.dumps(('error', Exception(repr(report[1]))),
+                                pickle.HIGHEST_PROTOCOL)
+
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+    finally:
+        os._exit(0)
+
+
+def _receive(fd, pid, limits):
+    """Collect the report of the child, killing it if it takes too long."""
+    deadline = (time.time() + limits.time
+                if limits.time is not None
+                else None)
+    chunks = []
+
+    while True:
+        timeout = (max(0, deadline - time.time())
+                   if deadline is not None
+                   else None)
+        try:
+            ready, __, __ = select.select([fd], [], [], timeout)
+        except (OSError, select.error) as e:
+            if e.args[0] == errno.EINTR:
+                continue
+            raise
+
+        if not ready:
+            os.kill(pid, signal.SIGKILL)
+            raise LimitExceeded('time', "%g seconds" % (limits.time,))
+
+        chunk = os.read(fd, 1 << 16)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+
+def apply(template, mapping, limits):
+    """Apply mapping to template in a child process subject to limits.
+
+    Raises LimitExceeded if a limit is exceeded, or whatever exception
+    rendering raised in the child.
+    """
+    read_fd, write_fd = os.pipe()
+
+    pid = os.fork()
+    if not pid:
+        os.close(read_fd)
+        _render_child(template, mapping, limits, write_fd)
+
+    os.close(write_fd)
+    try:
+        data = _receive(read_fd, pid, limits)
+    finally:
+        os.close(read_fd)
+        __, status = os.waitpid(pid, 0)
+
+    if not data:
+        if (limits.cpu is not None and os.WIFSIGNALED(status) and
+                os.WTERMSIG(status) in (signal.SIGXCPU, signal.SIGKILL)):
+            raise LimitExceeded('cpu', "%g seconds" % (limits.cpu,))
+        if limits.memory is not None:
+            raise LimitExceeded('memory', "rendering process died")
+        raise Exception("rendering process died with status %d" % (status,))
+
+    report = pickle.loads(data)
+    if report[0] == 'ok':
+        return report[1]
+
+    if report[0] == 'limit':
+        raise LimitExceeded(report[1], report[2])
+
+    raise report[1]
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Provide a journal of completed outputs for resuming runs."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import binascii
+import errno
+import hashlib
+import io
+
+from .fingerprints import FingerprintSet
+
+
+def combination_key(outfile, infile, source_digest=None, digest=None):
+    """Compute the journal key of an output rendered from a template.
+
+    The key changes with the template source and, if known, the digest
+    of the values the template references.
+    """
+    h = hashlib.sha1()
+    for part in (outfile, infile, source_digest,
+                 binascii.hexlify(digest).decode('ascii')
+                 if digest is not None
+                 else None):
+        h.update((u'%s\0' % (part,)).encode('utf-8'))
+
+    return h.hexdigest()
+
+
+class Journal(object):
+
+    """Record completed outputs in an append-only file.
+
+    Each completed output is a line holding its key, written through
+    right away, so a run that is interrupted or fails can be resumed.
+    """
+
+    def __init__(self, path):
+        """Load keys recorded earlier and open file for appending."""
+        self.path = path
+        self._keys = FingerprintSet()
+        self.skipped = 0
+
+        try:
+            with io.open(path, 'r', encoding='ascii') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self._keys.add((line,))
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+        self._file = io.open(path, 'a', encoding='ascii')
+
+    def __len__(self):
+        """Return number of completed outputs."""
+        return len(self._keys)
+
+    def __contains__(self, key):
+        """Check whether an output was completed before."""
+        return (key,) in self._keys
+
+    def add(self, key):
+        """Record an output as completed."""
+        if self._keys.add((key,)):
+            self._file.write(u'%s\n' % (key,))
+            self._file.flush()
+
+    def close(self):
+        """Close the journal file."""
+        self._file.close()
+
+    def __enter__(self):
+        """Provide context manager interface."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close journal on leaving context."""
+        self.close()
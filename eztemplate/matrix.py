@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""Provide lazy expansion of argument groups into a matrix."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import io
+import itertools
+
+
+def parse_axis(text):
+    """Parse NAME=VALUE,VALUE,... into a name and a list of values."""
+    name, sep, values = text.partition('=')
+    if not sep or not name:
+        raise ValueError("invalid matrix axis '%s'" % (text,))
+
+    return name, values.split(',')
+
+
+def read_axis(text, encoding='utf-8'):
+    """Parse NAME=FILE into a name and the (non-blank) lines of the file."""
+    name, sep, path = text.partition('=')
+    if not sep or not name:
+        raise ValueError("invalid matrix axis '%s'" % (text,))
+
+    with io.open(path, 'r', encoding=encoding) as f:
+        values = [line.strip() for line in f]
+
+    return name, [value for value in values if value]
+
+
+class Matrix(object):
+
+    """Represent the cartesian product of argument groups and axes.
+
+    Behaves like a read-only sequence of argument groups that can be
+    iterated over any number of times without storing the combinations.
+    Later axes vary fastest.  Axis values override the names given in
+    the argument groups.
+    """
+
+    def __init__(self, arggroups, axes):
+        """Initialize with argument groups and (name, values) pairs."""
+        self.arggroups = arggroups
+        self.axes = axes
+
+    def __len__(self):
+        """Return the number of combinations."""
+        count = len(self.arggroups)
+        for __, values in self.axes:
+            count *= len(values)
+
+        return count
+
+    def __iter__(self):
+        """Generate the combinations."""
+        names = [name for name, __ in self.axes]
+        value_lists = [values for __, values in self.axes]
+
+        for arggroup in self.arggroups:
+            for values in itertools.product(*value_lists):
+                mapping = dict(arggroup)
+                mapping.update(zip(names, values))
+                yield mapping
+
+    def __getitem__(self, index):
+        """Return the combination at index."""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("matrix index out of range")
+
+        mapping = {}
+        for name, values in reversed(self.axes):
+            index, value_index = divmod(index, len(values))
+            mapping[name] = values[value_index]
+
+        return dict(self.arggroups[index], **mapping)
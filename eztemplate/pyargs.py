@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""Provide lazily evaluated python expressions as argument values."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import numbers
+import types
+
+try:
+    basestring
+except NameError:
+    basestring = str
+
+
+_UNEVALUATED = object()
+
+
+class Expression(object):
+
+    """Evaluate a compiled python expression when its value is needed.
+
+    The expression sees the names bound before it in its argument group,
+    which may be expressions themselves.  The value is remembered.
+    """
+
+    def __init__(self, text, code, namespace):
+        """Initialize with code and the values of the names it may use."""
+        self.text = text
+        self._code = code
+        self._namespace = namespace
+        self._value = _UNEVALUATED
+
+    def is_evaluated(self):
+        """Check whether the value has been computed already."""
+        return self._value is not _UNEVALUATED
+
+    def value(self):
+        """Return the value, evaluating the expression on first use."""
+        if self._value is _UNEVALUATED:
+            namespace = {name: resolve(value)
+                         for name, value in self._namespace.items()}
+            # as globals, the names are visible in comprehensions, too
+            self._value = eval(self._code, namespace)
+            self._namespace = None
+
+        return self._value
+
+    def __repr__(self):
+        """Show the expression."""
+        return '%s(%r)' % (self.__class__.__name__, self.text)
+
+
+def resolve(value):
+    """Return the value of an expression or any other value as is."""
+    if isinstance(value, Expression):
+        return value.value()
+
+    return value
+
+
+def resolve_mapping(mapping):
+    """Return a mapping with the expressions among its values evaluated.
+
+    The mapping itself is returned if there are none.
+    """
+    if not any(isinstance(value, Expression) for value in mapping.values()):
+        return mapping
+
+    return {name: resolve(value) for name, value in mapping.items()}
+
+
+def code_names(code):
+    """Return all names code or code nested in it may look up.
+
+    Includes attribute names, so it errs on the safe side.
+    """
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.update(code_names(const))
+
+    return names
+
+
+def _identity(value):
+    """Return a hashable key telling values apart without evaluating them."""
+    if value is None or isinstance(value, (basestring, numbers.Number)):
+        return (type(value), value)
+
+    return ('id', id(value))
+
+
+class ExpressionCompiler(object):
+
+    """Turn python argument expressions into Expression objects.
+
+    Each distinct expression text is compiled once.  Argument groups share
+    an Expression where the names it may use are bound to the same values,
+    so it is evaluated at most once for all of them.
+    """
+
+    def __init__(self):
+        """Initialize caches."""
+        self._codes = {}
+        self._expressions = {}
+
+    def compile(self, text):
+        """Return compiled code and the names it may use."""
+        try:
+            return self._codes[text]
+        except KeyError:
+            pass
+
+        code = compile(text.strip(), '<pyarg>', 'eval')
+        result = self._codes[text] = (code, frozenset(code_names(code)))
+        return result
+
+    def expression(self, text, mapping):
+        """Return an Expression seeing the names bound in mapping."""
+        code, names = self.compile(text)
+        namespace = {name: mapping[name] for name in names if name in mapping}
+
+        key = (text, frozenset((name, _identity(value))
+                               for name, value in namespace.items()))
+        try:
+            return self._expressions[key]
+        except KeyError:
+            pass
+
+        expression = self._expressions[key] = Expression(text, code,
+                                                         namespace)
+        return expression
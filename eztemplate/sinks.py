@@ -0,0 +1,726 @@
+#!/usr/bin/env python
+"""Provide destinations for generated output files."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import binascii
+import collections
+import contextlib
+import errno
+import io
+import itertools
+import mmap
+import os
+import os.path
+import shutil
+import stat
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from . import compression
+from .engines import LazyString
+
+# ioctl cloning a file on Linux file systems supporting it (btrfs, xfs)
+_FICLONE = 0x40049409
+
+# files at least this large are memory mapped instead of read
+MMAP_THRESHOLD = 1 << 20
+
+# number of written files flushed to disk together when syncing
+SYNC_BATCH = 256
+
+# replaces an existing destination on Windows, too (Python 3.3+)
+_replace = getattr(os, 'replace', os.rename)
+
+# directories can only be opened for fsync on POSIX systems
+_O_DIRECTORY = getattr(os, 'O_DIRECTORY', None)
+
+
+def member_name(path):
+    """Turn an output file path into a relative archive member name."""
+    __, path = os.path.splitdrive(os.path.normpath(path))
+    return path.replace(os.sep, '/').lstrip('/')
+
+
+class Sink(object):
+
+    """Abstract class representing a destination for output files."""
+
+    def read(self, path):
+        """Return preexisting content of an output file or None."""
+        return None
+
+    def read_lazily(self, path):
+        """Return preexisting content, possibly as a LazyString, or None."""
+        return self.read(path)
+
+    def write(self, path, content):
+        """Store content under the path of an output file."""
+        raise NotImplementedError
+
+    @contextlib.contextmanager
+    def open(self, path):
+        """Provide a text stream whose content becomes an output file.
+
+        The content is only stored if the context is left without error.
+        Sinks that can't write as they go collect it in memory.
+        """
+        stream = io.StringIO()
+        yield stream
+        self.write(path, stream.getvalue())
+
+    def remove(self, path):
+        """Make sure there is no output file at path."""
+        raise NotImplementedError
+
+    def link(self, path, source, method='hardlink'):
+        """Try to make the output file a copy of the output file source.
+
+        The method ('hardlink', 'reflink' or 'copy') is a hint how to
+        share the content.  Returns False if the sink can't do that, so
+        the caller has to write the content instead.
+        """
+        return False
+
+    def after_commit(self, callback):
+        """Call callback once the output files written so far are stored."""
+        callback()
+
+    def close(self):
+        """Finish writing output files."""
+        pass
+
+    def __enter__(self):
+        """Provide context manager interface."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close sink on leaving context."""
+        self.close()
+
+
+def _reflink(source, path):
+    """Try to create path as a copy-on-write clone of source (Linux only)."""
+    if fcntl is None:
+        return False
+
+    try:
+        with open(source, 'rb') as src:
+            with open(path, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+    except (IOError, OSError):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return False
+
+    return True
+
+
+def _remove(path):
+    """Remove a file, if it exists."""
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+def _create(path):
+    """Create an empty file, failing if path exists."""
+    os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+
+
+def _temporary(path, make):
+    """Create a file with make() under an unused name next to path.
+
+    The name ends in the name of path, so it keeps its suffixes.
+    Returns None if the directory isn't writable.
+    """
+    directory, name = os.path.split(path)
+    for __ in range(100):
+        tag = binascii.hexlify(os.urandom(8)).decode('ascii')
+        temp = os.path.join(directory, '.%s.%s' % (tag, name))
+        try:
+            make(temp)
+        except OSError as e:
+            if e.errno == errno.EEXIST:
+                continue
+            if e.errno in (errno.EACCES, errno.EPERM):
+                return None
+            # name the output file rather than the temporary one
+            raise type(e)(e.errno, e.strerror, path)
+        return temp
+
+    raise IOError(errno.EEXIST, "no unused temporary file name", path)
+
+
+def _fsync(path, flags=os.O_RDONLY if os.name == 'posix' else os.O_RDWR):
+    """Flush a file or directory to disk, unless it is gone."""
+    try:
+        fd = os.open(path, flags)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return
+
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _flush(paths):
+    """Flush written files to disk, one after another."""
+    for path in paths:
+        _fsync(path)
+
+
+class FileContent(LazyString):
+
+    """Provide the content of a file once it is needed.
+
+    Large uncompressed files are memory mapped, and comparing them to
+    a string doesn't decode their content.  Compressed files are
+    decompressed when they are needed.
+    """
+
+    def __init__(self, path, encoding='utf-8'):
+        """Initialize with a path to an existing file."""
+        self.path = path
+        self.encoding = encoding
+        self.size = os.stat(path).st_size
+        self.compressed = compression.compression_suffix(path) is not None
+        self._data = None
+
+    def data(self):
+        """Return the raw content as bytes or a memory map."""
+        if self._data is None:
+            with open(self.path, 'rb') as f:
+                if self.size >= MMAP_THRESHOLD:
+                    self._data = mmap.mmap(f.fileno(), 0,
+                                           access=mmap.ACCESS_READ)
+                else:
+                    self._data = f.read()
+
+        return self._data
+
+    def load(self):
+        """Read and decode the content, normalizing line endings."""
+        if self.compressed:
+            try:
+                with compression.open_text(self.path, 'r',
+                                           encoding=self.encoding) as f:
+                    return f.read()
+            except compression.ERRORS:
+                return None
+
+        text = self.data()[:].decode(self.encoding)
+        return text.replace('\r\n', '\n').replace('\r', '\n')
+
+    def equals(self, text):
+        """Compare the content to a string, preferably undecoded."""
+        if self.compressed or self.is_loaded():
+            return super(FileContent, self).equals(text)
+
+        if os.linesep != '\n':
+            text = text.replace('\n', os.linesep)
+        data = text.encode(self.encoding)
+
+        content = self.data()
+        return len(content) == len(data) and content.find(data) == 0
+
+    def close(self):
+        """Unmap the file, if mapped."""
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = None
+
+
+class DirectorySink(Sink):
+
+    """Write output files directly into the file system.
+
+    Files with a .gz, .bz2 or .xz suffix are (de)compressed transparently,
+    using the given compression level when writing.
+    Output files are written atomically, so readers see either the old or
+    the complete new content: they are written under a temporary name in
+    the same directory and then renamed.  That also keeps the mode, but
+    not the owner, of files replaced.  Files that aren't regular files
+    or lie in read-only directories are written in place instead.
+    With lock, an advisory lock on a .lock file next to each output file
+    is held while writing it (where fcntl is available).  The lock files
+    are left in place, as removing one could let two processes hold
+    locks on different files for the same output.
+    With sync, output files are committed in batches: the temporary
+    files of a batch are flushed to disk one after another before they
+    are all renamed, and the directories renamed into are flushed once
+    when the sink is closed.  Until then, reads and links see the
+    pending content.
+    """
+
+    def __init__(self, level=None, atomic=True, lock=False, sync=False):
+        """Initialize compression level and how to write files."""
+        self.level = level
+        self.atomic = atomic
+        self.lock = lock
+        self.sync = sync
+        self._mutex = threading.Lock()
+        # temporary files and locks by output file, and files written
+        # in place, waiting to be committed
+        self._pending = collections.OrderedDict()
+        self._unsynced = []
+        self._callbacks = []
+        self._directories = set()
+
+    def _current(self, path):
+        """Return the path holding the current content of an output file."""
+        if self._pending:
+            with self._mutex:
+                pending = self._pending.get(os.path.realpath(path))
+            if pending is not None:
+                return pending[0]
+
+        return path
+
+    def read(self, path):
+        """Return (uncompressed) content of a preexisting file or None."""
+        path = self._current(path)
+        try:
+            with compression.open_text(path, 'r') as f:
+                return f.read()
+        except compression.ERRORS:
+            return None
+
+    def read_lazily(self, path):
+        """Return a FileContent for a preexisting file or None."""
+        try:
+            return FileContent(self._current(path))
+        except (IOError, OSError):
+            return None
+
+    def _unshare(self, path):
+        """Remove the file if it is hard linked, so as not to write through."""
+        try:
+            if os.lstat(path).st_nlink > 1:
+                os.remove(path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    def _lock(self, path):
+        """Return the open lock file of an output file, if locking.
+
+        Pending output files are committed before waiting for a lock, so
+        their locks aren't held meanwhile.
+        """
+        if not self.lock or fcntl is None:
+            return None
+
+        f = open(path + '.lock', 'a')
+        try:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError as e:
+                if e.errno not in (errno.EAGAIN, errno.EACCES):
+                    raise
+                self.commit()
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            f.close()
+            raise
+
+        return f
+
+    @contextlib.contextmanager
+    def _locked(self, path):
+        """Hold the lock for an output file, if locking."""
+        lock = self._lock(path)
+        try:
+            yield
+        finally:
+            if lock is not None:
+                lock.close()
+
+    def _target(self, path):
+        """Return the file to replace atomically and its mode, if any.
+
+        Symbolic links are followed.  Returns None as the file if it
+        can't be replaced.
+        """
+        if not self.atomic:
+            return None, None
+
+        if os.path.islink(path):
+            path = os.path.realpath(path)
+
+        try:
+            mode = os.stat(path).st_mode
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return path, None
+
+        if not stat.S_ISREG(mode):
+            return None, None
+
+        return path, stat.S_IMODE(mode)
+
+    def _discard(self, path):
+        """Drop the pending content of an output file, if any."""
+        with self._mutex:
+            pending = self._pending.pop(os.path.realpath(path), None)
+
+        if pending is not None:
+            temp, lock = pending
+            _remove(temp)
+            if lock is not None:
+                lock.close()
+
+    def _defer(self, target, temp, lock):
+        """Queue a temporary file to be renamed to target on commit.
+
+        Files written in place are queued to be flushed only.
+        """
+        self._discard(target)
+        if temp is None and lock is not None:
+            lock.close()
+
+        with self._mutex:
+            if temp is not None:
+                self._pending[os.path.realpath(target)] = (temp, lock)
+            else:
+                self._unsynced.append(target)
+            full = len(self._pending) + len(self._unsynced) >= SYNC_BATCH
+
+        if full:
+            self.commit()
+
+    @contextlib.contextmanager
+    def _replacing(self, path, make=None):
+        """Provide a path to create a new output file at.
+
+        The file is created with make() if given, else by the caller.
+        Unless written in place, it is renamed to the output file when
+        the context is left, or on commit if syncing.  It is removed if
+        the context is left with an error.
+        """
+        lock = self._lock(path)
+        try:
+            target, mode = self._target(path)
+            temp = None
+            if target is not None:
+                temp = _temporary(target, make or _create)
+
+            if temp is None:
+                self._discard(path)
+                if make is None:
+                    self._unshare(path)
+                else:
+                    _remove(path)
+                    make(path)
+
+                target = path
+                try:
+                    yield path
+                except BaseException:
+                    _remove(path)
+                    raise
+            else:
+                try:
+                    if make is None and mode is not None:
+                        os.chmod(temp, mode)
+                    yield temp
+                    if not self.sync:
+                        _replace(temp, target)
+                except BaseException:
+                    _remove(temp)
+                    raise
+        except BaseException:
+            if lock is not None:
+                lock.close()
+            raise
+
+        if not self.sync:
+            if lock is not None:
+                lock.close()
+            return
+
+        self._defer(target, temp, lock)
+
+    def write(self, path, content):
+        """Write content to a file, possibly compressing it.
+
+        Hard links are broken up instead of writing through them.
+        """
+        with self._replacing(path) as temp:
+            with compression.open_text(temp, 'w', level=self.level) as f:
+                f.write(content)
+
+    @contextlib.contextmanager
+    def open(self, path):
+        """Provide the file, possibly compressing, for writing as you go.
+
+        The file is left as it was if the context is left with an error.
+        """
+        with self._replacing(path) as temp:
+            with compression.open_text(temp, 'w', level=self.level) as f:
+                yield f
+
+    def _link(self, path, make):
+        """Create the file with make(), returning whether that worked."""
+        try:
+            with self._replacing(path, make):
+                pass
+        except (IOError, OSError, AttributeError):
+            return False
+
+        return True
+
+    def link(self, path, source, method='hardlink'):
+        """Replace the file with a link to or copy of source, if possible.
+
+        Falls back from hard links or reflinks to copying.
+        """
+        if (compression.compression_suffix(path) !=
+                compression.compression_suffix(source)):
+            return False
+
+        source = self._current(source)
+
+        def reflink(temp):
+            _create(temp)
+            if not _reflink(source, temp):
+                raise OSError(errno.EOPNOTSUPP, "can't reflink", temp)
+
+        def copy(temp):
+            _create(temp)
+            shutil.copyfile(source, temp)
+
+        if method == 'hardlink':
+            if self._link(path, lambda temp: os.link(source, temp)):
+                return True
+        elif method == 'reflink':
+            if self._link(path, reflink):
+                return True
+
+        return self._link(path, copy)
+
+    def remove(self, path):
+        """Remove file, if it exists."""
+        with self._locked(path):
+            self._discard(path)
+            _remove(path)
+
+    def commit(self):
+        """Flush pending output files to disk and rename them into place.
+
+        Then calls the callbacks waiting for that.
+        """
+        with self._mutex:
+            pending, self._pending = self._pending, collections.OrderedDict()
+            unsynced, self._unsynced = self._unsynced, []
+            callbacks, self._callbacks = self._callbacks, []
+
+        try:
+            if pending or unsynced:
+                _flush([temp for temp, __ in pending.values()] + unsynced)
+
+            for target, (temp, __) in pending.items():
+                _replace(temp, target)
+
+            with self._mutex:
+                self._directories.update(
+                        os.path.dirname(os.path.realpath(path))
+                        for path in itertools.chain(pending, unsynced))
+        finally:
+            for __, lock in pending.values():
+                if lock is not None:
+                    lock.close()
+
+        for callback in callbacks:
+            callback()
+
+    def after_commit(self, callback):
+        """Call callback once the output files written so far are stored."""
+        with self._mutex:
+            if self._pending or self._unsynced:
+                self._callbacks.append(callback)
+                return
+
+        callback()
+
+    def close(self):
+        """Commit output files and flush their directories, if syncing."""
+        self.commit()
+
+        with self._mutex:
+            directories, self._directories = self._directories, set()
+
+        if _O_DIRECTORY is not None:
+            for directory in sorted(directories):
+                _fsync(directory, os.O_RDONLY | _O_DIRECTORY)
+
+
+class DictSink(Sink):
+
+    """Collect output files in a dictionary.
+
+    Useful for testing and for using eztemplate as a library.
+    """
+
+    def __init__(self, outputs=None):
+        """Initialize dictionary of outputs."""
+        self.outputs = outputs if outputs is not None else {}
+
+    def read(self, path):
+        """Return previously stored content or None."""
+        return self.outputs.get(path)
+
+    def write(self, path, content):
+        """Store content in dictionary."""
+        self.outputs[path] = content
+
+    def remove(self, path):
+        """Drop content from dictionary, if present."""
+        self.outputs.pop(path, None)
+
+
+class TarSink(Sink):
+
+    """Append output files to a tar archive as a stream.
+
+    Only the current member is kept in memory.
+    """
+
+    def __init__(self, file_or_path, compression=None, encoding='utf-8'):
+        """Open archive for writing, possibly compressed (gz, bz2 or xz)."""
+        mode = 'w|' + (compression or '')
+        if hasattr(file_or_path, 'write'):
+            self.archive = tarfile.open(fileobj=file_or_path, mode=mode)
+        else:
+            self.archive = tarfile.open(file_or_path, mode=mode)
+        self.encoding = encoding
+        self._names = set()
+
+    def _add(self, path, size, fileobj):
+        """Append size bytes read from fileobj as a member."""
+        self._names.add(member_name(path))
+
+        info = tarfile.TarInfo(member_name(path))
+        info.size = size
+        info.mtime = time.time()
+        info.mode = 0o644
+
+        self.archive.addfile(info, fileobj)
+
+    def write(self, path, content):
+        """Append content as a member to the archive."""
+        data = content.encode(self.encoding)
+        self._add(path, len(data), io.BytesIO(data))
+
+    @contextlib.contextmanager
+    def open(self, path):
+        """Provide a stream spooled to a temporary file until complete.
+
+        Members must be preceded by their size, so they can't be
+        streamed into the archive directly.
+        """
+        with tempfile.TemporaryFile() as spool:
+            stream = io.TextIOWrapper(spool, encoding=self.encoding,
+                                      newline='')
+            try:
+                yield stream
+                stream.flush()
+                size = spool.tell()
+                spool.seek(0)
+                self._add(path, size, spool)
+            finally:
+                stream.detach()
+
+    def link(self, path, source, method='hardlink'):
+        """Add a hard link member if source is already in the archive."""
+        linkname = member_name(source)
+        if method == 'copy' or linkname not in self._names:
+            return False
+
+        info = tarfile.TarInfo(member_name(path))
+        info.type = tarfile.LNKTYPE
+        info.linkname = linkname
+        info.mtime = time.time()
+        info.mode = 0o644
+
+        self.archive.addfile(info)
+        self._names.add(info.name)
+        return True
+
+    def remove(self, path):
+        """Do nothing, as the member is simply never added."""
+        pass
+
+    def close(self):
+        """Finish archive."""
+        self.archive.close()
+
+
+class ZipSink(Sink):
+
+    """Append output files to a zip archive."""
+
+    def __init__(self, file_or_path, compression=zipfile.ZIP_DEFLATED,
+                 encoding='utf-8'):
+        """Open archive for writing."""
+        self.archive = zipfile.ZipFile(file_or_path, 'w',
+                                       compression=compression)
+        self.encoding = encoding
+
+    def write(self, path, content):
+        """Append content as a member to the archive."""
+        info = zipfile.ZipInfo(member_name(path),
+                               date_time=time.localtime()[:6])
+        info.compress_type = self.archive.compression
+        info.external_attr = 0o644 << 16
+
+        self.archive.writestr(info, content.encode(self.encoding))
+
+    def remove(self, path):
+        """Do nothing, as the member is simply never added."""
+        pass
+
+    def close(self):
+        """Finish archive."""
+        self.archive.close()
+
+
+ARCHIVE_TYPES = (
+        (('.zip',), ZipSink, {}),
+        (('.tar',), TarSink, {}),
+        (('.tar.gz', '.tgz'), TarSink, {'compression': 'gz'}),
+        (('.tar.bz2', '.tbz2'), TarSink, {'compression': 'bz2'}),
+        (('.tar.xz', '.txz'), TarSink, {'compression': 'xz'}),
+    )
+
+
+def is_archive_path(path):
+    """Check whether the file name suffix denotes a known archive type."""
+    return any(path.lower().endswith(suffixes)
+               for suffixes, __, __ in ARCHIVE_TYPES)
+
+
+def open_sink(path):
+    """Open an archive sink of a kind depending on the file name suffix."""
+    for suffixes, sink_class, kwargs in ARCHIVE_TYPES:
+        if path.lower().endswith(suffixes):
+            return sink_class(path, **kwargs)
+
+    raise ValueError("unknown archive type: %s" % (path,))
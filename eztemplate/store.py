@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""Provide a content addressed render cache shared between runs."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import binascii
+import errno
+import hashlib
+import os
+import os.path
+import socket
+
+from . import __version__
+from .cache import canonical_digest
+
+
+# bump when the key derivation or the entry layout changes
+FORMAT = 1
+
+# suffix of the files recording when an entry was last used
+USED_SUFFIX = '.used'
+
+
+class RenderStore(object):
+
+    """Share rendering results through a directory keyed by content hashes.
+
+    The key covers the template source, engine and version, tolerance and
+    the canonicalized values the template references.  Entries are written
+    to a unique temporary name and renamed into place, so several processes
+    (even on different machines sharing the directory over NFS) can use
+    the store at the same time.
+    """
+
+    def __init__(self, directory, max_size=None, link=False,
+                 encoding='utf-8'):
+        """Initialize store in directory, creating it if necessary."""
+        self.directory = directory
+        self.max_size = max_size
+        self.link = link
+        self.encoding = encoding
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def key(self, template, mapping, tolerant=False):
+        """Compute the key of a rendering or None if it can't be shared.
+
+        Templates must know the names they reference, so the context
+        can be narrowed down and there are no includes to account for.
+        """
+        names = template.referenced_names()
+        if names is None or template.source_digest is None:
+            return None
+
+        try:
+            context = canonical_digest(mapping, names)
+        except TypeError:
+            return None
+
+        h = hashlib.sha256()
+        for part in (FORMAT, __version__,
+                     template.handle, template.version, bool(tolerant),
+                     template.source_digest,
+                     binascii.hexlify(context).decode('ascii')):
+            h.update((u'%s\0' % (part,)).encode('utf-8'))
+
+        return h.hexdigest()
+
+    def path(self, key):
+        """Return the path of the entry for key."""
+        return os.path.join(self.directory, key[:2], key[2:])
+
+    def get(self, key):
+        """Return the stored result for key or None.
+
+        Marks the entry as recently used for eviction purposes.  This
+        touches a sidecar file rather than the entry, which may be hard
+        linked to output files whose modification time must not change.
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read().decode(self.encoding)
+        except IOError:
+            return None
+
+        used_path = path + USED_SUFFIX
+        try:
+            open(used_path, 'ab').close()
+            os.utime(used_path, None)
+        except (IOError, OSError):
+            pass
+
+        return content
+
+    def put(self, key, content):
+        """Store result for key."""
+        path = self.path(key)
+
+        try:
+            os.mkdir(os.path.dirname(path))
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        temp_path = '%s.%s.%d.%s.tmp' % (
+                path,
+                socket.gethostname(),
+                os.getpid(),
+                binascii.hexlify(os.urandom(4)).decode('ascii'),
+            )
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(content.encode(self.encoding))
+            os.rename(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def entries(self):
+        """Yield (mtime, size, path) of all entries.
+
+        The mtime is the time the entry was stored or last used.
+        """
+        for dirpath, __, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith(('.tmp', USED_SUFFIX)):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                try:
+                    used = os.stat(path + USED_SUFFIX).st_mtime
+                except OSError:
+                    used = st.st_mtime
+                yield max(st.st_mtime, used), st.st_size, path
+
+    def evict(self):
+        """Remove least recently used entries until below max_size."""
+        if self.max_size is None:
+            return
+
+        entries = sorted(self.entries())
+        total = sum(size for __, size, __ in entries)
+
+        for __, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+            else:
+                self.evictions += 1
+            try:
+                os.remove(path + USED_SUFFIX)
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+            total -= size
+
+    def report(self):
+        """Return a description of usage statistics."""
+        count = size = 0
+        for __, entry_size, __ in self.entries():
+            count += 1
+            size += entry_size
+
+        return ("cache: %d hits, %d misses, %d evictions; "
+                "%d entries, %d bytes in %s" % (
+                    self.hits, self.misses, self.evictions,
+                    count, size, self.directory))
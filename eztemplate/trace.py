@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""Provide timeline traces in Trace Event Format.
+
+The resulting JSON files can be loaded into chrome://tracing or Perfetto.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+def now():
+    """Return the current time in microseconds."""
+    return time.time() * 1e6
+
+
+class Tracer(object):
+
+    """Collect complete events (spans) of the current process.
+
+    Events recorded in forked worker processes can be transferred
+    to the parent with mark() and since() and merged with extend().
+    """
+
+    def __init__(self):
+        """Initialize empty event list."""
+        self.events = []
+        self._main_pid = os.getpid()
+
+    def add(self, name, start, duration, args=None, category='eztemplate'):
+        """Record a span given start and duration in microseconds."""
+        event = {
+                'name': name,
+                'cat':  category,
+                'ph':   'X',
+                'ts':   start,
+                'dur':  duration,
+                'pid':  os.getpid(),
+                'tid':  threading.current_thread().ident,
+            }
+        if args:
+            event['args'] = args
+
+        self.events.append(event)
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """Record a span around a block.
+
+        The block may add further arguments to the yielded dictionary.
+        """
+        start = now()
+        try:
+            yield args
+        finally:
+            self.add(name, start, now() - start, args)
+
+    def mark(self):
+        """Return a marker for the current end of the event list."""
+        return len(self.events)
+
+    def since(self, mark):
+        """Remove and return the events recorded after the marker."""
+        events = self.events[mark:]
+        del self.events[mark:]
+        return events
+
+    def extend(self, events):
+        """Merge events recorded elsewhere."""
+        self.events.extend(events)
+
+    def write(self, path):
+        """Write trace to a JSON file, naming each process as a track."""
+        metadata = [{
+                'name': 'process_name',
+                'ph':   'M',
+                'pid':  pid,
+                'args': {'name': ('eztemplate'
+                                  if pid == self._main_pid
+                                  else 'worker %d' % (pid,))},
+            } for pid in sorted(set(event['pid'] for event in self.events))]
+
+        with open(path, 'w') as f:
+            json.dump({
+                    'traceEvents':     metadata + self.events,
+                    'displayTimeUnit': 'ms',
+                }, f)
+
+
+class _NullSpan(object):
+
+    """Provide a reusable context manager that does nothing."""
+
+    def __enter__(self):
+        """Provide a throwaway argument dictionary."""
+        return {}
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Don't suppress exceptions."""
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class NullTracer(object):
+
+    """Provide the Tracer interface without recording anything."""
+
+    def add(self, name, start, duration, args=None, category='eztemplate'):
+        """Do nothing."""
+        pass
+
+    def span(self, name, **args):
+        """Run block without recording."""
+        return _NULL_SPAN
+
+    def mark(self):
+        """Return a dummy marker."""
+        return 0
+
+    def since(self, mark):
+        """Return no events."""
+        return []
+
+    def extend(self, events):
+        """Do nothing."""
+        pass
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""Provide a pool of worker processes forked after preparation."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import multiprocessing
+import os
+
+
+# The task is handed to the workers by inheritance rather than pickling.
+# That way everything it refers to (compiled templates in particular)
+# is shared copy-on-write, and only indices and results pass the pipes.
+_task = None
+
+
+def _get_context():
+    """Return a multiprocessing context that forks, or None."""
+    try:
+        get_context = multiprocessing.get_context
+    except AttributeError:
+        # Python 2 always forks on platforms that are able to
+        return multiprocessing if hasattr(os, 'fork') else None
+
+    try:
+        return get_context('fork')
+    except ValueError:
+        return None
+
+
+def can_fork():
+    """Check whether worker processes can be forked on this platform."""
+    return _get_context() is not None
+
+
+def _run(index):
+    """Perform the inherited task for one index."""
+    return _task(index)
+
+
+def map_forked(task, count, jobs, chunksize=None):
+    """Yield the results of task(index) for all indices below count in order.
+
+    The workers are forked once from the current process when iteration
+    starts, so they inherit everything task needs.
+    """
+    global _task
+
+    if chunksize is None:
+        chunksize = max(1, min(256, count // (jobs * 4)))
+
+    # workers replacing ones that died are forked later, so the task
+    # stays in place until the pool is done
+    _task = task
+    try:
+        pool = _get_context().Pool(jobs)
+        try:
+            for result in pool.imap(_run, range(count), chunksize):
+                yield result
+        except BaseException:
+            pool.terminate()
+            raise
+        else:
+            pool.close()
+        finally:
+            pool.join()
+    finally:
+        _task = None
@@ -8,8 +8,10 @@ import os
 import os.path
 import re
 import subprocess
+import sys
 
 from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py
 
 
 def get_version():
@@ -103,6 +105,18 @@ def get_long_description():
     return description
 
 
+class BuildPy(build_py):
+
+    """Leave out modules the running Python version can't compile."""
+
+    def find_package_modules(self, package, package_dir):
+        modules = build_py.find_package_modules(self, package, package_dir)
+        if sys.version_info < (3, 6):
+            modules = [module for module in modules
+                       if module[:2] != ('eztemplate', 'aio')]
+        return modules
+
+
 if __name__ == '__main__':
     os.chdir(os.path.dirname(__file__))
     setup(
@@ -125,6 +139,8 @@ if __name__ == '__main__':
             extras_require={
                     'empy': ['empy'],
                     'mako': ['mako'],
+                    'toml': ['toml'],
+                    'yaml': ['PyYAML'],
                 },
             test_suite='tests',
             packages=find_packages(exclude=[
@@ -135,6 +151,9 @@ if __name__ == '__main__':
                 ]),
             include_package_data=True,
             zip_safe=False,
+            cmdclass={
+                    'build_py': BuildPy,
+                },
             entry_points={
                 'console_scripts': [
                     'eztemplate = eztemplate.__main__:main_command',
@@ -5,9 +5,49 @@ from __future__ import absolute_import
 from __future__ import print_function
 
 import os.path
+import shutil
 import sys
+import tempfile
+import unittest
 sys.path.insert(0, os.path.abspath('..'))
 
 import eztemplate
 import eztemplate.__main__
 import eztemplate.engines as engines
+import eztemplate.cache
+import eztemplate.sinks
+import eztemplate.bundles
+import eztemplate.workers
+import eztemplate.governor
+import eztemplate.trace
+import eztemplate.fingerprints
+import eztemplate.compression
+import eztemplate.store
+import eztemplate.matrix
+import eztemplate.data
+import eztemplate.journal
+import eztemplate.pyargs
+
+
+class TempDirTestCase(unittest.TestCase):
+
+    """Provide a temporary directory that is removed after each test."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def write(self, name, content):
+        path = self.path(name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def read(self, name):
+        with open(self.path(name), 'r') as f:
+            return f.read()
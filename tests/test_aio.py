@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+import sys
+import threading
+
+from .context import eztemplate
+from .context import engines
+from .context import TempDirTestCase
+
+if sys.version_info >= (3, 6):
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    import eztemplate.aio
+
+
+def run(coroutine):
+    """Run a coroutine in a new event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def collect(generator):
+    """Return the items of an asynchronous generator in a list."""
+    loop = asyncio.new_event_loop()
+    items = []
+    try:
+        while True:
+            try:
+                items.append(loop.run_until_complete(generator.__anext__()))
+            except StopAsyncIteration:
+                return items
+    finally:
+        loop.close()
+
+
+class BlockingEngine(engines.Engine):
+
+    """Engine waiting for an event before applying a template."""
+
+    def __init__(self, template, **kwargs):
+        super(BlockingEngine, self).__init__(**kwargs)
+        self.template = template
+        self.proceed = threading.Event()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.most_running = 0
+
+    def apply(self, mapping):
+        with self.lock:
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        try:
+            self.proceed.wait(10)
+            return self.template % mapping
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+@unittest.skipUnless(sys.version_info >= (3, 6), "requires Python 3.6")
+class TestAsyncRenderer(TempDirTestCase):
+
+    def test_render_async(self):
+        template = self.write('template', '$essen mit $beilage\n')
+
+        result = run(eztemplate.aio.render_async(
+                template, {'essen': 'Gulasch', 'beilage': 'Nockerl'}))
+        self.assertEqual(result, 'Gulasch mit Nockerl\n')
+
+        outfile = self.path('output')
+        run(eztemplate.aio.render_async(
+                template, {'essen': 'Schnitzel', 'beilage': 'Salat'},
+                outfile=outfile))
+        self.assertEqual(self.read('output'), 'Schnitzel mit Salat\n')
+
+    def test_process_combinations(self):
+        template = self.write('template', '${ez_stem}: $essen\n')
+        sink = eztemplate.sinks.DictSink()
+        renderer = eztemplate.aio.AsyncRenderer(sink=sink, concurrency=3)
+
+        combinations = [('%d.txt' % (number,), template,
+                         {'essen': 'Gulasch %d' % (number,)})
+                        for number in range(10)]
+
+        results = collect(renderer.process_combinations(combinations))
+        self.assertEqual(results, [('%d.txt' % (number,),
+                                    '%d: Gulasch %d\n' % (number, number))
+                                   for number in range(10)])
+        self.assertEqual(sink.outputs, dict(results))
+
+    def test_shared_template_cache(self):
+        template = self.write('template', '$essen\n')
+        renderer = eztemplate.aio.AsyncRenderer()
+
+        compiled = run(renderer.read(template))
+
+        sink = eztemplate.sinks.DictSink()
+        eztemplate.__main__.process_combinations(
+                [('output', template, {'essen': 'Gulasch'})],
+                engines.engines['string.Template'],
+                sink=sink,
+                templatereader=renderer.templatereader)
+
+        self.assertIs(renderer.templatereader.read(template), compiled)
+        self.assertEqual(sink.outputs, {'output': 'Gulasch\n'})
+
+    def test_concurrency_and_cancellation(self):
+        template = self.write('template', '%(essen)s\n')
+        sink = eztemplate.sinks.DictSink()
+        executor = ThreadPoolExecutor(8)
+        renderer = eztemplate.aio.AsyncRenderer(engine=BlockingEngine,
+                                                sink=sink,
+                                                executor=executor,
+                                                concurrency=2)
+        compiled = renderer.templatereader.read(template)
+
+        loop = asyncio.new_event_loop()
+        try:
+            tasks = [loop.create_task(
+                        renderer.process('%d.txt' % (number,), template,
+                                         {'essen': 'Gulasch'}))
+                     for number in range(4)]
+            while compiled.running < 2:
+                loop.run_until_complete(asyncio.sleep(0.01))
+
+            for task in tasks:
+                task.cancel()
+            compiled.proceed.set()
+            results = loop.run_until_complete(
+                    asyncio.gather(*tasks, return_exceptions=True))
+        finally:
+            loop.close()
+            executor.shutdown()
+
+        self.assertEqual(compiled.most_running, 2)
+        self.assertTrue(all(isinstance(result, asyncio.CancelledError)
+                            for result in results))
+        self.assertEqual(sink.outputs, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
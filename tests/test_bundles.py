@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+import io
+import tarfile
+import zipfile
+
+from .context import eztemplate
+from .context import engines
+from .context import TempDirTestCase
+
+
+TEMPLATES = {
+        'templates/main.txt':          'Heute gibt es $essen.\n',
+        'templates/main.mako':         '<%include file="parts/beilage.mako"/>'
+                                       '${essen}\n',
+        'templates/parts/beilage.mako': '${beilage} mit ',
+    }
+
+
+class BundleTestCase(TempDirTestCase):
+
+    def setUp(self):
+        super(BundleTestCase, self).setUp()
+
+        self.tar_path = self.path('templates.tar.gz')
+        with tarfile.open(self.tar_path, 'w:gz') as archive:
+            for name, content in sorted(TEMPLATES.items()):
+                data = content.encode('utf-8')
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+
+        self.zip_path = self.path('templates.zip')
+        with zipfile.ZipFile(self.zip_path, 'w') as archive:
+            for name, content in sorted(TEMPLATES.items()):
+                archive.writestr(name, content)
+
+
+class TestBundles(BundleTestCase):
+
+    def test_normalize(self):
+        normalize = eztemplate.bundles.normalize
+        self.assertEqual(normalize('./templates//main.txt'),
+                         'templates/main.txt')
+        self.assertEqual(normalize('/templates/parts/../main.txt'),
+                         'templates/main.txt')
+
+    def test_read(self):
+        for path in (self.tar_path, self.zip_path):
+            with eztemplate.bundles.open_bundle(path) as bundle:
+                self.assertEqual(bundle.names(), sorted(TEMPLATES))
+                self.assertIn('./templates/main.txt', bundle)
+                self.assertEqual(bundle.read('templates/main.txt'),
+                                 TEMPLATES['templates/main.txt'])
+                self.assertRaises(IOError, bundle.read, 'missing.txt')
+
+    def test_not_an_archive(self):
+        path = self.write('plain.txt', '$essen\n')
+
+        self.assertRaises(ValueError, eztemplate.bundles.open_bundle, path)
+
+
+class TestCachedTemplateReader(BundleTestCase):
+
+    def test_cache_by_member_name(self):
+        engine = engines.engines['string.Template']
+
+        with eztemplate.bundles.open_bundle(self.zip_path) as bundle:
+            reader = eztemplate.__main__.CachedTemplateReader(engine,
+                                                              bundle=bundle)
+            template = reader.read('templates/main.txt')
+            self.assertIs(reader.read('./templates/main.txt'), template)
+            self.assertEqual(template.apply({'essen': 'Gulasch'}),
+                             'Heute gibt es Gulasch.\n')
+
+    @unittest.skipIf('mako' not in engines.engines, "engine not available")
+    def test_mako_include(self):
+        engine = engines.engines['mako']
+
+        with eztemplate.bundles.open_bundle(self.tar_path) as bundle:
+            reader = eztemplate.__main__.CachedTemplateReader(engine,
+                                                              bundle=bundle)
+            template = reader.read('templates/main.mako')
+            self.assertEqual(template.apply({'essen': 'Gulasch',
+                                             'beilage': 'Kartoffeln'}),
+                             'Kartoffeln mit Gulasch\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
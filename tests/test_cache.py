@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+from .context import eztemplate
+from .context import engines
+
+
+class TestCanonicalize(unittest.TestCase):
+
+    def test_mapping_order_irrelevant(self):
+        a = {'essen': 'Gulasch', 'beilage': ['Kartoffeln', 'Nudeln']}
+        b = {'beilage': ['Kartoffeln', 'Nudeln'], 'essen': 'Gulasch'}
+
+        self.assertEqual(eztemplate.cache.canonicalize(a),
+                         eztemplate.cache.canonicalize(b))
+
+    def test_types_distinguished(self):
+        self.assertNotEqual(eztemplate.cache.canonicalize({'value': 1}),
+                            eztemplate.cache.canonicalize({'value': '1'}))
+
+    def test_unknown_type(self):
+        self.assertRaises(TypeError, eztemplate.cache.canonicalize, object())
+
+    def test_digest_restricted_to_names(self):
+        digest = eztemplate.cache.canonical_digest
+        self.assertEqual(digest({'essen': 'Gulasch', 'random': 1}, {'essen'}),
+                         digest({'essen': 'Gulasch', 'random': 2}, {'essen'}))
+        self.assertNotEqual(digest({'essen': 'Gulasch', 'random': 1}),
+                            digest({'essen': 'Gulasch', 'random': 2}))
+
+
+class CountingEngine(engines.Engine):
+
+    def __init__(self, template, names=None, **kwargs):
+        super(CountingEngine, self).__init__(**kwargs)
+
+        self.template = template
+        self.names = names
+        self.applied = 0
+
+    def referenced_names(self):
+        return self.names
+
+    def apply(self, mapping):
+        self.applied += 1
+        return self.template % mapping
+
+
+class TestRenderCache(unittest.TestCase):
+
+    def test_identical_context_rendered_once(self):
+        template = CountingEngine('%(essen)s', names=frozenset(['essen']))
+        cache = eztemplate.cache.RenderCache(maxsize=10)
+
+        results = [cache.render(template, {'essen': 'Gulasch', 'random': i})
+                   for i in range(5)]
+
+        self.assertEqual(results, ['Gulasch'] * 5)
+        self.assertEqual(template.applied, 1)
+        self.assertEqual((cache.hits, cache.misses), (4, 1))
+
+    def test_unknown_names_use_whole_mapping(self):
+        template = CountingEngine('%(essen)s')
+        cache = eztemplate.cache.RenderCache(maxsize=10)
+
+        for i in range(3):
+            cache.render(template, {'essen': 'Gulasch', 'random': i})
+        cache.render(template, {'essen': 'Gulasch', 'random': 0})
+
+        self.assertEqual(template.applied, 3)
+
+    def test_uncanonicalizable_values_not_cached(self):
+        template = CountingEngine('%(essen)s', names=frozenset(['essen']))
+        cache = eztemplate.cache.RenderCache(maxsize=10)
+
+        for __ in range(2):
+            cache.render(template, {'essen': object()})
+
+        self.assertEqual(template.applied, 2)
+
+    def test_size_bound(self):
+        template = CountingEngine('%(essen)s', names=frozenset(['essen']))
+        cache = eztemplate.cache.RenderCache(maxsize=2)
+
+        for essen in ('a', 'b', 'c', 'a'):
+            cache.render(template, {'essen': essen})
+
+        self.assertEqual(template.applied, 4)
+
+
+class TestProcessCombinations(unittest.TestCase):
+
+    def test_render_cache(self):
+        template = CountingEngine('%(essen)s', names=frozenset(['essen']))
+        infile = StringIO('%(essen)s')
+        outfile = mock.Mock()
+
+        eztemplate.__main__.process_combinations(
+                ((outfile, infile, {'essen': 'Gulasch', 'n': n})
+                 for n in range(3)),
+                lambda *args, **kwargs: template,
+                render_cache=16,
+            )
+
+        self.assertEqual(template.applied, 1)
+        self.assertEqual(outfile.write.call_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+import io
+import sys
+import types
+
+from .context import eztemplate
+from .context import engines
+from .context import TempDirTestCase
+
+
+def load_module(name, source):
+    module = types.ModuleType(name)
+    sys.modules[name] = module
+    try:
+        exec(compile(source, name, 'exec'), module.__dict__)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+class TestPythonSource(unittest.TestCase):
+
+    MAPPINGS = [
+            {'essen': 'Gulasch', 'beilage': ['Nockerl', 'Salat'],
+             'preis': 7.5, 'breite': 12},
+            {'essen': u'Gul\xe4sch', 'beilage': [u'Kn\xf6del'], 'preis': 8,
+             'breite': 3},
+        ]
+
+    def assertCompiledEqual(self, engine, text, mappings, tolerant=False):
+        template = engine(text, tolerant=tolerant)
+        module = load_module('compiled_%s' % (id(template),),
+                             template.python_source())
+        try:
+            for mapping in mappings:
+                stream = io.StringIO()
+                module.render_to(mapping, stream)
+
+                self.assertEqual(module.render(mapping),
+                                 template.apply(mapping))
+                self.assertEqual(stream.getvalue(), template.apply(mapping))
+        finally:
+            del sys.modules[module.__name__]
+
+        return module
+
+    def test_string_template(self):
+        engine = engines.engines['string.Template']
+
+        self.assertCompiledEqual(
+                engine,
+                u'Heute gibt es $essen mit ${beilage} fuer $$$preis.\n',
+                self.MAPPINGS)
+        self.assertCompiledEqual(
+                engine,
+                u'$essen mit $fehlt, $ und $beilage\n',
+                self.MAPPINGS + [{'essen': None}],
+                tolerant=True)
+
+        self.assertRaises(ValueError,
+                          engine(u'$essen fuer $ 7').python_source)
+
+    def test_string_template_missing(self):
+        engine = engines.engines['string.Template']
+        module = load_module(
+                'compiled_missing',
+                engine(u'$essen mit $beilage').python_source())
+        try:
+            self.assertRaises(KeyError, module.render, {'essen': 'Gulasch'})
+            self.assertRaises(KeyError, module.render,
+                              {'essen': 'Gulasch', 'beilage': None})
+        finally:
+            del sys.modules['compiled_missing']
+
+    def test_string_formatter(self):
+        engine = engines.engines['string.Formatter']
+
+        self.assertCompiledEqual(
+                engine,
+                u'Heute gibt es {essen!r:>{breite}} mit {beilage[0]} '
+                u'fuer {{{preis:.2f}}}.\n',
+                self.MAPPINGS)
+        self.assertCompiledEqual(
+                engine,
+                u'{essen} mit {fehlt[1]!r:>5}\n',
+                self.MAPPINGS,
+                tolerant=True)
+
+    @unittest.skipUnless('mako' in engines.engines, "mako not available")
+    def test_mako(self):
+        engine = engines.engines['mako']
+
+        self.assertCompiledEqual(
+                engine,
+                u'Heute gibt es ${essen} mit\n'
+                u'% for b in beilage:\n'
+                u'- ${b}\n'
+                u'% endfor\n',
+                self.MAPPINGS)
+
+
+class TestCompileCommand(TempDirTestCase):
+
+    def test_compile_to_file(self):
+        infile = self.write('template', '{essen} mit {beilage}\n')
+        outfile = self.path('renderer.py')
+
+        args = eztemplate.__main__.parse_compile_args([
+                '--engine', 'string.Formatter',
+                '-o', outfile,
+                infile,
+            ])
+        self.assertEqual(eztemplate.__main__.compile_template(args), 0)
+
+        with io.open(outfile, 'r', encoding='utf-8') as f:
+            module = load_module('compiled_file', f.read())
+        try:
+            self.assertEqual(module.render({'essen': 'Gulasch',
+                                            'beilage': 'Nockerl'}),
+                             'Gulasch mit Nockerl\n')
+        finally:
+            del sys.modules['compiled_file']
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+import gzip
+import os.path
+
+from .context import eztemplate
+from .context import engines
+from .context import TempDirTestCase
+
+
+class TestOpenText(TempDirTestCase):
+
+    def test_round_trip(self):
+        for suffix in ['.txt'] + sorted(eztemplate.compression.CODECS):
+            path = self.path('output' + suffix)
+
+            with eztemplate.compression.open_text(path, 'w', level=1) as f:
+                f.write(u'Heute gibt es Gul\xe4sch.\n')
+
+            with eztemplate.compression.open_text(path, 'r') as f:
+                self.assertEqual(f.read(), u'Heute gibt es Gul\xe4sch.\n')
+
+    def test_actually_compressed(self):
+        path = self.path('output.txt.gz')
+
+        with eztemplate.compression.open_text(path, 'w') as f:
+            f.write('Gulasch\n' * 1000)
+
+        self.assertLess(os.path.getsize(path), 1000)
+        with gzip.open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'Gulasch\n' * 1000)
+
+    def test_compression_suffix(self):
+        suffix = eztemplate.compression.compression_suffix
+        self.assertEqual(suffix('output.txt.GZ'), '.gz')
+        self.assertIsNone(suffix('output.txt'))
+
+
+class CountingDirectorySink(eztemplate.sinks.DirectorySink):
+
+    def __init__(self, **kwargs):
+        super(CountingDirectorySink, self).__init__(**kwargs)
+
+        self.written = []
+
+    def write(self, path, content):
+        self.written.append(path)
+        super(CountingDirectorySink, self).write(path, content)
+
+
+class TestProcessCombinations(TempDirTestCase):
+
+    def test_compressed_template_and_output(self):
+        with eztemplate.compression.open_text(self.path('template.gz'),
+                                              'w') as f:
+            f.write('Heute gibt es $essen.\n')
+        engine = engines.engines['string.Template']
+
+        eztemplate.__main__.process_combinations(
+                [(self.path('output.bz2'), self.path('template.gz'),
+                  {'essen': 'Gulasch'})],
+                engine,
+                sink=eztemplate.sinks.DirectorySink(level=9))
+
+        self.assertEqual(
+                eztemplate.sinks.DirectorySink().read(self.path('output.bz2')),
+                'Heute gibt es Gulasch.\n')
+
+    def test_only_if_changed(self):
+        engine = engines.engines['string.Template']
+        sink = CountingDirectorySink()
+        sink.write(self.path('same.gz'), 'Gulasch\n')
+        sink.write(self.path('other.gz'), 'Schnitzel\n')
+        sink.written = []
+        self.write('template', 'Gulasch\n')
+
+        eztemplate.__main__.process_combinations(
+                [
+                    (self.path('same.gz'), self.path('template'), {}),
+                    (self.path('other.gz'), self.path('template'), {}),
+                    (self.path('new.gz'), self.path('template'), {}),
+                ],
+                engine,
+                only_if_changed=True,
+                sink=sink)
+
+        self.assertEqual(sink.written, [self.path('other.gz'),
+                                        self.path('new.gz')])
+        self.assertEqual(sink.read(self.path('other.gz')), 'Gulasch\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+import gzip
+import json
+import os.path
+
+from .context import eztemplate
+from .context import engines
+from .context import TempDirTestCase
+
+
+class TestLazyJSONObject(unittest.TestCase):
+
+    def test_equivalent_to_json(self):
+        document = {
+                'essen': u'Gul\xe4sch "scharf" {}',
+                'beilagen': [u'Kn\xf6del', {'nicht': ']'}, 1.5, None, True],
+                'preis': {'klein': 7, 'gross': {'mit': 12, 'ohne': 10}},
+                'leer': {},
+            }
+        text = json.dumps(document, indent=2)
+
+        lazy = eztemplate.data.LazyJSONObject(text)
+
+        self.assertEqual(sorted(lazy), sorted(document))
+        self.assertEqual(lazy['beilagen'], document['beilagen'])
+        self.assertEqual(lazy['preis']['gross']['mit'], 12)
+        self.assertEqual(dict(lazy['preis']['gross']),
+                         document['preis']['gross'])
+        self.assertEqual(len(lazy['leer']), 0)
+
+    def test_decodes_only_used_members(self):
+        text = '{"gut": [1, 2], "kaputt": [1, 2 3], "auch": {"x": ]}}'
+
+        lazy = eztemplate.data.LazyJSONObject(text)
+
+        self.assertEqual(lazy['gut'], [1, 2])
+        self.assertRaises(ValueError, lambda: lazy['kaputt'])
+
+    def test_malformed(self):
+        for text in ['[]', '{"a" 1}', '{"a": 1', '{"a": "1}']:
+            self.assertRaises(ValueError,
+                              eztemplate.data.LazyJSONObject, text)
+
+
+class TestDataFile(TempDirTestCase):
+
+    def test_formats(self):
+        paths = [
+                self.write('essen.json', '{"essen": {"name": "Gulasch"}}'),
+                self.write('essen.ini', '[essen]\nname = Gulasch\n'),
+            ]
+        if eztemplate.data.yaml is not None:
+            paths.append(self.write('essen.yml', 'essen:\n  name: Gulasch\n'))
+        if eztemplate.data.toml is not None:
+            paths.append(self.write('essen.toml',
+                                    '[essen]\nname = "Gulasch"\n'))
+
+        for path in paths:
+            datafile = eztemplate.data.DataFile(path)
+            self.assertEqual(datafile['essen']['name'], 'Gulasch')
+
+    def test_compressed(self):
+        path = self.path('essen.json.gz')
+        with gzip.open(path, 'wb') as f:
+            f.write(b'{"essen": "Gulasch"}')
+
+        datafile = eztemplate.data.DataFile(path)
+        self.assertEqual(datafile.format, 'JSON')
+        self.assertEqual(datafile['essen'], 'Gulasch')
+
+    def test_lazy_and_parsed_once(self):
+        path = self.write('essen.json', '{"essen": "Gulasch"}')
+
+        datafile = eztemplate.data.DataFile(path)
+        os.remove(path)
+        self.assertRaises(IOError, lambda: datafile['essen'])
+
+        self.write('essen.json', '{"essen": "Gulasch"}')
+        self.assertEqual(datafile['essen'], 'Gulasch')
+
+        os.remove(path)
+        self.assertEqual(datafile['essen'], 'Gulasch')
+
+    def test_unknown_format(self):
+        self.assertRaises(ValueError, eztemplate.data.DataFile, 'essen.txt')
+
+    def test_top_level_must_be_mapping(self):
+        path = self.write('essen.ini', '')
+        self.assertEqual(len(eztemplate.data.DataFile(path)), 0)
+
+        path = self.write('essen.json', '["Gulasch"]')
+        self.assertRaises(ValueError, len, eztemplate.data.DataFile(path))
+
+    def test_canonical_digest_by_content(self):
+        first = self.write('a.json', '{"essen": "Gulasch"}')
+        second = self.write('b.json', '{"essen": "Gulasch"}')
+        third = self.write('c.json', '{"essen": "Schnitzel"}')
+
+        digest = eztemplate.cache.canonical_digest
+        self.assertEqual(digest({'d': eztemplate.data.DataFile(first)}),
+                         digest({'d': eztemplate.data.DataFile(second)}))
+        self.assertNotEqual(digest({'d': eztemplate.data.DataFile(first)}),
+                            digest({'d': eztemplate.data.DataFile(third)}))
+
+
+class TestReadTable(TempDirTestCase):
+
+    def test_columns(self):
+        path = self.write('essen.csv', 'essen,preis\n'
+                                       'Gulasch,7\n'
+                                       '\n'
+                                       '"Knoedel, gross",8.5\n')
+        columns, digest = eztemplate.data.read_table(path)
+
+        self.assertEqual(columns, {'essen': ['Gulasch', 'Knoedel, gross'],
+                                   'preis': ['7', '8.5']})
+        empty = self.write('leer.csv', 'essen,preis\n')
+        self.assertEqual(eztemplate.data.read_table(empty)[0],
+                         {'essen': [], 'preis': []})
+
+        same = self.write('kopie.csv', 'essen,preis\n'
+                                       'Gulasch,7\n'
+                                       '\n'
+                                       '"Knoedel, gross",8.5\n')
+        self.assertEqual(eztemplate.data.read_table(same)[1], digest)
+
+    def test_malformed(self):
+        for content in ['', 'essen,essen\n', 'essen,preis\nGulasch\n']:
+            path = self.write('essen.csv', content)
+            self.assertRaises(ValueError, eztemplate.data.read_table, path)
+
+
+class TestDataArguments(TempDirTestCase):
+
+    def test_shared_between_groups(self):
+        path = self.write('menu.json', '{"essen": "Gulasch", "preis": 7}')
+
+        args = eztemplate.__main__.parse_args([
+                '--data', 'menu=' + path,
+                '-a', 'tag=Mo',
+                '-p', 'preis=menu["preis"] + 1',
+                '-n',
+                '-a', 'tag=Di',
+                'template',
+            ])
+
+        first, second = args.args
+        self.assertIs(first['menu'], second['menu'])
+        self.assertEqual(first['preis'].value(), 8)
+
+        engine = engines.engines['string.Formatter']
+        self.assertEqual(engine(u'{menu[essen]} am {tag}').apply(second),
+                         u'Gulasch am Di')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -98,6 +98,19 @@ class TestEngine(unittest.TestCase):
 
         self.assertRaises(NotImplementedError, engine.apply, {})
 
+    def test_apply_many(self):
+        class TestEngine(engines.Engine):
+            def apply(self, mapping):
+                return '%(essen)s mit %(beilage)s' % mapping
+
+        engine = TestEngine()
+
+        self.assertEqual(engine.apply_many({
+                'essen':   ['Gulasch', 'Schnitzel'],
+                'beilage': ['Nockerl', 'Salat'],
+            }), ['Gulasch mit Nockerl', 'Schnitzel mit Salat'])
+        self.assertEqual(engine.apply_many({'essen': [], 'beilage': []}), [])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -15,6 +15,8 @@ try:
 except ImportError:
     import __builtin__ as builtins
 
+import argparse
+import os.path
 import string
 import sys
 
@@ -24,6 +26,7 @@ except ImportError:
     from io import StringIO
 
 from .context import eztemplate
+from .context import TempDirTestCase
 
 
 class TestArgumentParser(unittest.TestCase):
@@ -31,14 +34,43 @@ class TestArgumentParser(unittest.TestCase):
     def test_empty_arguments(self):
         args = eztemplate.__main__.parse_args([])
         self.assertDictEqual(vars(args), {
+                'archive':      None,
                 'args':         [{}],
+                'bundle':       None,
+                'cache_dir':    None,
+                'cache_link':   False,
+                'cache_max_size': None,
+                'cache_stats':  False,
+                'compress_level': None,
                 'concatenate':  False,
+                'cpu_limit':    None,
+                'data':         None,
+                'dedupe':       None,
                 'delete_empty': False,
                 'engine':       'string.Template',
+                'explain_vars': False,
+                'failure_report': None,
                 'infiles':      [sys.stdin],
+                'jobs':         1,
+                'keep_going':   False,
+                'lock':         False,
+                'matrix':       None,
+                'memory_limit': None,
+                'only_if_changed': False,
                 'outfiles':     [sys.stdout],
+                'output_limit': None,
                 'read_old':     False,
+                'render_cache': 0,
+                'resume':       None,
+                'shard':        None,
+                'shard_by':     'hash',
+                'specialize':   True,
+                'split_marker': None,
+                'sync':         False,
+                'table':        None,
+                'time_limit':   None,
                 'tolerant':     False,
+                'trace':        None,
                 'vary':         False,
             })
 
@@ -49,14 +81,43 @@ class TestArgumentParser(unittest.TestCase):
                 'template1',
             ])
         self.assertDictEqual(vars(args), {
+                'archive':      None,
                 'args':         [{}],
+                'bundle':       None,
+                'cache_dir':    None,
+                'cache_link':   False,
+                'cache_max_size': None,
+                'cache_stats':  False,
+                'compress_level': None,
                 'concatenate':  False,
+                'cpu_limit':    None,
+                'data':         None,
+                'dedupe':       None,
                 'delete_empty': True,
                 'engine':       'string.Template',
+                'explain_vars': False,
+                'failure_report': None,
                 'infiles':      ['template1'],
+                'jobs':         1,
+                'keep_going':   False,
+                'lock':         False,
+                'matrix':       None,
+                'memory_limit': None,
+                'only_if_changed': False,
                 'outfiles':     ['template2'],
+                'output_limit': None,
                 'read_old':     False,
+                'render_cache': 0,
+                'resume':       None,
+                'shard':        None,
+                'shard_by':     'hash',
+                'specialize':   True,
+                'split_marker': None,
+                'sync':         False,
+                'table':        None,
+                'time_limit':   None,
                 'tolerant':     False,
+                'trace':        None,
                 'vary':         False,
             })
 
@@ -72,20 +133,49 @@ class TestArgumentParser(unittest.TestCase):
                 'template2',
             ])
         self.assertDictEqual(vars(args), {
+                'archive':      None,
                 'args':         [{
                                     'beilage': 'Kartoffeln',
                                     'essen':   'Szegediner Gulasch',
                                 }],
+                'bundle':       None,
+                'cache_dir':    None,
+                'cache_link':   False,
+                'cache_max_size': None,
+                'cache_stats':  False,
+                'compress_level': None,
                 'concatenate':  True,
+                'cpu_limit':    None,
+                'data':         None,
+                'dedupe':       None,
                 'delete_empty': False,
                 'engine':       'string.Template',
+                'explain_vars': False,
+                'failure_report': None,
                 'infiles':      [
                                     'template1',
                                     'template2',
                                 ],
+                'jobs':         1,
+                'keep_going':   False,
+                'lock':         False,
+                'matrix':       None,
+                'memory_limit': None,
+                'only_if_changed': False,
                 'outfiles':     [sys.stdout],
+                'output_limit': None,
                 'read_old':     False,
+                'render_cache': 0,
+                'resume':       None,
+                'shard':        None,
+                'shard_by':     'hash',
+                'specialize':   True,
+                'split_marker': None,
+                'sync':         False,
+                'table':        None,
+                'time_limit':   None,
                 'tolerant':     True,
+                'trace':        None,
                 'vary':         False,
             })
 
@@ -99,17 +189,46 @@ class TestArgumentParser(unittest.TestCase):
                 'essen=Szegediner Gulasch',
             ])
         self.assertDictEqual(vars(args), {
+                'archive':      None,
                 'args':         [{
                                     'beilage': 'Kartoffeln',
                                     'essen':   'Szegediner Gulasch',
                                 }],
+                'bundle':       None,
+                'cache_dir':    None,
+                'cache_link':   False,
+                'cache_max_size': None,
+                'cache_stats':  False,
+                'compress_level': None,
                 'concatenate':  False,
+                'cpu_limit':    None,
+                'data':         None,
+                'dedupe':       None,
                 'delete_empty': False,
                 'engine':       'string.Template',
+                'explain_vars': False,
+                'failure_report': None,
                 'infiles':      ['template'],
+                'jobs':         1,
+                'keep_going':   False,
+                'lock':         False,
+                'matrix':       None,
+                'memory_limit': None,
+                'only_if_changed': False,
                 'outfiles':     [sys.stdout],
+                'output_limit': None,
                 'read_old':     False,
+                'render_cache': 0,
+                'resume':       None,
+                'shard':        None,
+                'shard_by':     'hash',
+                'specialize':   True,
+                'split_marker': None,
+                'sync':         False,
+                'table':        None,
+                'time_limit':   None,
                 'tolerant':     False,
+                'trace':        None,
                 'vary':         False,
             })
 
@@ -163,5 +282,305 @@ class TestCheckEngine(unittest.TestCase):
             eztemplate.__main__.check_engine(engine)
 
 
+class TestProcessCombinations(TempDirTestCase):
+
+    def test_collapse_identical_combinations(self):
+        self.write('template', 'Heute gibt es $essen.\n')
+        engine = eztemplate.engines.engines['string.Template']
+
+        eztemplate.__main__.process_combinations(
+                eztemplate.__main__.variable_outfile_iterator(
+                    [self.path('${essen}.txt')],
+                    [self.path('template')],
+                    [
+                        {'essen': 'Gulasch', 'random': '1'},
+                        {'essen': 'Gulasch', 'random': '2'},
+                        {'essen': 'Schnitzel', 'random': '3'},
+                    ],
+                    engine),
+                engine)
+
+        self.assertEqual(self.read('Gulasch.txt'), 'Heute gibt es Gulasch.\n')
+        self.assertEqual(self.read('Schnitzel.txt'),
+                         'Heute gibt es Schnitzel.\n')
+
+    def test_conflicting_combinations(self):
+        self.write('template', 'Heute gibt es $essen mit $beilage.\n')
+        engine = eztemplate.engines.engines['string.Template']
+
+        self.assertRaises(IOError,
+                eztemplate.__main__.process_combinations,
+                eztemplate.__main__.variable_outfile_iterator(
+                    [self.path('${essen}.txt')],
+                    [self.path('template')],
+                    [
+                        {'essen': 'Gulasch', 'beilage': 'Kartoffeln'},
+                        {'essen': 'Gulasch', 'beilage': 'Nudeln'},
+                    ],
+                    engine),
+                engine)
+
+    def test_unused_content_not_read(self):
+        self.write('template', '$essen\n')
+        self.write('output', 'alt\n')
+        engine = eztemplate.engines.engines['string.Template']
+
+        real_open = open
+        opened = []
+
+        def mock_open(name, *args, **kwargs):
+            opened.append(name)
+            return real_open(name, *args, **kwargs)
+
+        with mock.patch.object(builtins, 'open', mock_open):
+            eztemplate.__main__.process_combinations(
+                    [(self.path('output'), self.path('template'),
+                      {'essen': 'Gulasch', 'random': object()})],
+                    engine,
+                    read_old=True)
+
+        # the output is only opened for writing, under a temporary name
+        template, written = opened
+        self.assertEqual(template, self.path('template'))
+        self.assertNotEqual(written, self.path('output'))
+        self.assertEqual(os.path.dirname(written), os.path.dirname(template))
+        self.assertEqual(self.read('output'), 'Gulasch\n')
+
+    def test_explain_vars(self):
+        self.write('template', '$essen mit $beilage in $ez_path\n')
+        engine = eztemplate.engines.engines['string.Template']
+        output = StringIO()
+
+        eztemplate.__main__.explain_vars(
+                [self.path('template')],
+                [{'essen': 'Gulasch', 'random': '1'}],
+                engine,
+                target=output)
+
+        self.assertMultiLineEqual(output.getvalue(),
+                '%s:\n'
+                '  referenced: beilage, essen, ez_path\n'
+                '  group 1: unused: random; missing: beilage\n'
+                % (self.path('template'),))
+
+    def test_specialize_constants(self):
+        self.write('template', '$essen mit $beilage am $tag\n')
+        engine = eztemplate.engines.engines['string.Template']
+        arggroups = [
+                {'essen': 'Gulasch', 'beilage': 'Nockerl', 'tag': 'Mo'},
+                {'essen': 'Gulasch', 'beilage': 'Nockerl', 'tag': 'Di'},
+            ]
+
+        constants = eztemplate.__main__.constant_arguments(arggroups)
+        self.assertEqual(constants, {'essen': 'Gulasch', 'beilage': 'Nockerl'})
+
+        eztemplate.__main__.process_combinations(
+                eztemplate.__main__.variable_outfile_iterator(
+                    [self.path('${tag}.txt')],
+                    [self.path('template')],
+                    arggroups,
+                    engine),
+                engine,
+                constants=constants)
+
+        self.assertEqual(self.read('Mo.txt'), 'Gulasch mit Nockerl am Mo\n')
+        self.assertEqual(self.read('Di.txt'), 'Gulasch mit Nockerl am Di\n')
+
+    def test_constant_arguments_of_matrix(self):
+        arggroups = eztemplate.matrix.Matrix(
+                [{'essen': 'Gulasch', 'ort': 'Wien', 'ez_path': 'x'}],
+                [('ort', ['Graz', 'Linz']), ('tag', ['Mo'])])
+
+        self.assertEqual(eztemplate.__main__.constant_arguments(arggroups),
+                         {'essen': 'Gulasch', 'tag': 'Mo'})
+
+    def run_shard(self, shard, method, groups=20):
+        engine = eztemplate.engines.engines['string.Template']
+        combinations = eztemplate.__main__.variable_outfile_iterator(
+                ['${stem}-${n}.txt'],
+                [self.path('a'), self.path('b')],
+                [{'n': str(n)} for n in range(groups)],
+                engine)
+        if shard is not None:
+            combinations = eztemplate.__main__.shard_iterator(
+                    combinations, *shard, method=method)
+
+        sink = eztemplate.sinks.DictSink()
+        eztemplate.__main__.process_combinations(combinations, engine,
+                                                 sink=sink)
+        return sink.outputs
+
+    def test_shards_cover_unsharded_run(self):
+        self.write('a', '$n in a\n')
+        self.write('b', '$n in b\n')
+        expected = self.run_shard(None, None)
+
+        for method in ('hash', 'round-robin'):
+            union = {}
+            for index in range(1, 4):
+                outputs = self.run_shard((index, 3), method)
+                self.assertFalse(set(union) & set(outputs))
+                union.update(outputs)
+
+            self.assertDictEqual(union, expected)
+
+    def test_unowned_templates_not_read(self):
+        self.write('a', '$n in a\n')
+
+        outputs = self.run_shard((1, 2), 'round-robin', groups=1)
+
+        self.assertDictEqual(outputs, {'a-0.txt': '0 in a\n'})
+
+    def test_parse_shard(self):
+        self.assertEqual(eztemplate.__main__.parse_shard('2/3'), (2, 3))
+        for text in ('0/3', '4/3', '1', 'a/b', '1/0'):
+            self.assertRaises(argparse.ArgumentTypeError,
+                              eztemplate.__main__.parse_shard, text)
+
+    def test_tolerant_specialized_like_unspecialized(self):
+        self.write('template', 'port=$missing$b\n')
+
+        outputs = []
+        for option in ([], ['--no-specialize']):
+            args = eztemplate.__main__.parse_args(option + [
+                    '-t',
+                    '-i', self.path('template'),
+                    '-o', self.path('output'),
+                    '-a', 'b=_X',
+                ])
+            eztemplate.__main__.perform_templating(args)
+            outputs.append(self.read('output'))
+
+        self.assertEqual(outputs, ['port=$missing_X\n'] * 2)
+
+    def test_table_columns_not_specialized(self):
+        self.write('template', '$host:$port;')
+        self.write('table.csv', 'host,port\nh1,1\nh2,2\n')
+
+        for option in ([], ['--no-specialize']):
+            args = eztemplate.__main__.parse_args(option + [
+                    '-i', self.path('template'),
+                    '-o', self.path('output'),
+                    '-a', 'host=X',
+                    '--table', self.path('table.csv'),
+                ])
+            eztemplate.__main__.perform_templating(args)
+
+            self.assertEqual(self.read('output'), 'h1:1;h2:2;')
+
+    def test_split_outputs(self):
+        split_outputs = eztemplate.__main__.split_outputs
+
+        self.assertEqual(split_outputs('Gulasch\n', '##> '),
+                         ('Gulasch\n', []))
+        self.assertEqual(split_outputs('##> a.txt\nGulasch\n'
+                                       'mit ##> Nockerl\n'
+                                       '##> sub/b.txt \n'
+                                       '##> c.txt', '##> '),
+                         ('', [('a.txt', 'Gulasch\nmit ##> Nockerl\n'),
+                               ('sub/b.txt', ''),
+                               ('c.txt', '')]))
+        self.assertRaises(ValueError, split_outputs, 'a\n##> \nb', '##> ')
+
+        for name in ('../escaped.txt', 'sub/../../escaped.txt', '..', '.',
+                     os.path.abspath('abs.txt')):
+            self.assertRaises(ValueError, split_outputs,
+                              'a\n##> %s\nb' % (name,), '##> ')
+
+    def test_split_marker(self):
+        engine = eztemplate.engines.engines['string.Template']
+        sink = eztemplate.sinks.DictSink()
+
+        eztemplate.__main__.process_combinations(
+                eztemplate.__main__.variable_outfile_iterator(
+                    [os.path.join('out', '${host}', 'index')],
+                    [StringIO('##> web.service\n'
+                              'host=$host\n'
+                              '##> db.service\n'
+                              'host=$host for ${ez_stem}\n')],
+                    [{'host': 'a'}, {'host': 'b'}],
+                    engine),
+                engine,
+                delete_empty=True,
+                sink=sink,
+                split_marker='##> ')
+
+        self.assertDictEqual(sink.outputs, {
+                os.path.join('out', 'a', 'web.service'): 'host=a\n',
+                os.path.join('out', 'a', 'db.service'): 'host=a for index\n',
+                os.path.join('out', 'b', 'web.service'): 'host=b\n',
+                os.path.join('out', 'b', 'db.service'): 'host=b for index\n',
+            })
+
+        self.assertRaises(
+                IOError,
+                eztemplate.__main__.process_combinations,
+                [('index', StringIO('##> a\n##> b\n##> a\n'), {})],
+                engine,
+                sink=sink,
+                split_marker='##> ')
+
+    def test_split_marker_in_values(self):
+        engine = eztemplate.engines.engines['string.Template']
+        sink = eztemplate.sinks.DictSink()
+
+        # values can add files, but not outside the output directory
+        eztemplate.__main__.process_combinations(
+                [(os.path.join('out', 'index'), StringIO('$a\n'),
+                  {'a': '##> injected.txt\nGulasch'})],
+                engine,
+                sink=sink,
+                split_marker='##> ')
+
+        self.assertDictEqual(sink.outputs, {
+                os.path.join('out', 'index'): '',
+                os.path.join('out', 'injected.txt'): 'Gulasch\n',
+            })
+
+        self.assertRaises(
+                ValueError,
+                eztemplate.__main__.process_combinations,
+                [(os.path.join('out', 'index'), StringIO('$a\n'),
+                  {'a': '##> ../escaped.txt\nGulasch'})],
+                engine,
+                sink=sink,
+                split_marker='##> ')
+        self.assertNotIn('escaped.txt', sink.outputs)
+
+    def test_dedupe_after_failed_write(self):
+        engine = eztemplate.engines.engines['string.Template']
+        failed = []
+
+        with mock.patch('sys.stderr', StringIO()):
+            eztemplate.__main__.process_combinations(
+                    [(self.path(name), StringIO('Gulasch\n'), {})
+                     for name in (os.path.join('missing', 'a'), 'b', 'c')],
+                    engine,
+                    dedupe='hardlink',
+                    keep_going=True,
+                    failed=failed)
+
+        self.assertEqual([failure['stage'] for failure in failed], ['write'])
+        self.assertEqual(self.read('b'), 'Gulasch\n')
+        self.assertTrue(os.path.samefile(self.path('b'), self.path('c')))
+
+    def test_table(self):
+        engine = eztemplate.engines.engines['string.Template']
+        sink = eztemplate.sinks.DictSink()
+
+        eztemplate.__main__.process_combinations(
+                [('menu', StringIO('$tag: $essen\n'), {'tag': 'Montag'}),
+                 ('leer', StringIO('$tag\n'), {'tag': 'Dienstag'})],
+                engine,
+                sink=sink,
+                table=({'essen': ['Gulasch', 'Schnitzel'],
+                        'tag': ['Montag', 'Dienstag']}, None))
+
+        self.assertDictEqual(sink.outputs, {
+                'menu': 'Montag: Gulasch\nDienstag: Schnitzel\n',
+                'leer': 'Montag\nDienstag\n',
+            })
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+from .context import eztemplate
+
+
+class TestFingerprintSet(unittest.TestCase):
+
+    def test_add(self):
+        keys = eztemplate.fingerprints.FingerprintSet(capacity=4)
+
+        for n in range(1000):
+            self.assertTrue(keys.add(('out%d.txt' % (n,),)))
+
+        self.assertEqual(len(keys), 1000)
+        self.assertFalse(keys.add(('out500.txt',)))
+        self.assertIn(('out999.txt',), keys)
+        self.assertNotIn(('out1000.txt',), keys)
+
+    def test_parts_are_separated(self):
+        fingerprint = eztemplate.fingerprints.fingerprint
+        self.assertNotEqual(fingerprint('ab', 'c'), fingerprint('a', 'bc'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import time
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from .context import eztemplate
+from .context import engines
+
+
+class ScriptedEngine(engines.Engine):
+
+    """Run the template as a function of the mapping."""
+
+    def __init__(self, template, **kwargs):
+        super(ScriptedEngine, self).__init__(**kwargs)
+
+        self.template = template
+
+    def apply(self, mapping):
+        return self.template(mapping)
+
+
+def sleep_forever(mapping):
+    while True:
+        time.sleep(1)
+
+
+def spin_forever(mapping):
+    while True:
+        pass
+
+
+def hog_memory(mapping):
+    return 'x' * (1 << 34)
+
+
+class TestParseSize(unittest.TestCase):
+
+    def test_suffixes(self):
+        parse_size = eztemplate.governor.parse_size
+        self.assertEqual(parse_size('123'), 123)
+        self.assertEqual(parse_size('4k'), 4096)
+        self.assertEqual(parse_size('1.5M'), 3 << 19)
+        self.assertEqual(parse_size('2GB'), 2 << 30)
+
+
+@unittest.skipUnless(eztemplate.governor.is_supported(), "not supported")
+class TestApply(unittest.TestCase):
+
+    def test_result(self):
+        template = ScriptedEngine(lambda mapping: 'Heute gibt es %(essen)s.'
+                                                  % mapping)
+        limits = eztemplate.governor.Limits(time=10, output=100)
+
+        self.assertEqual(eztemplate.governor.apply(template,
+                                                   {'essen': 'Gulasch'},
+                                                   limits),
+                         'Heute gibt es Gulasch.')
+
+    def test_exception(self):
+        template = ScriptedEngine(lambda mapping: mapping['missing'])
+        limits = eztemplate.governor.Limits(time=10)
+
+        self.assertRaises(KeyError, eztemplate.governor.apply,
+                          template, {}, limits)
+
+    def assertExceeds(self, limit, template, limits):
+        try:
+            eztemplate.governor.apply(template, {}, limits)
+        except eztemplate.governor.LimitExceeded as e:
+            self.assertEqual(e.limit, limit)
+        else:
+            self.fail("didn't exceed %s limit" % (limit,))
+
+    def test_time_limit(self):
+        self.assertExceeds('time', ScriptedEngine(sleep_forever),
+                           eztemplate.governor.Limits(time=0.2))
+
+    def test_cpu_limit(self):
+        self.assertExceeds('cpu', ScriptedEngine(spin_forever),
+                           eztemplate.governor.Limits(cpu=1))
+
+    def test_memory_limit(self):
+        self.assertExceeds('memory', ScriptedEngine(hog_memory),
+                           eztemplate.governor.Limits(memory=1 << 30))
+
+    def test_output_limit(self):
+        self.assertExceeds('output',
+                           ScriptedEngine(lambda mapping: 'x' * 101),
+                           eztemplate.governor.Limits(output=100))
+
+
+@unittest.skipUnless(eztemplate.governor.is_supported(), "not supported")
+class TestProcessCombinations(unittest.TestCase):
+
+    def test_batch_continues(self):
+        sink = eztemplate.sinks.DictSink()
+        templates = {
+                'good': ScriptedEngine(lambda mapping: 'gut\n'),
+                'bad':  ScriptedEngine(sleep_forever),
+            }
+
+        mock_stderr = StringIO()
+        with mock.patch('sys.stderr', mock_stderr):
+            failures = eztemplate.__main__.process_combinations(
+                    [
+                        ('a.txt', StringIO('bad'), {}),
+                        ('b.txt', StringIO('good'), {}),
+                    ],
+                    lambda template, **kwargs: templates[template],
+                    sink=sink,
+                    limits=eztemplate.governor.Limits(time=0.2))
+
+        self.assertEqual(failures, 1)
+        self.assertDictEqual(sink.outputs, {'b.txt': 'gut\n'})
+        self.assertIn("a.txt: exceeded time limit", mock_stderr.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
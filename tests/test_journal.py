@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from .context import eztemplate
+from .context import engines
+from .context import TempDirTestCase
+
+
+class TestJournal(TempDirTestCase):
+
+    def test_persistence(self):
+        key = eztemplate.journal.combination_key
+
+        with eztemplate.journal.Journal(self.path('journal')) as journal:
+            journal.add(key('a.txt', 'template', 'abc', b'\x01'))
+            journal.add(key('a.txt', 'template', 'abc', b'\x01'))
+
+        with eztemplate.journal.Journal(self.path('journal')) as journal:
+            self.assertEqual(len(journal), 1)
+            self.assertIn(key('a.txt', 'template', 'abc', b'\x01'), journal)
+            self.assertNotIn(key('a.txt', 'template', 'abc', b'\x02'),
+                             journal)
+            self.assertNotIn(key('a.txt', 'template', 'abd', b'\x01'),
+                             journal)
+
+
+class TestKeepGoing(TempDirTestCase):
+
+    def run_templating(self, arggroups, journal=None, jobs=1):
+        engine = engines.engines['string.Template']
+        template = self.write('template', '$essen mit $beilage\n')
+
+        sink = eztemplate.sinks.DictSink()
+        failed = []
+        with mock.patch('sys.stderr', StringIO()):
+            failures = eztemplate.__main__.process_combinations(
+                    eztemplate.__main__.variable_outfile_iterator(
+                        ['${essen}.txt'], [template], arggroups, engine),
+                    engine,
+                    sink=sink,
+                    keep_going=True,
+                    failed=failed,
+                    journal=journal,
+                    jobs=jobs)
+
+        self.assertEqual(failures, len(failed))
+        return sink.outputs, failed
+
+    def test_report_failures(self):
+        for jobs in (1, 2):
+            outputs, failed = self.run_templating([
+                    {'essen': 'Gulasch', 'beilage': 'Nockerl'},
+                    {'essen': 'Schnitzel'},
+                    {'essen': 'Gulasch', 'beilage': 'Salat'},
+                    {'essen': 'Gurken', 'beilage': 'Brot'},
+                ], jobs=jobs)
+
+            self.assertDictEqual(outputs, {
+                    'Gulasch.txt': 'Gulasch mit Nockerl\n',
+                    'Gurken.txt':  'Gurken mit Brot\n',
+                })
+            self.assertEqual([(failure['outfile'], failure['stage'],
+                               failure['type'])
+                              for failure in failed],
+                             [('Schnitzel.txt', 'render', 'KeyError'),
+                              ('Gulasch.txt', 'write', 'IOError'
+                               if str is bytes else 'OSError')])
+
+    def test_outfile_failure(self):
+        arggroups = [
+                {'beilage': 'Nockerl'},
+                {'essen': 'Gulasch', 'beilage': 'Salat'},
+            ]
+
+        for jobs in (1, 2):
+            outputs, failed = self.run_templating(arggroups, jobs=jobs)
+
+            self.assertDictEqual(outputs, {
+                    'Gulasch.txt': 'Gulasch mit Salat\n',
+                })
+            self.assertEqual([(failure['outfile'], failure['stage'],
+                               failure['type'])
+                              for failure in failed],
+                             [('${essen}.txt', 'outfile', 'KeyError')])
+
+        engine = engines.engines['string.Template']
+        self.assertRaises(KeyError, eztemplate.__main__.process_combinations,
+                          eztemplate.__main__.variable_outfile_iterator(
+                              ['${essen}.txt'], [StringIO('')], arggroups,
+                              engine),
+                          engine,
+                          sink=eztemplate.sinks.DictSink())
+
+    def test_resume(self):
+        arggroups = [
+                {'essen': 'Gulasch', 'beilage': 'Nockerl'},
+                {'essen': 'Schnitzel'},
+            ]
+
+        with eztemplate.journal.Journal(self.path('journal')) as journal:
+            outputs, failed = self.run_templating(arggroups, journal)
+        self.assertEqual(sorted(outputs), ['Gulasch.txt'])
+        self.assertEqual(len(failed), 1)
+
+        arggroups[1]['beilage'] = 'Salat'
+        with eztemplate.journal.Journal(self.path('journal')) as journal:
+            outputs, failed = self.run_templating(arggroups, journal)
+            self.assertEqual(journal.skipped, 1)
+        self.assertDictEqual(outputs, {
+                'Schnitzel.txt': 'Schnitzel mit Salat\n',
+            })
+        self.assertEqual(failed, [])
+
+        arggroups[0]['beilage'] = 'Knoedel'
+        with eztemplate.journal.Journal(self.path('journal')) as journal:
+            outputs, failed = self.run_templating(arggroups, journal)
+        self.assertDictEqual(outputs, {
+                'Gulasch.txt': 'Gulasch mit Knoedel\n',
+            })
+
+    def test_resume_without_digest(self):
+        engine = engines.engines['tokens']
+        template = self.write('template', 'v=@V@\n')
+
+        for value in ('1', '2'):
+            sink = eztemplate.sinks.DictSink()
+            with eztemplate.journal.Journal(self.path('journal')) as journal:
+                eztemplate.__main__.process_combinations(
+                        [('output', template, {'@V@': value})],
+                        engine,
+                        sink=sink,
+                        journal=journal)
+                self.assertEqual(journal.skipped, 0)
+
+            self.assertDictEqual(sink.outputs, {'output': 'v=%s\n' % (value,)})
+
+
+if __name__ == '__main__':
+    unittest.main()
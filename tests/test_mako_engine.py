@@ -125,6 +125,26 @@ class TestTemplating(unittest.TestCase):
                 '<UNDEFINED>.\n'
             )
 
+    def test_referenced_names(self):
+        engine = engines.engines[HANDLE]
+
+        template = engine(
+                '% for gang in gaenge:\n'
+                '${gang} mit ${beilage}\n'
+                '% endfor\n',
+            )
+
+        names = template.referenced_names()
+        self.assertLessEqual(set(['gaenge', 'beilage']), names)
+        self.assertNotIn('random', names)
+
+    def test_referenced_names_unknown_with_context(self):
+        engine = engines.engines[HANDLE]
+
+        template = engine("${context.get('essen')}\n")
+
+        self.assertIsNone(template.referenced_names())
+
 
 if __name__ == '__main__':
     unittest.main()
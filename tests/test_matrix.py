@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+from .context import eztemplate
+from .context import engines
+from .context import TempDirTestCase
+
+
+class TestMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.matrix = eztemplate.matrix.Matrix(
+                [{'essen': 'Gulasch'}, {'essen': 'Schnitzel', 'ort': 'Wien'}],
+                [('ort', ['Graz', 'Linz']), ('tag', ['Mo', 'Di', 'Mi'])],
+            )
+
+    def test_iteration(self):
+        combinations = list(self.matrix)
+
+        self.assertEqual(len(self.matrix), 12)
+        self.assertEqual(len(combinations), 12)
+        self.assertEqual(combinations[0],
+                         {'essen': 'Gulasch', 'ort': 'Graz', 'tag': 'Mo'})
+        self.assertEqual(combinations[1],
+                         {'essen': 'Gulasch', 'ort': 'Graz', 'tag': 'Di'})
+        self.assertEqual(combinations[-1],
+                         {'essen': 'Schnitzel', 'ort': 'Linz', 'tag': 'Mi'})
+        self.assertEqual(list(self.matrix), combinations)
+
+    def test_indexing(self):
+        combinations = list(self.matrix)
+
+        for index in range(-12, 12):
+            self.assertEqual(self.matrix[index], combinations[index])
+
+        self.assertRaises(IndexError, lambda: self.matrix[12])
+
+    def test_parse_axis(self):
+        self.assertEqual(eztemplate.matrix.parse_axis('ort=Graz,Linz'),
+                         ('ort', ['Graz', 'Linz']))
+        self.assertRaises(ValueError, eztemplate.matrix.parse_axis, 'Graz')
+
+
+class TestMatrixArguments(TempDirTestCase):
+
+    def test_vary_over_matrix(self):
+        path = self.write('tage', "Mo\nDi\n\n")
+
+        args = eztemplate.__main__.parse_args([
+                '--vary', '-o', '${ort}-${tag}.txt',
+                '--matrix', 'ort=Graz,Linz',
+                '--matrix-file', 'tag=' + path,
+                'template',
+                'essen=Gulasch',
+            ])
+
+        self.assertEqual(args.matrix,
+                         [('ort', ['Graz', 'Linz']), ('tag', ['Mo', 'Di'])])
+
+        engine = engines.engines['string.Template']
+        outfiles = [outfile for outfile, __, __ in
+                    eztemplate.__main__.variable_outfile_iterator(
+                        args.outfiles, args.infiles, args.args, engine)]
+        self.assertEqual(outfiles, ['Graz-Mo.txt', 'Graz-Di.txt',
+                                    'Linz-Mo.txt', 'Linz-Di.txt'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from .context import eztemplate
+from .context import engines
+
+
+class TestExpression(unittest.TestCase):
+
+    def test_evaluated_once_when_needed(self):
+        calls = []
+
+        def expensive(value):
+            calls.append(value)
+            return value * 2
+
+        compiler = eztemplate.pyargs.ExpressionCompiler()
+        expression = compiler.expression('expensive(21)',
+                                         {'expensive': expensive})
+
+        self.assertFalse(expression.is_evaluated())
+        self.assertEqual(calls, [])
+        self.assertEqual(expression.value(), 42)
+        self.assertEqual(expression.value(), 42)
+        self.assertEqual(calls, [21])
+
+    def test_sees_earlier_expressions(self):
+        compiler = eztemplate.pyargs.ExpressionCompiler()
+        mapping = {'a': '1'}
+        mapping['b'] = compiler.expression('int(a) + 1', mapping)
+        mapping['c'] = compiler.expression('[b * n for n in range(3)]',
+                                           mapping)
+        mapping['a'] = '5'
+
+        self.assertEqual(eztemplate.pyargs.resolve_mapping(mapping),
+                         {'a': '5', 'b': 2, 'c': [0, 2, 4]})
+
+    def test_code_names(self):
+        code = compile('os.path.join(a, *[b for __ in c])', '<test>', 'eval')
+
+        self.assertTrue(set(['os', 'a', 'b', 'c']) <=
+                        eztemplate.pyargs.code_names(code))
+
+
+class TestPyArgs(unittest.TestCase):
+
+    def test_shared_between_groups(self):
+        args = eztemplate.__main__.parse_args([
+                '-a', 'x=1', '-p', 'total=sum(range(10))',
+                '-p', 'y=int(x) + 1',
+                '-n',
+                '-a', 'x=1', '-p', 'total=sum(range(10))',
+                '-p', 'y=int(x) + 1',
+                '-n',
+                '-a', 'x=2', '-p', 'total=sum(range(10))',
+                '-p', 'y=int(x) + 1',
+                'template',
+            ])
+
+        first, second, third = args.args
+        self.assertIs(first['total'], second['total'])
+        self.assertIs(first['total'], third['total'])
+        self.assertIs(first['y'], second['y'])
+        self.assertIsNot(first['y'], third['y'])
+        self.assertEqual([group['y'].value() for group in args.args],
+                         [2, 2, 3])
+
+    def test_only_referenced_expressions_evaluated(self):
+        args = eztemplate.__main__.parse_args([
+                '-a', 'essen=Gulasch',
+                '-p', 'preis=7 * 1.5',
+                '-p', 'kaputt=1 / 0',
+                'template',
+            ])
+
+        template = engines.engines['string.Template']('$essen fuer $preis')
+        mapping = eztemplate.__main__.restrict_mapping(
+                args.args[0], template.referenced_names())
+
+        self.assertEqual(template.apply(mapping), 'Gulasch fuer 10.5')
+        self.assertFalse(args.args[0]['kaputt'].is_evaluated())
+
+    def test_syntax_error(self):
+        with mock.patch('sys.stderr', StringIO()):
+            self.assertRaises(SystemExit, eztemplate.__main__.parse_args,
+                              ['-p', 'x=1 +', 'template'])
+
+
+if __name__ == '__main__':
+    unittest.main()
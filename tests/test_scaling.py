@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+import os
+import os.path
+import sys
+import time
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from .context import eztemplate
+from .context import TempDirTestCase
+
+
+class CountingSink(eztemplate.sinks.Sink):
+
+    def __init__(self):
+        self.written = 0
+
+    def write(self, path, content):
+        self.written += 1
+
+    def remove(self, path):
+        pass
+
+
+def peak_rss():
+    """Return peak resident set size in bytes."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+@unittest.skipUnless(os.environ.get('EZTEMPLATE_LARGE_TESTS'),
+                     "set EZTEMPLATE_LARGE_TESTS to run large scale tests")
+@unittest.skipIf(resource is None, "cannot measure memory usage")
+class TestScaling(TempDirTestCase):
+
+    AXIS_LENGTH = 1000
+    MAX_RSS_GROWTH = 96 << 20
+    MIN_RENDERS_PER_SECOND = 5000
+
+    def test_million_outputs(self):
+        template = self.write('template',
+                              'host=$host rack=$rack env=$env\n')
+
+        values = ','.join(str(n) for n in range(self.AXIS_LENGTH))
+        sink = CountingSink()
+
+        rss_before = peak_rss()
+        start = time.time()
+
+        args = eztemplate.__main__.parse_args([
+                '-i', template,
+                '-o', os.path.join(self.tmpdir, '${rack}', '${host}.conf'),
+                '--vary',
+                '-a', 'env=prod',
+                '--matrix', 'rack=' + values,
+                '--matrix', 'host=' + values,
+            ])
+        with mock.patch.object(eztemplate.__main__, 'DirectorySink',
+                               lambda **kwargs: sink):
+            eztemplate.__main__.perform_templating(args)
+
+        duration = time.time() - start
+        rss_growth = peak_rss() - rss_before
+
+        self.assertEqual(sink.written, self.AXIS_LENGTH ** 2)
+        self.assertLess(rss_growth, self.MAX_RSS_GROWTH)
+        self.assertGreater(sink.written / duration,
+                           self.MIN_RENDERS_PER_SECOND)
+
+
+if __name__ == '__main__':
+    unittest.main()
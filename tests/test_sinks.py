@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+import os.path
+import tarfile
+import zipfile
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from .context import eztemplate
+from .context import TempDirTestCase
+
+
+class TestSinks(TempDirTestCase):
+
+    def test_member_name(self):
+        member_name = eztemplate.sinks.member_name
+        self.assertEqual(member_name('/etc/foo/../bar.conf'), 'etc/bar.conf')
+        self.assertEqual(member_name('./out/a.txt'), 'out/a.txt')
+
+    def test_directory_sink(self):
+        sink = eztemplate.sinks.DirectorySink()
+        path = self.path('output')
+
+        self.assertIsNone(sink.read(path))
+        sink.write(path, 'Gulasch\n')
+        self.assertEqual(sink.read(path), 'Gulasch\n')
+        sink.remove(path)
+        sink.remove(path)
+        self.assertFalse(os.path.exists(path))
+
+    def test_directory_sink_atomic(self):
+        sink = eztemplate.sinks.DirectorySink()
+        path = self.path('output')
+        sink.write(path, 'alt\n')
+        os.chmod(path, 0o640)
+        os.link(path, self.path('hardlink'))
+        os.symlink(path, self.path('symlink'))
+        old = os.stat(path)
+
+        sink.write(self.path('symlink'), 'Gulasch\n')
+        self.assertTrue(os.path.islink(self.path('symlink')))
+        self.assertEqual(sink.read(path), 'Gulasch\n')
+        self.assertEqual(sink.read(self.path('hardlink')), 'alt\n')
+        self.assertNotEqual(os.stat(path).st_ino, old.st_ino)
+        self.assertEqual(os.stat(path).st_mode, old.st_mode)
+
+        try:
+            with sink.open(path) as f:
+                f.write(u'Schnitzel\n')
+                self.assertEqual(sink.read(path), 'Gulasch\n')
+                raise ValueError("nope")
+        except ValueError:
+            pass
+
+        self.assertEqual(sink.read(path), 'Gulasch\n')
+        self.assertEqual(sorted(os.listdir(self.tmpdir)),
+                         ['hardlink', 'output', 'symlink'])
+
+    def test_directory_sink_missing_directory(self):
+        sink = eztemplate.sinks.DirectorySink()
+        path = self.path(os.path.join('missing', 'a.txt'))
+
+        with self.assertRaises(IOError) as raised:
+            sink.write(path, 'Gulasch\n')
+        self.assertEqual(raised.exception.filename, path)
+
+    def test_directory_sink_in_place(self):
+        sink = eztemplate.sinks.DirectorySink()
+
+        with mock.patch.object(eztemplate.sinks, '_replace') as replace:
+            sink.write(os.devnull, 'Gulasch\n')
+            sink = eztemplate.sinks.DirectorySink(atomic=False)
+            sink.write(self.path('output'), 'Gulasch\n')
+
+        self.assertFalse(replace.called)
+        self.assertEqual(os.listdir(self.tmpdir), ['output'])
+
+    @unittest.skipIf(eztemplate.sinks.fcntl is None, "fcntl not available")
+    def test_directory_sink_lock(self):
+        fcntl = eztemplate.sinks.fcntl
+        sink = eztemplate.sinks.DirectorySink(lock=True)
+        path = self.path('output')
+
+        with sink.open(path) as f:
+            with open(path + '.lock') as lock:
+                self.assertRaises(IOError, fcntl.flock, lock.fileno(),
+                                  fcntl.LOCK_EX | fcntl.LOCK_NB)
+            f.write(u'Gulasch\n')
+
+        with open(path + '.lock') as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.assertEqual(sink.read(path), 'Gulasch\n')
+
+    def test_directory_sink_sync(self):
+        flushed = []
+        synced = []
+        committed = []
+
+        with mock.patch.object(eztemplate.sinks, 'SYNC_BATCH', 2), \
+                mock.patch.object(eztemplate.sinks, '_flush',
+                                  lambda paths: flushed.append(len(paths))), \
+                mock.patch.object(eztemplate.sinks, '_fsync',
+                                  lambda path, *args: synced.append(path)):
+            with eztemplate.sinks.DirectorySink(sync=True) as sink:
+                sink.write(self.path('a'), 'Gulasch\n')
+                sink.after_commit(lambda: committed.append('a'))
+                self.assertFalse(os.path.exists(self.path('a')))
+                self.assertEqual(sink.read(self.path('a')), 'Gulasch\n')
+                self.assertEqual(committed, [])
+
+                self.assertTrue(sink.link(self.path('b'), self.path('a')))
+                self.assertEqual(flushed, [2])
+                self.assertEqual(committed, ['a'])
+                self.assertTrue(os.path.samefile(self.path('a'),
+                                                 self.path('b')))
+
+                sink.write(self.path('c'), 'alt\n')
+                sink.write(self.path('c'), 'Schnitzel\n')
+                sink.after_commit(lambda: committed.append('c'))
+                self.assertEqual(flushed, [2])
+
+        self.assertEqual(flushed, [2, 1])
+        self.assertEqual(committed, ['a', 'c'])
+        self.assertEqual(synced, [os.path.realpath(self.tmpdir)]
+                         if eztemplate.sinks._O_DIRECTORY is not None
+                         else [])
+        self.assertEqual(sink.read(self.path('c')), 'Schnitzel\n')
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['a', 'b', 'c'])
+
+    def test_flush(self):
+        paths = [self.path('a'), self.path('b'), self.path('missing')]
+        for path in paths[:2]:
+            with open(path, 'w') as f:
+                f.write('Gulasch\n')
+
+        with mock.patch('os.fsync') as fsync:
+            eztemplate.sinks._flush(paths)
+
+        self.assertEqual(fsync.call_count, 2)
+
+    def test_dict_sink(self):
+        with eztemplate.sinks.DictSink() as sink:
+            sink.write('a.txt', 'Gulasch\n')
+            sink.write('b.txt', 'Schnitzel\n')
+            sink.remove('b.txt')
+
+        self.assertDictEqual(sink.outputs, {'a.txt': 'Gulasch\n'})
+
+    def test_tar_sink(self):
+        for suffix, mode in (('.tar', 'r:'), ('.tar.gz', 'r:gz')):
+            path = self.path('outputs' + suffix)
+            with eztemplate.sinks.open_sink(path) as sink:
+                sink.write('out/a.txt', u'Gul\xe4sch\n')
+                sink.write('out/b.txt', '')
+
+            with tarfile.open(path, mode) as archive:
+                self.assertEqual(archive.getnames(),
+                                 ['out/a.txt', 'out/b.txt'])
+                self.assertEqual(archive.extractfile('out/a.txt').read(),
+                                 u'Gul\xe4sch\n'.encode('utf-8'))
+
+    def test_zip_sink(self):
+        path = self.path('outputs.zip')
+        with eztemplate.sinks.open_sink(path) as sink:
+            sink.write('out/a.txt', 'Gulasch\n')
+
+        with zipfile.ZipFile(path) as archive:
+            self.assertEqual(archive.namelist(), ['out/a.txt'])
+            self.assertEqual(archive.read('out/a.txt'), b'Gulasch\n')
+
+    def test_unknown_archive_type(self):
+        self.assertFalse(eztemplate.sinks.is_archive_path('outputs.rar'))
+        self.assertRaises(ValueError, eztemplate.sinks.open_sink,
+                          self.path('outputs.rar'))
+
+    def test_directory_sink_link(self):
+        sink = eztemplate.sinks.DirectorySink()
+        source = self.path('source')
+        sink.write(source, 'Gulasch\n')
+
+        for method in ('hardlink', 'reflink', 'copy'):
+            path = self.path(method)
+            sink.write(path, 'alt\n')
+
+            self.assertTrue(sink.link(path, source, method=method))
+            self.assertEqual(sink.read(path), 'Gulasch\n')
+            self.assertEqual(os.path.samefile(path, source),
+                             method == 'hardlink')
+
+        self.assertFalse(sink.link(self.path('output.gz'), source))
+        self.assertFalse(sink.link(self.path('output'),
+                                   self.path('missing'), method='copy'))
+        self.assertFalse(os.path.exists(self.path('output')))
+
+    def test_tar_sink_link(self):
+        path = self.path('outputs.tar')
+
+        with eztemplate.sinks.open_sink(path) as sink:
+            sink.write('out/a.txt', 'Gulasch\n')
+            self.assertTrue(sink.link('out/b.txt', 'out/a.txt'))
+            self.assertFalse(sink.link('out/c.txt', 'out/a.txt',
+                                       method='copy'))
+            self.assertFalse(sink.link('out/d.txt', '/var/cache/entry'))
+
+        with tarfile.open(path) as archive:
+            self.assertEqual(archive.getnames(), ['out/a.txt', 'out/b.txt'])
+            self.assertTrue(archive.getmember('out/b.txt').islnk())
+            self.assertEqual(archive.extractfile('out/b.txt').read(),
+                             b'Gulasch\n')
+
+    def test_open(self):
+        sinks = [
+                (eztemplate.sinks.DirectorySink(), self.path('a.txt')),
+                (eztemplate.sinks.DirectorySink(), self.path('a.txt.gz')),
+                (eztemplate.sinks.DictSink(), 'a.txt'),
+                (eztemplate.sinks.open_sink(self.path('outputs.tar')),
+                 'a.txt'),
+            ]
+
+        for sink, path in sinks:
+            with sink:
+                with sink.open(path) as f:
+                    f.write(u'Gul\xe4sch\n')
+                    f.write(u'mit Nockerl\n')
+
+                try:
+                    with sink.open(path + '.failed') as f:
+                        f.write(u'Gul')
+                        raise ValueError("nope")
+                except ValueError:
+                    pass
+
+                self.assertIsNone(sink.read(path + '.failed'))
+                if not isinstance(sink, eztemplate.sinks.TarSink):
+                    self.assertEqual(sink.read(path),
+                                     u'Gul\xe4sch\nmit Nockerl\n')
+
+        with tarfile.open(self.path('outputs.tar')) as archive:
+            self.assertEqual(archive.getnames(), ['a.txt'])
+            self.assertEqual(archive.extractfile('a.txt').read(),
+                             u'Gul\xe4sch\nmit Nockerl\n'.encode('utf-8'))
+
+    def test_file_content(self):
+        path = self.path('output')
+        with open(path, 'wb') as f:
+            f.write(u'Gul\xe4sch\r\nmit Nockerl\n'.encode('utf-8'))
+
+        for threshold in (1 << 20, 1):
+            with mock.patch.object(eztemplate.sinks, 'MMAP_THRESHOLD',
+                                   threshold):
+                content = eztemplate.sinks.DirectorySink().read_lazily(path)
+
+                self.assertFalse(content.is_loaded())
+                self.assertTrue(content == u'Gul\xe4sch\r\nmit Nockerl\n')
+                self.assertFalse(content == u'Gul\xe4sch\nmit Nockerl\n')
+                self.assertFalse(content.is_loaded())
+
+                self.assertEqual(str(content).splitlines(),
+                                 [u'Gul\xe4sch', u'mit Nockerl'])
+                self.assertTrue(content.startswith(u'Gul'))
+                self.assertTrue(content.is_loaded())
+                content.close()
+
+    def test_file_content_missing(self):
+        sink = eztemplate.sinks.DirectorySink()
+        self.assertIsNone(sink.read_lazily(self.path('output')))
+
+
+class TestProcessCombinations(TempDirTestCase):
+
+    def test_dict_sink(self):
+        engine = eztemplate.engines.engines['string.Template']
+        sink = eztemplate.sinks.DictSink({'alt.txt': 'alt'})
+
+        eztemplate.__main__.process_combinations(
+                eztemplate.__main__.variable_outfile_iterator(
+                    ['${essen}.txt'],
+                    [StringIO('$essen mit $ez_content\n')],
+                    [{'essen': 'Gulasch'}, {'essen': 'alt'}],
+                    engine),
+                engine,
+                tolerant=True,
+                read_old=True,
+                sink=sink)
+
+        self.assertDictEqual(sink.outputs, {
+                'Gulasch.txt': 'Gulasch mit \n',
+                'alt.txt':     'alt mit alt\n',
+            })
+
+    def test_dedupe(self):
+        engine = eztemplate.engines.engines['string.Template']
+
+        eztemplate.__main__.process_combinations(
+                eztemplate.__main__.variable_outfile_iterator(
+                    [self.path('${host}.conf')],
+                    [StringIO('role=$role\n')],
+                    [{'host': 'a', 'role': 'web'},
+                     {'host': 'b', 'role': 'db'},
+                     {'host': 'c', 'role': 'web'}],
+                    engine),
+                engine,
+                dedupe='hardlink')
+
+        path = self.path('%s.conf')
+        self.assertTrue(os.path.samefile(path % 'a', path % 'c'))
+        self.assertFalse(os.path.samefile(path % 'a', path % 'b'))
+        self.assertEqual(self.read('c.conf'), 'role=web\n')
+
+    def test_read_old_only_once(self):
+        path = self.write('output', 'Gulasch mit Gulasch\n')
+
+        engine = eztemplate.engines.engines['string.Template']
+        sink = eztemplate.sinks.DirectorySink()
+
+        with mock.patch.object(eztemplate.sinks.FileContent, 'data',
+                               autospec=True,
+                               side_effect=lambda self: open(
+                                   self.path, 'rb').read()) as data:
+            eztemplate.__main__.process_combinations(
+                    [(path, StringIO('$essen mit $ez_content'),
+                      {'essen': 'Gulasch'})],
+                    engine,
+                    read_old=True,
+                    only_if_changed=True,
+                    sink=sink)
+
+        self.assertEqual(data.call_count, 1)
+        self.assertEqual(self.read('output'),
+                         'Gulasch mit Gulasch mit Gulasch\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
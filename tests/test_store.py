@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+import os
+import os.path
+
+from .context import eztemplate
+from .context import engines
+from .context import TempDirTestCase
+
+
+class StoreTestCase(TempDirTestCase):
+
+    def setUp(self):
+        super(StoreTestCase, self).setUp()
+        self.cachedir = self.path('cache')
+        self.outdir = self.path('output')
+        os.mkdir(self.outdir)
+
+        self.engine = engines.engines['string.Template']
+
+    def template(self, text):
+        template = self.engine(text)
+        template.source_digest = text
+        return template
+
+
+class TestRenderStore(StoreTestCase):
+
+    def test_key_ignores_unreferenced_names(self):
+        store = eztemplate.store.RenderStore(self.cachedir)
+        template = self.template(u"$dish")
+
+        self.assertEqual(store.key(template, {'dish': 'Gulasch', 'x': 1}),
+                         store.key(template, {'dish': 'Gulasch', 'x': 2}))
+        self.assertNotEqual(store.key(template, {'dish': 'Gulasch'}),
+                            store.key(template, {'dish': 'Gurken'}))
+        self.assertNotEqual(store.key(template, {'dish': 'Gulasch'}),
+                            store.key(template, {'dish': 'Gulasch'},
+                                      tolerant=True))
+
+    def test_key_requires_source_digest(self):
+        store = eztemplate.store.RenderStore(self.cachedir)
+        template = self.engine(u"$dish")
+
+        self.assertIsNone(store.key(template, {'dish': 'Gulasch'}))
+
+    def test_get_put(self):
+        store = eztemplate.store.RenderStore(self.cachedir)
+        key = store.key(self.template(u"$dish"), {'dish': 'Gulasch'})
+
+        self.assertIsNone(store.get(key))
+        store.put(key, u'Gul\xe4sch')
+        self.assertEqual(store.get(key), u'Gul\xe4sch')
+        self.assertEqual(
+                sorted(os.listdir(os.path.dirname(store.path(key)))),
+                [key[2:], key[2:] + '.used'])
+
+    def test_evict_least_recently_used(self):
+        store = eztemplate.store.RenderStore(self.cachedir, max_size=10)
+
+        for index, dish in enumerate(['Gulasch', 'Gurken', 'Kraut']):
+            store.put(dish * 4, dish)
+            os.utime(store.path(dish * 4), (index, index))
+
+        store.evict()
+
+        self.assertEqual(store.evictions, 2)
+        self.assertIsNone(store.get('Gulasch' * 4))
+        self.assertIsNone(store.get('Gurken' * 4))
+        self.assertEqual(store.get('Kraut' * 4), 'Kraut')
+
+    def test_evict_recently_used(self):
+        store = eztemplate.store.RenderStore(self.cachedir, max_size=10)
+
+        for index, dish in enumerate(['Gulasch', 'Gurken']):
+            store.put(dish * 4, dish)
+            os.utime(store.path(dish * 4), (index, index))
+        store.get('Gulasch' * 4)
+
+        store.evict()
+
+        self.assertEqual(store.evictions, 1)
+        self.assertIsNone(store.get('Gurken' * 4))
+        self.assertEqual(store.get('Gulasch' * 4), 'Gulasch')
+
+
+class TestSharedRendering(StoreTestCase):
+
+    def run_templating(self, link=False):
+        template = self.write('template', "$dish\n")
+
+        outfile = os.path.join(self.outdir, 'output')
+
+        store = eztemplate.store.RenderStore(self.cachedir, link=link)
+        combinations = [(outfile, template, {'dish': 'Gulasch'})]
+        failures = eztemplate.__main__.process_combinations(
+                combinations, self.engine, renderstore=store)
+
+        self.assertEqual(failures, 0)
+        with open(outfile) as f:
+            self.assertEqual(f.read(), "Gulasch\n")
+
+        return store
+
+    def test_second_run_hits(self):
+        first = self.run_templating()
+        second = self.run_templating()
+
+        self.assertEqual((first.hits, first.misses), (0, 1))
+        self.assertEqual((second.hits, second.misses), (1, 0))
+
+    def test_link_and_overwrite(self):
+        self.run_templating()
+        store = self.run_templating(link=True)
+
+        output = os.path.join(self.outdir, 'output')
+        (__, __, path), = store.entries()
+        self.assertEqual(os.stat(output).st_ino, os.stat(path).st_ino)
+
+        os.utime(output, (0, 0))
+        store.get(os.path.basename(os.path.dirname(path)) +
+                  os.path.basename(path))
+        self.assertEqual(os.stat(output).st_mtime, 0)
+
+        sink = eztemplate.sinks.DirectorySink()
+        sink.write(output, "Gurken\n")
+
+        with open(path) as f:
+            self.assertEqual(f.read(), "Gulasch\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -133,6 +133,72 @@ class TestStringFormatter(unittest.TestCase):
                 '{beilage}.\n'
             )
 
+    def test_referenced_names(self):
+        engine = engines.engines[HANDLE]
+
+        template = engine(
+                'Heute gibt es\n'
+                '{essen.name} mit\n'
+                '{beilage[0]:>{breite}} fuer {{preis}}.\n',
+            )
+
+        self.assertEqual(template.referenced_names(),
+                         frozenset(['essen', 'beilage', 'breite']))
+
+    def test_specialize(self):
+        engine = engines.engines[HANDLE]
+
+        template = engine(
+                'Heute gibt es\n'
+                '{essen.name!s:^{breite}} mit\n'
+                '{beilage[0]:>{breite}} fuer {{preis}}.\n',
+            )
+
+        class Essen(object):
+            name = 'Gulasch {1}'
+
+        residual = template.specialize({'essen': Essen(), 'breite': 12})
+
+        self.assertEqual(residual.referenced_names(),
+                         frozenset(['beilage', 'breite']))
+        self.assertMultiLineEqual(
+                residual.apply({'beilage': ['Nockerl'], 'breite': 12}),
+                template.apply({'essen': Essen(), 'beilage': ['Nockerl'],
+                                'breite': 12}))
+
+    def test_specialize_automatic_numbering(self):
+        engine = engines.engines[HANDLE]
+
+        template = engine('{} und {}', tolerant=True)
+
+        self.assertIs(template.specialize({'0': 'Gulasch'}), template)
+
+    def test_apply_many(self):
+        engine = engines.engines[HANDLE]
+        columns = {
+                'essen':   ['Gulasch', u'Kn\xf6del', 'Schnitzel'],
+                'preis':   [7, 8.5, 10],
+                'breite':  [8, 10, 12],
+                'beilage': [['Nockerl'], ['Salat'], ['Reis', 'Salat']],
+            }
+
+        def apply_each(template):
+            return [template.apply(dict(zip(columns, row)))
+                    for row in zip(*columns.values())]
+
+        for text in ['{essen!r:>12} fuer {{{preis:.2f}}}', '{essen}',
+                     '{beilage[0]} und {essen:^{breite}}', 'nichts', '',
+                     '{essen} mit {fehlt!s:>5}']:
+            template = engine(text, tolerant=True)
+            self.assertEqual(template.apply_many(columns),
+                             apply_each(template))
+
+        template = engine('{essen:>12} fuer {preis}')
+        self.assertEqual(template.apply_many(columns), apply_each(template))
+        self.assertRaises(KeyError, engine('{fehlt}').apply_many, columns)
+        self.assertRaises(ValueError, engine('{essen:d}').apply_many,
+                          columns)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -112,6 +112,104 @@ class TestStringTemplate(unittest.TestCase):
                 '${beilage}.\n'
             )
 
+    def test_referenced_names(self):
+        engine = engines.engines[HANDLE]
+
+        template = engine(
+                'Heute gibt es\n'
+                '$essen mit\n'
+                '${beilage} fuer $$preis.\n',
+            )
+
+        self.assertEqual(template.referenced_names(),
+                         frozenset(['essen', 'beilage']))
+
+    def test_specialize(self):
+        engine = engines.engines[HANDLE]
+
+        template = engine(
+                'Heute gibt es\n'
+                '$essen mit\n'
+                '${beilage} fuer $$preis.\n',
+            )
+
+        residual = template.specialize({'essen': 'Gulasch $1', 'x': 'y'})
+
+        self.assertEqual(residual.referenced_names(), frozenset(['beilage']))
+        self.assertMultiLineEqual(residual.apply({'beilage': 'Nockerl'}),
+                template.apply({'essen': 'Gulasch $1', 'beilage': 'Nockerl'}))
+        self.assertIs(template.specialize({'x': 'y'}), template)
+
+    def test_specialize_adjacent_placeholders(self):
+        engine = engines.engines[HANDLE]
+
+        mapping = {'service': 'web', 'suffix': '_prod', 'leer': ''}
+
+        for text in ['$service$suffix', '$service$leer$suffix',
+                     '$suffix$service$suffix', '$service${suffix}-$service']:
+            template = engine(text)
+            residual = template.specialize({'suffix': '_prod', 'leer': ''})
+
+            self.assertIn('service', residual.referenced_names())
+            self.assertEqual(residual.apply(mapping), template.apply(mapping))
+
+        residual = engine('$service$suffix').specialize({'suffix': '_prod'})
+        self.assertEqual(residual.template.template, '$service$suffix')
+
+        residual = engine('$service $suffix').specialize({'suffix': '_prod'})
+        self.assertEqual(residual.template.template, '$service _prod')
+
+    def test_specialize_tolerant_adjacent_placeholders(self):
+        engine = engines.engines[HANDLE]
+        constants = {'b': '_X', 'c': 'Y', 'leer': ''}
+
+        for text in ['port=$missing$b', 'port=$missing$b$c',
+                     'port=$missing$leer$b', 'port=$missing ${b}$c',
+                     '$b$missing$$$c', '${missing}$b $missing$leer']:
+            template = engine(text, tolerant=True)
+            residual = template.specialize(constants)
+
+            self.assertEqual(residual.apply(constants),
+                             template.apply(constants))
+
+        residual = engine('$missing$b $c', tolerant=True).specialize(
+                constants)
+        self.assertEqual(residual.template.template, '$missing$b Y')
+
+    def test_apply_many(self):
+        engine = engines.engines[HANDLE]
+        columns = {
+                'essen':   ['Gulasch', u'Kn\xf6del', 'Schnitzel'],
+                'preis':   [7, 8.5, 10],
+                'beilage': [None, 'Salat', ['Reis', 'Salat']],
+            }
+
+        def apply_each(template):
+            return [template.apply(dict(zip(columns, row)))
+                    for row in zip(*columns.values())]
+
+        for text in ['$essen fuer $$$preis', '${essen}', 'nichts', '',
+                     '$essen mit $beilage', '$essen $fehlt $ x']:
+            template = engine(text, tolerant=True)
+            self.assertEqual(template.apply_many(columns),
+                             apply_each(template))
+
+        for text in ['c ${b}$b', '$b ${b} $b $essen ${b}']:
+            template = engine(text, tolerant=True)
+            self.assertEqual(template.apply_many(columns),
+                             apply_each(template))
+
+        template = engine('$essen $x/$x\n', tolerant=True)
+        self.assertEqual(template.apply_many(columns),
+                         ['Gulasch $x/$x\n', u'Kn\xf6del $x/$x\n',
+                          'Schnitzel $x/$x\n'])
+
+        template = engine('$essen fuer $$$preis')
+        self.assertEqual(template.apply_many(columns), apply_each(template))
+        self.assertRaises(KeyError, engine('$essen mit $beilage').apply_many,
+                          columns)
+        self.assertRaises(KeyError, engine('$fehlt').apply_many, columns)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+import io
+import os.path
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from .context import eztemplate
+from .context import engines
+from .context import TempDirTestCase
+
+
+HANDLE = 'string.Template.stream'
+
+TEMPLATES = [
+        u'',
+        u'Heute gibt es\n$essen mit\n${beilage}.\n',
+        u'$$ $$ $$$$$$ $$essen $$$essen\n',
+        u'${essen}${beilage}$essen$beilage',
+        u'$essen_$beilage ${essen}_ $fehlt ${fehlt}\n',
+        u'$$',
+        u'$essen',
+    ]
+
+
+class TestStringTemplateStream(unittest.TestCase):
+
+    def assertSameAsStringTemplate(self, text, mapping, tolerant=False):
+        reference = engines.engines['string.Template'](text,
+                                                       tolerant=tolerant)
+        try:
+            expected = reference.apply(mapping)
+        except (KeyError, ValueError) as e:
+            expected = type(e)
+
+        for chunk_size in (1, 2, 3, 7, 1 << 16):
+            with mock.patch.object(
+                    engines.string_template_stream_engine,
+                    'CHUNK_SIZE', chunk_size):
+                template = engines.engines[HANDLE](text, tolerant=tolerant)
+                self.assertEqual(template.referenced_names(),
+                                 reference.referenced_names())
+
+                if isinstance(expected, type):
+                    self.assertRaises(expected, template.apply, mapping)
+                else:
+                    self.assertEqual(template.apply(mapping), expected)
+
+    def test_valid_engine(self):
+        self.assertIn(HANDLE, engines.engines)
+        engine = engines.engines[HANDLE]
+        assert issubclass(engine, engines.Engine)
+        self.assertTrue(engine.streaming)
+
+    def test_same_as_string_template(self):
+        mappings = [
+                {'essen': 'Gulasch', 'beilage': 'Nockerl', 'fehlt': '$x'},
+                {'essen': u'Gul\xe4sch', 'beilage': None},
+                {'essen': 'Gulasch'},
+            ]
+
+        for text in TEMPLATES:
+            for mapping in mappings:
+                for tolerant in (False, True):
+                    self.assertSameAsStringTemplate(text, mapping,
+                                                    tolerant=tolerant)
+
+    def test_invalid_placeholder(self):
+        engine = engines.engines[HANDLE]
+
+        for chunk_size in (1, 4, 1 << 16):
+            with mock.patch.object(
+                    engines.string_template_stream_engine,
+                    'CHUNK_SIZE', chunk_size):
+                template = engine(u'Heute\ngibt es ${essen mit $ 7\n')
+                with self.assertRaises(ValueError) as cm:
+                    template.apply({'essen': 'Gulasch'})
+                self.assertIn('line 2, col 9', str(cm.exception))
+
+                template = engine(u'Heute\ngibt es ${essen mit $ 7\n',
+                                  tolerant=True)
+                self.assertEqual(template.apply({'essen': 'Gulasch'}),
+                                 u'Heute\ngibt es ${essen mit $ 7\n')
+
+    def test_opener(self):
+        engine = engines.engines[HANDLE]
+        opened = []
+
+        def opener():
+            opened.append(True)
+            return io.StringIO(u'$essen mit $beilage\n')
+
+        template = engine(opener)
+        self.assertEqual(opened, [])
+
+        stream = io.StringIO()
+        template.apply_to({'essen': 'Gulasch', 'beilage': 'Nockerl'}, stream)
+        self.assertEqual(stream.getvalue(), u'Gulasch mit Nockerl\n')
+        self.assertEqual(len(opened), 1)
+
+
+class TestStreamedOutput(TempDirTestCase):
+
+    def test_written_as_it_goes(self):
+        engine = engines.engines[HANDLE]
+        template = self.path('dump.sql.gz')
+        with eztemplate.compression.open_text(template, 'w') as f:
+            for number in range(1000):
+                f.write(u'INSERT INTO ${table} VALUES (%d);\n' % (number,))
+
+        sink = eztemplate.sinks.DirectorySink()
+        with mock.patch.object(sink, 'write') as write:
+            eztemplate.__main__.process_combinations(
+                    eztemplate.__main__.variable_outfile_iterator(
+                        [self.path('${table}.sql')], [template],
+                        [{'table': 'essen'}, {'table': 'beilage'}],
+                        engine),
+                    engine,
+                    sink=sink)
+        self.assertFalse(write.called)
+
+        for table in ('essen', 'beilage'):
+            with open(self.path(table + '.sql')) as f:
+                lines = f.readlines()
+            self.assertEqual(len(lines), 1000)
+            self.assertEqual(lines[-1],
+                             'INSERT INTO %s VALUES (999);\n' % (table,))
+
+    def test_template_read_twice(self):
+        engine = engines.engines[HANDLE]
+        text = u'$essen mit $beilage\n' * 1000
+        template = self.write('template', text)
+
+        open_text = eztemplate.compression.open_text
+        opened = []
+
+        def counting_open_text(path, *args, **kwargs):
+            if path == template:
+                opened.append(path)
+            return open_text(path, *args, **kwargs)
+
+        with mock.patch.object(eztemplate.compression, 'open_text',
+                               counting_open_text):
+            reader = eztemplate.__main__.CachedTemplateReader(engine)
+            with eztemplate.journal.Journal(self.path('journal')) as journal:
+                eztemplate.__main__.process_combinations(
+                        [(self.path('output'), template,
+                          {'essen': 'Gulasch', 'beilage': 'Nockerl'})],
+                        engine,
+                        journal=journal,
+                        templatereader=reader)
+                self.assertEqual(len(journal), 1)
+
+        # once scanning for names and the digest, once rendering
+        self.assertEqual(len(opened), 2)
+        self.assertEqual(reader.read(template).source_digest,
+                         eztemplate.__main__.text_digest(text)[1])
+
+    def test_failed_output_removed(self):
+        engine = engines.engines[HANDLE]
+        template = self.write('template',
+                              '$essen mit $beilage\n' * 10000 + '$ kaputt\n')
+
+        outfile = self.path('output')
+        self.assertRaises(
+                ValueError,
+                eztemplate.__main__.process_combinations,
+                [(outfile, template, {'essen': 'Gulasch',
+                                      'beilage': 'Nockerl'})],
+                engine)
+        self.assertFalse(os.path.exists(outfile))
+
+
+if __name__ == '__main__':
+    unittest.main()
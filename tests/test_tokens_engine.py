@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+
+from .context import engines
+
+
+HANDLE = 'tokens'
+
+
+class TestTokensEngine(unittest.TestCase):
+
+    def test_valid_engine(self):
+        self.assertIn(HANDLE, engines.engines)
+        engine = engines.engines[HANDLE]
+        assert issubclass(engine, engines.Engine)
+        self.assertNotIn('\n', engine.__doc__)
+
+    def test_replace_tokens(self):
+        engine = engines.engines[HANDLE]
+
+        template = engine(
+                'Heute gibt es\n'
+                '@@ESSEN@@ mit\n'
+                '@@BEILAGE@@ fuer @@PREIS@@ @@ESSEN@@.\n',
+            )
+
+        result = template.apply({
+                'random':      'value',
+                '@@ESSEN@@':   'Szegediner Gulasch',
+                '@@BEILAGE@@': 'Kartoffeln',
+                '@@PREIS@@':   7.5,
+                'ez_path':     'Heute',
+            })
+
+        self.assertMultiLineEqual(result,
+                'Heute gibt es\n'
+                'Szegediner Gulasch mit\n'
+                'Kartoffeln fuer 7.5 Szegediner Gulasch.\n'
+            )
+
+    def test_overlapping_tokens(self):
+        engine = engines.engines[HANDLE]
+
+        template = engine('abcd bcx abc xbc')
+
+        self.assertEqual(template.apply({
+                'bc':   '<BC>',
+                'abcd': '<ABCD>',
+                'ab':   '<AB>',
+                'bcx':  '<BCX>',
+            }), '<ABCD> <BCX> <AB>c x<BC>')
+
+    def test_replacements_not_rescanned(self):
+        engine = engines.engines[HANDLE]
+
+        template = engine('@A@ @B@')
+
+        self.assertEqual(template.apply({'@A@': '@B@', '@B@': '@A@'}),
+                         '@B@ @A@')
+
+    def test_only_used_values_converted(self):
+        engine = engines.engines[HANDLE]
+
+        template = engine('@@ESSEN@@ mit @@BEILAGE@@')
+
+        self.assertEqual(template.apply({'@@ESSEN@@': 'Gulasch',
+                                         '@@BEILAGE@@': 'Nockerl',
+                                         '@@FEHLT@@': None}),
+                         'Gulasch mit Nockerl')
+        self.assertRaises(ValueError, template.apply,
+                          {'@@ESSEN@@': 'Gulasch', '@@BEILAGE@@': None})
+
+        template = engine('@@ESSEN@@ mit @@BEILAGE@@', tolerant=True)
+        self.assertEqual(template.apply({'@@ESSEN@@': 'Gulasch',
+                                         '@@BEILAGE@@': None}),
+                         'Gulasch mit ')
+
+    def test_automaton_cached(self):
+        automaton = engines.tokens_engine.automaton
+        tokens = ['@@%d@@' % (number,) for number in range(1000)]
+
+        self.assertIs(automaton(tokens), automaton(reversed(tokens)))
+        self.assertIsNot(automaton(tokens), automaton(tokens[1:]))
+
+        replaced = automaton(tokens).replace(
+                '@@999@@ @@1000@@ @@@@7@@',
+                lambda token: token.strip('@'))
+        self.assertEqual(replaced, '999 @@1000@@ @@7')
+
+
+if __name__ == '__main__':
+    unittest.main()
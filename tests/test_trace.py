@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+import json
+import os
+import os.path
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from .context import eztemplate
+from .context import engines
+from .context import TempDirTestCase
+
+
+class TestTracer(TempDirTestCase):
+
+    def test_span(self):
+        tracer = eztemplate.trace.Tracer()
+
+        with tracer.span('read', path='template') as span:
+            span['size'] = 42
+
+        event, = tracer.events
+        self.assertEqual(event['name'], 'read')
+        self.assertEqual(event['ph'], 'X')
+        self.assertEqual(event['pid'], os.getpid())
+        self.assertDictEqual(event['args'], {'path': 'template', 'size': 42})
+        self.assertGreaterEqual(event['dur'], 0)
+
+    def test_since(self):
+        tracer = eztemplate.trace.Tracer()
+        tracer.add('before', 0, 1)
+        mark = tracer.mark()
+        tracer.add('after', 1, 1)
+
+        self.assertEqual([event['name'] for event in tracer.since(mark)],
+                         ['after'])
+        self.assertEqual([event['name'] for event in tracer.events],
+                         ['before'])
+
+    def test_null_tracer(self):
+        tracer = eztemplate.trace.NullTracer()
+
+        with tracer.span('read') as span:
+            span['size'] = 42
+
+        self.assertEqual(tracer.since(tracer.mark()), [])
+
+    def test_write(self):
+        path = self.path('trace.json')
+        tracer = eztemplate.trace.Tracer()
+        tracer.add('apply', 0, 1)
+        tracer.write(path)
+
+        events = json.loads(self.read('trace.json'))['traceEvents']
+
+        self.assertEqual([event['ph'] for event in events], ['M', 'X'])
+        self.assertEqual(events[0]['args'], {'name': 'eztemplate'})
+
+
+class TestProcessCombinations(unittest.TestCase):
+
+    def trace(self, jobs):
+        tracer = eztemplate.trace.Tracer()
+
+        eztemplate.__main__.process_combinations(
+                [('out%d.txt' % (n,), StringIO('$n\n'), {'n': n})
+                 for n in range(4)],
+                engines.engines['string.Template'],
+                sink=eztemplate.sinks.DictSink(),
+                jobs=jobs,
+                tracer=tracer)
+
+        return tracer.events
+
+    def test_spans(self):
+        events = self.trace(jobs=1)
+
+        self.assertEqual([event['name'] for event in events],
+                         ['read', 'compile', 'apply', 'write'] +
+                         ['read', 'compile', 'apply', 'write'] * 3)
+        self.assertDictEqual(events[3]['args'],
+                             {'path': 'out0.txt', 'size': 2})
+
+    @unittest.skipUnless(eztemplate.workers.can_fork(), "cannot fork")
+    def test_worker_tracks(self):
+        events = self.trace(jobs=2)
+
+        applies = [event for event in events if event['name'] == 'apply']
+        self.assertEqual(len(applies), 4)
+        self.assertNotIn(os.getpid(), set(event['pid'] for event in applies))
+        self.assertTrue(all(event['pid'] == os.getpid()
+                            for event in events
+                            if event['name'] == 'write'))
+
+
+if __name__ == '__main__':
+    unittest.main()
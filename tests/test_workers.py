@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import unittest
+
+import os
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from .context import eztemplate
+from .context import engines
+
+
+@unittest.skipUnless(eztemplate.workers.can_fork(), "cannot fork")
+class TestMapForked(unittest.TestCase):
+
+    def test_results_in_order(self):
+        squares = list(eztemplate.workers.map_forked(lambda i: i * i, 100, 3))
+        self.assertEqual(squares, [i * i for i in range(100)])
+
+    def test_inherited_state(self):
+        parent = os.getpid()
+        state = {'value': 42}
+
+        results = list(eztemplate.workers.map_forked(
+                lambda i: (state['value'] + i, os.getpid()), 20, 2,
+                chunksize=1))
+
+        self.assertEqual([value for value, __ in results],
+                         [42 + i for i in range(20)])
+        self.assertNotIn(parent, set(pid for __, pid in results))
+
+    def test_task_kept_for_replacement_workers(self):
+        def task(index):
+            return index
+
+        for __ in eztemplate.workers.map_forked(task, 10, 2):
+            self.assertIs(eztemplate.workers._task, task)
+
+        self.assertIsNone(eztemplate.workers._task)
+
+    def test_exception_propagates(self):
+        def task(index):
+            if index == 5:
+                raise KeyError(index)
+            return index
+
+        self.assertRaises(KeyError, list,
+                          eztemplate.workers.map_forked(task, 10, 2))
+
+
+@unittest.skipUnless(eztemplate.workers.can_fork(), "cannot fork")
+class TestProcessCombinations(unittest.TestCase):
+
+    def test_templates_compiled_before_forking(self):
+        parent = os.getpid()
+        compiled = []
+        base = engines.engines['string.Template']
+
+        class RecordingEngine(base):
+            def __init__(self, *args, **kwargs):
+                compiled.append(os.getpid())
+                super(RecordingEngine, self).__init__(*args, **kwargs)
+
+        infile = StringIO('$essen $n\n')
+        sink = eztemplate.sinks.DictSink()
+
+        eztemplate.__main__.process_combinations(
+                [('out%d.txt' % (n,), infile, {'essen': 'Gulasch', 'n': n})
+                 for n in range(50)],
+                RecordingEngine,
+                sink=sink,
+                jobs=3)
+
+        self.assertEqual(compiled, [parent])
+        self.assertDictEqual(sink.outputs, {
+                'out%d.txt' % (n,): 'Gulasch %d\n' % (n,)
+                for n in range(50)
+            })
+
+
+if __name__ == '__main__':
+    unittest.main()